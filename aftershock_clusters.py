@@ -0,0 +1,394 @@
+"""
+Tremr - Aftershock Sequences
+Online space-time clustering of the earthquake stream. Each new event joins an existing sequence
+or starts its own, following DBSCAN's rules: events within link_km and window_hours of each other
+are neighbours, an event with at least min_events neighbours (itself included) is a core event,
+and a link needs a core event at one end. Large events also reach out to their rupture length
+(Wells & Coppersmith), so a mainshock gathers its whole aftershock zone.
+
+Neighbours are found through a grid of link_km cells, each holding its recent events in arrival
+order and capped at max_cell_events, so the cost per event stays bounded however long a
+sequence runs. Sequences merge with union-find and keep O(1)-sized summaries: mainshock, count,
+magnitude range and the rate in doubling time bins since the first event (Omori decay).
+"""
+
+import logging
+import math
+from collections import deque
+
+from phivolcs_scraper import parse_origin_time
+
+DEFAULT_LINK_KM = 20.0
+DEFAULT_WINDOW_HOURS = 48.0
+DEFAULT_MIN_EVENTS = 3
+DEFAULT_MAX_CELL_EVENTS = 64
+MAX_LARGE_EVENTS = 64
+KM_PER_DEGREE = 111.2
+DECAY_BINS = 20  # [0, 1h), [1h, 2h), [2h, 4h), ... up to about 60 years
+
+
+def rupture_length_km(magnitude):
+    """Wells & Coppersmith (1994) subsurface rupture length, all slip types"""
+    return 10 ** (-2.44 + 0.59 * magnitude)
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Equirectangular distance; good to well under 1% at aftershock-zone scales"""
+    x = (lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    return KM_PER_DEGREE * math.hypot(x, lat2 - lat1)
+
+
+def decay_bin(hours):
+    """Doubling time bin of an event this many hours after a sequence's first event"""
+    if hours < 1:
+        return 0
+    return min(DECAY_BINS - 1, int(math.log2(hours)) + 1)
+
+
+def decay_bin_hours(index):
+    """(start, width) of a decay bin in hours"""
+    if index == 0:
+        return 0.0, 1.0
+    return 2.0 ** (index - 1), 2.0 ** (index - 1)
+
+
+class ClusterEvent:
+    """One clustered earthquake"""
+
+    __slots__ = ('key', 'time', 'latitude', 'longitude', 'magnitude', 'location', 'neighbors', 'sequence')
+
+    def __init__(self, key, time, latitude, longitude, magnitude, location=None):
+        self.key = key
+        self.time = time
+        self.latitude = latitude
+        self.longitude = longitude
+        self.magnitude = magnitude
+        self.location = location
+        self.neighbors = 1  # itself
+        self.sequence = None
+
+
+class Sequence:
+    """
+    Summary of a sequence. A sequence merged into another keeps a parent pointer to it;
+    use SequenceClusterer.find to get the live one
+    """
+
+    def __init__(self, number, event):
+        self.number = number
+        self.parent = None
+        self.mainshock = event
+        self.count = 1
+        self.min_magnitude = self.max_magnitude = event.magnitude
+        self.start = self.last = event.time
+        self.bins = [0] * DECAY_BINS
+        self.bins[0] = 1
+        # Largest magnitude already notified about, for grouping alerts per sequence
+        self.notified_magnitude = None
+        self.reported = False
+
+    def add(self, event):
+        self.count += 1
+        self.min_magnitude = min(self.min_magnitude, event.magnitude)
+        if event.magnitude > self.max_magnitude:
+            self.max_magnitude = event.magnitude
+            self.mainshock = event
+        if event.time < self.start:
+            self.rebin(event.time)
+        self.last = max(self.last, event.time)
+        self.bins[decay_bin((event.time - self.start) / 3600)] += 1
+
+    def rebin(self, start):
+        """Move the time origin earlier; each bin's events are moved by its midpoint"""
+        shift = (self.start - start) / 3600
+        bins = [0] * DECAY_BINS
+        for index, count in enumerate(self.bins):
+            if count:
+                low, width = decay_bin_hours(index)
+                bins[decay_bin(low + width / 2 + shift)] += count
+        self.bins = bins
+        self.start = start
+
+    def absorb(self, other):
+        """Fold another sequence's summary into this one"""
+        start = min(self.start, other.start)
+        if start < self.start:
+            self.rebin(start)
+        if start < other.start:
+            other.rebin(start)
+        self.bins = [a + b for a, b in zip(self.bins, other.bins)]
+        self.count += other.count
+        self.min_magnitude = min(self.min_magnitude, other.min_magnitude)
+        if other.max_magnitude > self.max_magnitude:
+            self.max_magnitude = other.max_magnitude
+            self.mainshock = other.mainshock
+        self.last = max(self.last, other.last)
+        self.reported = self.reported or other.reported
+        if other.notified_magnitude is not None:
+            self.notified_magnitude = max(self.notified_magnitude or other.notified_magnitude,
+                                          other.notified_magnitude)
+        other.parent = self
+
+    def decay(self):
+        """(hours since the first event, events per hour) for each non-empty time bin"""
+        rates = []
+        for index, count in enumerate(self.bins):
+            if count:
+                low, width = decay_bin_hours(index)
+                rates.append((low + width / 2, count / width))
+        return rates
+
+    def current_rate(self):
+        """Events per hour in the time bin of the latest event"""
+        index = decay_bin((self.last - self.start) / 3600)
+        return self.bins[index] / decay_bin_hours(index)[1]
+
+    def omori_p(self):
+        """Least-squares slope of log rate against log time over bins after the first hour; None below 3 bins"""
+        points = [(math.log(hours), math.log(rate)) for hours, rate in self.decay() if hours >= 1]
+        if len(points) < 3:
+            return None
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        spread = sum((x - mean_x) ** 2 for x, _ in points)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+        return -slope
+
+    def summary(self):
+        """Figures for display, as a dict"""
+        return {
+            'sequence': self.number,
+            'count': self.count,
+            'mainshock': self.mainshock.key,
+            'mainshock_location': self.mainshock.location,
+            'min_magnitude': self.min_magnitude,
+            'max_magnitude': self.max_magnitude,
+            'start': self.start,
+            'last': self.last,
+            'rate_per_hour': self.current_rate(),
+            'omori_p': self.omori_p()
+        }
+
+
+class SequenceClusterer:
+    """Assigns each new event to a sequence as it arrives"""
+
+    def __init__(self, link_km=DEFAULT_LINK_KM, window_hours=DEFAULT_WINDOW_HOURS, min_events=DEFAULT_MIN_EVENTS,
+                 max_cell_events=DEFAULT_MAX_CELL_EVENTS):
+        self.link_km = link_km
+        self.window = window_hours * 3600
+        self.min_events = min_events
+        self.max_cell_events = max_cell_events
+        self.cell_degrees = link_km / KM_PER_DEGREE
+        self.cells = {}
+        # Recent events whose rupture length exceeds link_km; they link further than one cell
+        self.large_events = deque(maxlen=MAX_LARGE_EVENTS)
+        self.events = {}
+        self.timeline = deque()
+        self.sequences = {}
+        self.next_number = 1
+        self.clock = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('sequence_link_km', DEFAULT_LINK_KM),
+                   config.get('sequence_window_hours', DEFAULT_WINDOW_HOURS),
+                   config.get('sequence_min_events', DEFAULT_MIN_EVENTS))
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def find(self, sequence):
+        """The live sequence a (possibly merged) sequence belongs to, compressing the path"""
+        root = sequence
+        while root.parent is not None:
+            root = root.parent
+        while sequence.parent is not None and sequence.parent is not root:
+            sequence.parent, sequence = root, sequence.parent
+        return root
+
+    def sequence_of(self, key):
+        """The live sequence of a recent event, or None"""
+        event = self.events.get(key)
+        return self.find(event.sequence) if event is not None else None
+
+    def cell_of(self, latitude, longitude):
+        return int(math.floor(latitude / self.cell_degrees)), int(math.floor(longitude / self.cell_degrees))
+
+    def nearby(self, event, radius_km):
+        """Events in the grid within radius_km and the time window of event"""
+        row, column = self.cell_of(event.latitude, event.longitude)
+        rows = int(math.ceil(radius_km / self.link_km))
+        columns = int(math.ceil(rows / max(0.1, math.cos(math.radians(event.latitude)))))
+        cutoff = self.clock - self.window
+        found = []
+        for r in range(row - rows, row + rows + 1):
+            for c in range(column - columns, column + columns + 1):
+                cell = self.cells.get((r, c))
+                if cell is None:
+                    continue
+                while cell and cell[0].time < cutoff:
+                    cell.popleft()
+                if not cell:
+                    del self.cells[(r, c)]
+                    continue
+                for other in cell:
+                    if (other is not event and abs(other.time - event.time) <= self.window and
+                            distance_km(event.latitude, event.longitude, other.latitude, other.longitude) <= radius_km):
+                        found.append(other)
+        return found
+
+    def merge(self, event, other):
+        """Put event in other's sequence, or join their two sequences"""
+        if event.sequence is None:
+            event.sequence = self.find(other.sequence)
+            event.sequence.add(event)
+            return
+        first, second = self.find(event.sequence), self.find(other.sequence)
+        if first is second:
+            return
+        if first.count < second.count:
+            first, second = second, first
+        first.absorb(second)
+        self.sequences.pop(second.number, None)
+
+    def add(self, key, time, latitude, longitude, magnitude, location=None):
+        """Cluster one event; returns its live Sequence"""
+        if key in self.events:
+            return self.sequence_of(key)
+        event = ClusterEvent(key, time, latitude, longitude, magnitude, location)
+        self.clock = time if self.clock is None else max(self.clock, time)
+
+        neighbors = self.nearby(event, self.link_km)
+        event.neighbors += len(neighbors)
+        became_core = []
+        for other in neighbors:
+            other.neighbors += 1
+            if other.neighbors == self.min_events:
+                became_core.append(other)
+            if event.neighbors >= self.min_events or other.neighbors >= self.min_events:
+                self.merge(event, other)
+
+        # A large event in a live sequence links anything within its rupture length
+        for large in self.large_events:
+            if event.time < large.time - self.window or self.find(large.sequence).last < event.time - self.window:
+                continue
+            if distance_km(event.latitude, event.longitude, large.latitude, large.longitude) <= rupture_length_km(large.magnitude):
+                self.merge(event, large)
+
+        if event.sequence is None:
+            event.sequence = Sequence(self.next_number, event)
+            self.sequences[event.sequence.number] = event.sequence
+            self.next_number += 1
+
+        # Border events of a newly core event join its sequence (DBSCAN expansion)
+        for core in became_core:
+            for other in self.nearby(core, self.link_km):
+                self.merge(core, other)
+
+        reach = rupture_length_km(magnitude)
+        if reach > self.link_km:
+            for other in self.nearby(event, reach):
+                self.merge(event, other)
+            self.large_events.append(event)
+
+        cell = self.cells.setdefault(self.cell_of(latitude, longitude), deque())
+        cell.append(event)
+        if len(cell) > self.max_cell_events:
+            cell.popleft()
+        self.events[key] = event
+        self.timeline.append(event)
+        return self.find(event.sequence)
+
+    def add_earthquake(self, key, earthquake):
+        """Cluster a scraped row; returns its Sequence, or None if its time or position can't be read"""
+        origin = parse_origin_time(earthquake)
+        try:
+            latitude, longitude = float(earthquake['latitude']), float(earthquake['longitude'])
+        except (KeyError, ValueError, TypeError):
+            return None
+        if origin is None:
+            return None
+        try:
+            magnitude = float(earthquake.get('magnitude'))
+        except (TypeError, ValueError):
+            magnitude = 0.0
+        return self.add(key, origin, latitude, longitude, magnitude, earthquake.get('location'))
+
+    def revise(self, old_key, key, earthquake):
+        """
+        A revised row keeps its sequence under its new key; a new magnitude updates the summary.
+        The event stays where it was first placed in the grid
+        """
+        event = self.events.pop(old_key, None)
+        if event is None:
+            return self.add_earthquake(key, earthquake)
+        event.key = key
+        event.location = earthquake.get('location', event.location)
+        self.events[key] = event
+        sequence = self.find(event.sequence)
+        try:
+            event.magnitude = float(earthquake.get('magnitude'))
+        except (TypeError, ValueError):
+            return sequence
+        sequence.min_magnitude = min(sequence.min_magnitude, event.magnitude)
+        if event.magnitude > sequence.max_magnitude or event is sequence.mainshock:
+            sequence.max_magnitude = event.magnitude
+            sequence.mainshock = event
+        return sequence
+
+    def expire(self):
+        """Forget events older than the window and sequences with no event inside it"""
+        if self.clock is None:
+            return
+        cutoff = self.clock - self.window
+        while self.timeline and self.timeline[0].time < cutoff:
+            event = self.timeline.popleft()
+            if self.events.get(event.key) is event:
+                del self.events[event.key]
+            # A sequence's latest event leaves the window last, so check only the sequences losing one
+            sequence = self.find(event.sequence)
+            if sequence.last < cutoff:
+                self.sequences.pop(sequence.number, None)
+
+    def update(self, delta, event_id):
+        """
+        Cluster a scrape's new rows, oldest first, and carry revisions over. Removed rows have
+        only scrolled off the PHIVOLCS page. event_id maps a row to its key.
+        Returns the sequences that grew, by event key
+        """
+        grown = {}
+        for old_earthquake, earthquake in delta.modified:
+            sequence = self.revise(event_id(old_earthquake), event_id(earthquake), earthquake)
+            if sequence is not None:
+                grown[event_id(earthquake)] = sequence
+        inserted = sorted(delta.inserted, key=lambda eq: parse_origin_time(eq) or 0)
+        for earthquake in inserted:
+            sequence = self.add_earthquake(event_id(earthquake), earthquake)
+            if sequence is not None:
+                grown[event_id(earthquake)] = sequence
+        self.expire()
+        for key, sequence in grown.items():
+            grown[key] = self.find(sequence)
+        for sequence in grown.values():
+            if sequence.count >= self.min_events and not sequence.reported:
+                sequence.reported = True
+                logging.info(f"Earthquake sequence #{sequence.number}: {describe_sequence(sequence)}")
+        return grown
+
+    def active(self):
+        """Live sequences with more than one event, most recently active first"""
+        return sorted((s for s in self.sequences.values() if s.count > 1), key=lambda s: s.last, reverse=True)
+
+
+def describe_sequence(sequence):
+    """One-line description of a sequence, e.g. for a notification; empty for a lone event"""
+    if sequence is None or sequence.count < 2:
+        return ""
+    text = (f"{sequence.count} earthquakes, largest M{sequence.max_magnitude:.1f}"
+            f" ({sequence.mainshock.location or 'unknown location'}), "
+            f"{sequence.current_rate():.1f}/hour lately")
+    p = sequence.omori_p()
+    if p is not None:
+        text += f", decaying with p={p:.2f}"
+    return text
@@ -0,0 +1,152 @@
+"""
+Tremr - Alert Staleness Tracking
+Measures how long after the earthquake each alert actually reached the user
+"""
+
+import json
+import logging
+import math
+import os
+from collections import deque
+
+DEFAULT_LATENCY_FILE = 'alert_latency.jsonl'
+DEFAULT_SLO_SECONDS = 900
+DEFAULT_WINDOW = 100
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class AlertLatencyTracker:
+    """Rolling distribution of origin-to-notification times, with an SLO on the 95th percentile"""
+
+    def __init__(self, latency_file=DEFAULT_LATENCY_FILE, slo_seconds=DEFAULT_SLO_SECONDS, window=DEFAULT_WINDOW):
+        self.latency_file = latency_file
+        self.slo_seconds = slo_seconds
+        self.records = deque(maxlen=window)
+        self.load()
+
+    def load(self):
+        """Load the most recent records so the distribution survives restarts"""
+        if not self.latency_file or not os.path.exists(self.latency_file):
+            return
+        lines = 0
+        try:
+            with open(self.latency_file, 'r') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        self.records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError as e:
+            logging.warning(f"Could not read alert latency history: {e}")
+            return
+
+        # Only the rolling window is ever read back, so trim the file once it is well past it
+        if lines > 10 * self.records.maxlen:
+            self.rewrite_file()
+
+    def rewrite_file(self):
+        """Rewrite the history file with just the records in the window"""
+        try:
+            temp_file = self.latency_file + '.tmp'
+            with open(temp_file, 'w') as f:
+                for entry in self.records:
+                    f.write(json.dumps(entry) + '\n')
+            os.replace(temp_file, self.latency_file)
+        except OSError as e:
+            logging.warning(f"Could not trim alert latency history: {e}")
+
+    def record(self, earthquake, origin_time, previous_poll_at, first_seen_at, delivered_at):
+        """
+        Record one delivered alert
+        The event appeared upstream some time after the previous poll and before the poll that first saw it;
+        the midpoint of that window (never before the origin time) is used as the best estimate
+        """
+        if origin_time is None:
+            return None
+
+        window_start = previous_poll_at if previous_poll_at is not None else first_seen_at
+        appeared_upstream_at = max(origin_time, (window_start + first_seen_at) / 2)
+
+        entry = {
+            'event': f"{earthquake.get('date', '')} {earthquake.get('time', '')}",
+            'magnitude': earthquake.get('magnitude', ''),
+            'origin_time': origin_time,
+            'appeared_upstream_at': appeared_upstream_at,
+            'first_seen_at': first_seen_at,
+            'delivered_at': delivered_at,
+            'upstream_delay_seconds': appeared_upstream_at - origin_time,
+            'detection_delay_seconds': first_seen_at - appeared_upstream_at,
+            'delivery_delay_seconds': delivered_at - first_seen_at,
+            'total_seconds': delivered_at - origin_time
+        }
+        self.records.append(entry)
+        self.append_to_file(entry)
+
+        logging.info(
+            f"Alert latency: {entry['total_seconds']:.0f}s after origin "
+            f"(PHIVOLCS ~{entry['upstream_delay_seconds']:.0f}s, polling ~{entry['detection_delay_seconds']:.0f}s, "
+            f"delivery {entry['delivery_delay_seconds']:.1f}s)"
+        )
+        self.check_slo(entry)
+        return entry
+
+    def append_to_file(self, entry):
+        """Append a record to the history file"""
+        if not self.latency_file:
+            return
+        try:
+            with open(self.latency_file, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            logging.warning(f"Could not save alert latency: {e}")
+
+    def check_slo(self, entry):
+        """Warn when this alert or the rolling 95th percentile is over the SLO"""
+        if not self.slo_seconds:
+            return
+        if entry['total_seconds'] > self.slo_seconds:
+            logging.warning(
+                f"Alert for {entry['event']} reached you {entry['total_seconds']:.0f}s after the earthquake "
+                f"(SLO {self.slo_seconds}s)"
+            )
+        p95 = percentile([record['total_seconds'] for record in self.records], 0.95)
+        if p95 is not None and p95 > self.slo_seconds:
+            logging.warning(f"Alert latency SLO breached: p95 {p95:.0f}s over the last {len(self.records)} alerts "
+                            f"(SLO {self.slo_seconds}s)")
+
+    def format_summary(self):
+        """One line describing the rolling distribution"""
+        summary = self.summary()
+        total = summary['total_seconds']
+        if not summary['alerts']:
+            return "No alerts delivered yet"
+        line = (f"Alert latency over {summary['alerts']} alerts: p50 {total['p50']:.0f}s, "
+                f"p95 {total['p95']:.0f}s, max {total['max']:.0f}s")
+        if summary['slo_breached']:
+            line += f" - over the {self.slo_seconds}s SLO"
+        return line
+
+    def summary(self):
+        """Percentiles of each part of the delay over the rolling window"""
+        parts = ['total_seconds', 'upstream_delay_seconds', 'detection_delay_seconds', 'delivery_delay_seconds']
+        summary = {'alerts': len(self.records), 'slo_seconds': self.slo_seconds}
+        for part in parts:
+            values = [record[part] for record in self.records]
+            summary[part] = {
+                'p50': percentile(values, 0.50),
+                'p95': percentile(values, 0.95),
+                'max': max(values) if values else None
+            }
+        summary['slo_breached'] = bool(
+            self.slo_seconds and summary['total_seconds']['p95'] is not None
+            and summary['total_seconds']['p95'] > self.slo_seconds
+        )
+        return summary
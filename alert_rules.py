@@ -0,0 +1,318 @@
+"""
+Tremr - Alert Rules
+A small rule language for deciding which earthquakes to alert on, compiled once into numpy
+predicates and evaluated over a whole scrape at a time:
+
+    magnitude >= 4.5 and distance <= 150
+    magnitude >= 3 and depth < 30 and hour between 22 and 6
+    region in ["Batangas", "West Valley Fault corridor"] and not magnitude < 2.5
+    rate(60, 50) >= 5
+
+Fields: magnitude, depth (km), distance (km from your location), hour (Philippine time, 0-23),
+region (province, town or geofence zone name) and rate(minutes[, km]): how many catalog events,
+this one included, happened within that many minutes before it (within km of your location, if given).
+Comparisons are <, <=, >, >=, ==, !=; ranges are "between a and b" (hours wrap past midnight);
+conditions combine with and, or, not and parentheses.
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from location_parser import parse_location, place_key
+from phivolcs_scraper import parse_origin_time
+
+EARTH_RADIUS_KM = 6371.0088
+PHILIPPINE_UTC_OFFSET_SECONDS = 8 * 3600
+NUMERIC_FIELDS = ('magnitude', 'depth', 'distance', 'hour')
+COMPARISONS = {
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+    '==': np.equal, '!=': np.not_equal
+}
+TOKEN = re.compile(r'\s*(?:(?P<number>-?\d+(?:\.\d+)?)|(?P<string>"[^"]*"|\'[^\']*\')|'
+                   r'(?P<op><=|>=|==|!=|<|>)|(?P<punct>[()\[\],])|(?P<word>[A-Za-z_]+))')
+DEPTH_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+Rule = namedtuple('Rule', 'name expression predicate')
+
+
+class RuleSyntaxError(ValueError):
+    """A rule that could not be parsed"""
+
+
+def tokenize(text):
+    """List of (kind, value) tokens"""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise RuleSyntaxError(f"Unexpected text at {position}: {text[position:position + 20]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            value = float(value)
+        elif kind == 'string':
+            value = value[1:-1]
+        elif kind == 'word':
+            value = value.lower()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """Recursive descent over the tokens, producing nested tuples"""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (value is not None and token[1] != value):
+            expected = value or kind or "more"
+            raise RuleSyntaxError(f"Expected {expected} in {self.text!r}, found {token[1]!r}")
+        self.position += 1
+        return token[1]
+
+    def parse(self):
+        tree = self.expression()
+        if self.position != len(self.tokens):
+            raise RuleSyntaxError(f"Unexpected {self.peek()[1]!r} in {self.text!r}")
+        return tree
+
+    def expression(self):
+        tree = self.term()
+        while self.peek() == ('word', 'or'):
+            self.take()
+            tree = ('or', tree, self.term())
+        return tree
+
+    def term(self):
+        tree = self.factor()
+        while self.peek() == ('word', 'and'):
+            self.take()
+            tree = ('and', tree, self.factor())
+        return tree
+
+    def factor(self):
+        if self.peek() == ('word', 'not'):
+            self.take()
+            return ('not', self.factor())
+        if self.peek() == ('punct', '('):
+            self.take()
+            tree = self.expression()
+            self.take('punct', ')')
+            return tree
+        return self.condition()
+
+    def condition(self):
+        field = self.take('word')
+        if field == 'region':
+            self.take('word', 'in')
+            return ('region', self.string_list())
+        if field == 'rate':
+            self.take('punct', '(')
+            minutes = self.take('number')
+            km = None
+            if self.peek() == ('punct', ','):
+                self.take()
+                km = self.take('number')
+            self.take('punct', ')')
+            column = ('rate', minutes, km)
+        elif field in NUMERIC_FIELDS:
+            column = (field,)
+        else:
+            raise RuleSyntaxError(f"Unknown field {field!r} in {self.text!r}")
+
+        if self.peek() == ('word', 'between'):
+            self.take()
+            low = self.take('number')
+            self.take('word', 'and')
+            return ('between', column, low, self.take('number'))
+        operator = self.take('op')
+        return ('compare', column, operator, self.take('number'))
+
+    def string_list(self):
+        self.take('punct', '[')
+        values = [self.take('string')]
+        while self.peek() == ('punct', ','):
+            self.take()
+            values.append(self.take('string'))
+        self.take('punct', ']')
+        return values
+
+
+def compile_tree(tree):
+    """Turn a parsed rule into a function of an EventBatch returning a boolean array"""
+    kind = tree[0]
+    if kind in ('and', 'or'):
+        left, right = compile_tree(tree[1]), compile_tree(tree[2])
+        combine = np.logical_and if kind == 'and' else np.logical_or
+        return lambda batch: combine(left(batch), right(batch))
+    if kind == 'not':
+        inner = compile_tree(tree[1])
+        return lambda batch: np.logical_not(inner(batch))
+    if kind == 'region':
+        keys = frozenset(place_key(name) for name in tree[1])
+        return lambda batch: batch.region_mask(keys)
+    if kind == 'compare':
+        column, compare, value = tree[1], COMPARISONS[tree[2]], tree[3]
+        # Missing values (NaN) never satisfy a comparison, not even !=
+        if tree[2] == '!=':
+            return lambda batch: (batch.column(column) != value) & ~np.isnan(batch.column(column))
+        return lambda batch: compare(batch.column(column), value)
+    if kind == 'between':
+        column, low, high = tree[1], tree[2], tree[3]
+        if column == ('hour',) and low > high:
+            return lambda batch: (batch.column(column) >= low) | (batch.column(column) <= high)
+        return lambda batch: (batch.column(column) >= low) & (batch.column(column) <= high)
+    raise RuleSyntaxError(f"Cannot compile {kind!r}")
+
+
+def compile_rule(expression, name=None):
+    """Parse and compile one rule"""
+    return Rule(name or expression, expression, compile_tree(Parser(expression).parse()))
+
+
+class EventBatch:
+    """
+    A scrape as columns. Columns are computed on first use and shared by every rule in the pass;
+    unparseable values are NaN
+    """
+
+    def __init__(self, earthquakes, latitude, longitude, geofence=None):
+        self.earthquakes = earthquakes
+        self.site = (latitude, longitude)
+        self.geofence = geofence
+        self.size = len(earthquakes)
+        self.columns = {}
+        self.masks = {}
+        self.latitude = self.numbers(eq.get('latitude') for eq in earthquakes)
+        self.longitude = self.numbers(eq.get('longitude') for eq in earthquakes)
+
+    def __len__(self):
+        return self.size
+
+    def numbers(self, values):
+        def to_float(value):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return np.nan
+        return np.fromiter((to_float(value) for value in values), dtype=float, count=self.size)
+
+    def column(self, key):
+        """A numeric column by key: ('magnitude',), ('rate', minutes, km), ..."""
+        if key not in self.columns:
+            self.columns[key] = getattr(self, f"compute_{key[0]}")(*key[1:])
+        return self.columns[key]
+
+    def compute_magnitude(self):
+        return self.numbers(eq.get('magnitude') for eq in self.earthquakes)
+
+    def compute_depth(self):
+        def depth(eq):
+            match = DEPTH_NUMBER.search(str(eq.get('depth', '')))
+            return match.group(0) if match else None
+        return self.numbers(depth(eq) for eq in self.earthquakes)
+
+    def compute_distance(self):
+        """Haversine distance from the site, in km"""
+        lat1, lon1 = np.radians(self.site[0]), np.radians(self.site[1])
+        lat2, lon2 = np.radians(self.latitude), np.radians(self.longitude)
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    def compute_origin(self):
+        return self.numbers(parse_origin_time(eq) for eq in self.earthquakes)
+
+    def compute_hour(self):
+        return np.floor(((self.column(('origin',)) + PHILIPPINE_UTC_OFFSET_SECONDS) % 86400) / 3600)
+
+    def compute_rate(self, minutes, km):
+        """Events in the minutes up to and including each event's origin (within km of the site if given)"""
+        origins = self.column(('origin',))
+        counted = ~np.isnan(origins)
+        if km is not None:
+            counted &= self.column(('distance',)) <= km
+        times = np.sort(origins[counted])
+        window = minutes * 60.0
+        counts = (np.searchsorted(times, origins, side='right') -
+                  np.searchsorted(times, origins - window, side='right')).astype(float)
+        counts[np.isnan(origins)] = np.nan
+        return counts
+
+    def region_mask(self, keys):
+        """Events whose province, town or geofence zone is one of keys"""
+        if keys not in self.masks:
+            parsed = [parse_location(eq.get('location')) for eq in self.earthquakes]
+            mask = np.fromiter(
+                (p is not None and (p.province_key in keys or p.town_key in keys) for p in parsed),
+                dtype=bool, count=self.size
+            )
+            if self.geofence:
+                zones = self.geofence_zones()
+                mask |= np.fromiter((not keys.isdisjoint(names) for names in zones), dtype=bool, count=self.size)
+            self.masks[keys] = mask
+        return self.masks[keys]
+
+    def geofence_zones(self):
+        """Normalized zone names containing each event, from one batch query"""
+        if 'zones' not in self.columns:
+            valid = ~(np.isnan(self.latitude) | np.isnan(self.longitude))
+            zones = [frozenset()] * self.size
+            found = self.geofence.zones_at_batch(self.latitude[valid], self.longitude[valid])
+            for index, names in zip(np.nonzero(valid)[0], found):
+                zones[index] = frozenset(place_key(name) for name in names)
+            self.columns['zones'] = zones
+        return self.columns['zones']
+
+
+class RuleSet:
+    """Compiled rules, evaluated together over a batch"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def evaluate(self, batch):
+        """(rules, events) boolean matrix"""
+        if not self.rules or not len(batch):
+            return np.zeros((len(self.rules), len(batch)), dtype=bool)
+        return np.vstack([rule.predicate(batch) for rule in self.rules])
+
+    def matches(self, batch):
+        """For each event, the names of the rules it matched (empty tuple if none)"""
+        matrix = self.evaluate(batch)
+        names = [rule.name for rule in self.rules]
+        result = [()] * len(batch)
+        for event in np.nonzero(matrix.any(axis=0))[0]:
+            result[event] = tuple(names[rule] for rule in np.nonzero(matrix[:, event])[0])
+        return result
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Rules from the alert_rules config list: strings, or {"name": ..., "when": ...} objects.
+        Returns None when no rules are configured. Raises RuleSyntaxError for a bad rule
+        """
+        entries = config.get('alert_rules')
+        if not entries:
+            return None
+        rules = []
+        for entry in entries:
+            if isinstance(entry, str):
+                rules.append(compile_rule(entry))
+            else:
+                rules.append(compile_rule(entry['when'], entry.get('name')))
+        return cls(rules)
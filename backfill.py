@@ -0,0 +1,225 @@
+"""
+Tremr - Historical Catalog Backfill
+Walks the PHIVOLCS monthly archive pages for a date range and seeds the event store
+
+Usage:
+    python backfill.py --start 2024-01 --end 2024-12
+"""
+
+import argparse
+import calendar
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+import requests
+
+from event_store import EventStore, DEFAULT_DB_FILE
+from phivolcs_scraper import fetch_phivolcs_page, parse_earthquake_rows, PHILIPPINE_TIME
+
+ARCHIVE_URL = "https://earthquake.phivolcs.dost.gov.ph/EQLatest-Monthly/{year}/{year}_{month_name}.html"
+DEFAULT_CHECKPOINT_FILE = 'backfill_checkpoint.json'
+
+
+def month_range(start, end):
+    """List (year, month) pairs from start to end inclusive, both given as 'YYYY-MM'"""
+    current = datetime.strptime(start, '%Y-%m')
+    last = datetime.strptime(end, '%Y-%m')
+    months = []
+    while current <= last:
+        months.append((current.year, current.month))
+        current = current.replace(year=current.year + current.month // 12, month=current.month % 12 + 1)
+    return months
+
+
+def month_end(year, month):
+    """Unix time at which a month ends in Philippine time, when its archive page is complete"""
+    return datetime(year + month // 12, month % 12 + 1, 1, tzinfo=PHILIPPINE_TIME).timestamp()
+
+
+def archive_url(year, month, template=ARCHIVE_URL):
+    """Build the archive page URL for a month"""
+    return template.format(year=year, month=month, month_name=calendar.month_name[month])
+
+
+class PoliteFetcher:
+    """Fetches pages on a bounded thread pool while spacing out request starts"""
+
+    def __init__(self, concurrency=2, delay_seconds=1.0, retries=3, timeout=30):
+        self.concurrency = concurrency
+        self.delay_seconds = delay_seconds
+        self.retries = retries
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.next_request_at = 0.0
+
+    def wait_turn(self):
+        """Block until this thread is allowed to start a request"""
+        with self.lock:
+            now = time.monotonic()
+            start_at = max(now, self.next_request_at)
+            self.next_request_at = start_at + self.delay_seconds
+        if start_at > now:
+            time.sleep(start_at - now)
+
+    def fetch(self, url):
+        """Fetch one page, retrying transient failures. Returns None for months with no archive page"""
+        for attempt in range(1, self.retries + 1):
+            self.wait_turn()
+            try:
+                return fetch_phivolcs_page(url, timeout=self.timeout)
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status == 404:
+                    logging.warning(f"No archive page at {url}")
+                    return None
+                if status is not None and status < 500:
+                    raise
+                logging.warning(f"Attempt {attempt} failed for {url}: {e}")
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                logging.warning(f"Attempt {attempt} failed for {url}: {e}")
+
+            if attempt < self.retries:
+                time.sleep(self.delay_seconds * 2 ** attempt)
+
+        raise RuntimeError(f"Giving up on {url} after {self.retries} attempts")
+
+
+class Backfill:
+    def __init__(self, store, checkpoint_file=DEFAULT_CHECKPOINT_FILE, url_template=ARCHIVE_URL,
+                 fetcher=None, parse_workers=None):
+        """Set up a backfill writing into an EventStore"""
+        self.store = store
+        self.checkpoint_file = checkpoint_file
+        self.url_template = url_template
+        self.fetcher = fetcher or PoliteFetcher()
+        self.parse_workers = parse_workers
+        self.checkpoint = self.load_checkpoint()
+
+    def load_checkpoint(self):
+        """Load completed months from the checkpoint file"""
+        if os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file, 'r') as f:
+                return json.load(f)
+        return {'completed': {}}
+
+    def save_checkpoint(self):
+        """Write the checkpoint file atomically"""
+        temp_file = self.checkpoint_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(self.checkpoint, f, indent=4)
+        os.replace(temp_file, self.checkpoint_file)
+
+    def mark_done(self, month_key, parsed, inserted):
+        """Record a finished month so a restarted backfill skips it"""
+        self.checkpoint['completed'][month_key] = {
+            'parsed': parsed,
+            'inserted': inserted,
+            'finished_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self.save_checkpoint()
+
+    def run(self, start, end, now=None):
+        """
+        Backfill every month from start to end ('YYYY-MM'). Returns the number of new events stored.
+        Only months that are over and had an archive page are checkpointed; the current month and
+        months without a page yet are fetched again by the next run
+        """
+        now = time.time() if now is None else now
+        pending = [
+            (year, month) for year, month in month_range(start, end)
+            if f"{year}-{month:02d}" not in self.checkpoint['completed']
+        ]
+        logging.info(f"Backfilling {len(pending)} month(s) from {start} to {end}")
+
+        total_inserted = 0
+        failures = []
+        missing = []
+
+        with ThreadPoolExecutor(max_workers=self.fetcher.concurrency) as fetch_pool, \
+                ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool:
+            fetches = {
+                fetch_pool.submit(self.fetcher.fetch, archive_url(year, month, self.url_template)): (year, month)
+                for year, month in pending
+            }
+
+            parses = {}
+            while fetches or parses:
+                done, _ = wait(list(fetches) + list(parses), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in fetches:
+                        year, month = fetches.pop(future)
+                        month_key = f"{year}-{month:02d}"
+                        try:
+                            content = future.result()
+                        except Exception as e:
+                            logging.error(f"Failed to fetch {month_key}: {e}")
+                            failures.append(month_key)
+                            continue
+
+                        if content is None:
+                            # Not published yet, or not at all; look again next time
+                            missing.append(month_key)
+                        else:
+                            parses[parse_pool.submit(parse_earthquake_rows, content)] = (year, month)
+                        continue
+
+                    year, month = parses.pop(future)
+                    month_key = f"{year}-{month:02d}"
+                    try:
+                        earthquakes = future.result()
+                    except Exception as e:
+                        logging.error(f"Failed to parse {month_key}: {e}")
+                        failures.append(month_key)
+                        continue
+
+                    # Write each month in one transaction, then checkpoint it once it can no longer grow
+                    inserted = self.store.add_events(earthquakes, source=f"archive:{month_key}")
+                    if month_end(year, month) <= now:
+                        self.mark_done(month_key, len(earthquakes), inserted)
+                    total_inserted += inserted
+                    logging.info(f"{month_key}: parsed {len(earthquakes)}, stored {inserted} new")
+
+        if missing:
+            logging.warning(f"No archive page yet for {', '.join(sorted(missing))}; they will be tried again next run")
+        if failures:
+            logging.warning(f"Months left for the next run: {', '.join(sorted(failures))}")
+        logging.info(f"Backfill finished: {total_inserted} new earthquakes, {self.store.count()} in store")
+        return total_inserted
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Backfill the Tremr event store from PHIVOLCS monthly archives")
+    parser.add_argument('--start', required=True, help="First month, YYYY-MM")
+    parser.add_argument('--end', default=datetime.now().strftime('%Y-%m'), help="Last month, YYYY-MM (default: this month)")
+    parser.add_argument('--db', default=DEFAULT_DB_FILE, help="Event store database file")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_FILE, help="Checkpoint file for resuming")
+    parser.add_argument('--url-template', default=ARCHIVE_URL, help="Archive URL with {year}, {month}, {month_name}")
+    parser.add_argument('--concurrency', type=int, default=2, help="Maximum simultaneous downloads")
+    parser.add_argument('--delay', type=float, default=1.0, help="Minimum seconds between request starts")
+    parser.add_argument('--parse-workers', type=int, default=None, help="Parser processes (default: CPU count)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    store = EventStore(args.db)
+    try:
+        backfill = Backfill(
+            store,
+            checkpoint_file=args.checkpoint,
+            url_template=args.url_template,
+            fetcher=PoliteFetcher(concurrency=args.concurrency, delay_seconds=args.delay),
+            parse_workers=args.parse_workers
+        )
+        backfill.run(args.start, args.end)
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
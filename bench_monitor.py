@@ -0,0 +1,279 @@
+"""
+Tremr - Monitor Benchmark
+Measures EarthquakeMonitor.process_earthquakes on synthetic catalogs of 10^3 to 10^6 events
+for many subscriber sites, with notifications stubbed, and fits scaling curves
+
+Scenarios:
+    cold    - fresh monitor, empty seen-set: every event is new and evaluated
+    warm    - seen-set already holds every event (a restart): every event is diffed and looked up
+    steady  - the previous scrape is the catalog minus its 10 newest events: a typical poll
+
+Usage:
+    python bench_monitor.py
+    python bench_monitor.py --sizes 1000,10000,100000 --sites 1,10 --output bench_monitor.json --label geodesic
+    python bench_monitor.py --compare bench_monitor.json --output bench_vectorized.json --label vectorized
+"""
+
+import argparse
+import json
+import logging
+import math
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from bench_scraper import generate_earthquakes
+from main import EarthquakeMonitor
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_SITES = [1, 10, 100]
+SCENARIOS = ('cold', 'warm', 'steady')
+STEADY_NEW_EVENTS = 10
+# Skip size x sites combinations above this many event evaluations so the default run stays reasonable
+DEFAULT_MAX_WORK = 20000000
+
+BASE_CONFIG = {
+    'radius_km': 100,
+    'min_magnitude': 3.0,
+    'check_interval_seconds': 60,
+    'alert_latency_file': None
+}
+
+
+class BenchMonitor(EarthquakeMonitor):
+    """Monitor with persistence and notifications stubbed out; distance and filtering are the real ones"""
+
+    def __init__(self, config):
+        self.notifications = 0
+        super().__init__(config=config)
+        self.sound_enabled = False
+
+    def load_seen_earthquakes(self):
+        """Benchmarks start from an empty seen-set unless a scenario fills it"""
+        pass
+
+    def save_seen_earthquakes(self):
+        """Benchmarks never write seen_earthquakes.json"""
+        pass
+
+    def ensure_icon_exists(self):
+        """No icon is needed for stubbed notifications"""
+        return None
+
+    def show_notification(self, earthquake, distance):
+        """Count the alert instead of showing it"""
+        self.notifications += 1
+
+
+def generate_sites(count, seed=1):
+    """Random subscriber locations across the Philippine land area"""
+    rng = random.Random(seed)
+    return [(rng.uniform(5.5, 18.5), rng.uniform(119.5, 126.5)) for _ in range(count)]
+
+
+def create_monitor(site):
+    """A benchmark monitor for one subscriber site"""
+    return BenchMonitor(dict(BASE_CONFIG, latitude=site[0], longitude=site[1]))
+
+
+def prepare(monitor, scenario, catalog):
+    """Put a monitor in the state the scenario starts from"""
+    if scenario == 'warm':
+        monitor.seen_earthquakes = {monitor.create_earthquake_id(eq) for eq in catalog}
+    elif scenario == 'steady':
+        monitor.process_earthquakes({'earthquakes': catalog[STEADY_NEW_EVENTS:]})
+        monitor.notifications = 0
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_case(catalog, sites, scenario):
+    """Time process_earthquakes once per site. Returns the result entry"""
+    data = {'earthquakes': catalog}
+    timings = []
+    alerts = 0
+    for site in sites:
+        monitor = create_monitor(site)
+        prepare(monitor, scenario, catalog)
+        started = time.perf_counter()
+        monitor.process_earthquakes(data)
+        timings.append(time.perf_counter() - started)
+        alerts += monitor.notifications
+
+    total = sum(timings)
+    return {
+        'scenario': scenario,
+        'events': len(catalog),
+        'sites': len(sites),
+        'total_seconds': total,
+        'events_per_second': len(catalog) * len(sites) / total if total else None,
+        'p50_ms': percentile(timings, 0.50) * 1000,
+        'p95_ms': percentile(timings, 0.95) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'alerts': alerts
+    }
+
+
+def measure_memory(catalog, site, scenario):
+    """Peak memory of one process_earthquakes call, and what the monitor still holds afterwards"""
+    monitor = create_monitor(site)
+    prepare(monitor, scenario, catalog)
+    tracemalloc.start()
+    try:
+        monitor.process_earthquakes({'earthquakes': catalog})
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, retained
+
+
+def scaling_exponent(points):
+    """Least-squares slope of log(time) against log(size): ~1 is linear, ~2 quadratic"""
+    points = [(x, y) for x, y in points if x > 0 and y > 0]
+    if len(points) < 2:
+        return None
+    xs = [math.log(x) for x, _ in points]
+    ys = [math.log(y) for _, y in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    if not spread:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+
+
+def scaling_curves(results):
+    """For each scenario and site count, per-site time against catalog size and its fitted exponent"""
+    curves = []
+    for scenario in SCENARIOS:
+        for sites in sorted({entry['sites'] for entry in results}):
+            points = sorted(
+                (entry['events'], entry['total_seconds'] / entry['sites'])
+                for entry in results if entry['scenario'] == scenario and entry['sites'] == sites
+            )
+            if points:
+                curves.append({
+                    'scenario': scenario,
+                    'sites': sites,
+                    'points': points,
+                    'exponent': scaling_exponent(points)
+                })
+    return curves
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, site_counts=DEFAULT_SITES, scenarios=SCENARIOS,
+                  max_work=DEFAULT_MAX_WORK, memory=True, label=None):
+    """Run every scenario for every catalog size and site count. Returns the results document"""
+    results = []
+    skipped = []
+    all_sites = generate_sites(max(site_counts))
+
+    # Per-event INFO lines would dominate the timings
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.WARNING)
+    try:
+        for size in sizes:
+            catalog = generate_earthquakes(size)
+            for site_count in site_counts:
+                if size * site_count > max_work:
+                    skipped.append({'events': size, 'sites': site_count})
+                    continue
+                for scenario in scenarios:
+                    entry = run_case(catalog, all_sites[:site_count], scenario)
+                    if memory and site_count == min(site_counts):
+                        entry['peak_memory_bytes'], entry['retained_memory_bytes'] = measure_memory(
+                            catalog, all_sites[0], scenario)
+                    results.append(entry)
+    finally:
+        root.setLevel(level)
+
+    return {
+        'label': label,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+        'skipped': skipped,
+        'curves': scaling_curves(results)
+    }
+
+
+def compare(current, previous):
+    """Lines comparing per-site time and scaling exponents with an earlier run"""
+    before = {(e['scenario'], e['events'], e['sites']): e for e in previous['results']}
+    lines = [f"{current.get('label') or 'current'} vs {previous.get('label') or 'previous'}"]
+    for entry in current['results']:
+        old = before.get((entry['scenario'], entry['events'], entry['sites']))
+        if old and entry['total_seconds']:
+            lines.append(f"  {entry['scenario']:<7} {entry['events']:>8} events x {entry['sites']:>3} sites: "
+                         f"{old['total_seconds'] / entry['total_seconds']:.2f}x faster")
+    old_curves = {(c['scenario'], c['sites']): c for c in previous.get('curves', [])}
+    for curve in current['curves']:
+        old = old_curves.get((curve['scenario'], curve['sites']))
+        if old and old['exponent'] is not None and curve['exponent'] is not None:
+            lines.append(f"  {curve['scenario']:<7} {curve['sites']:>3} sites: "
+                         f"scaling exponent {old['exponent']:.2f} -> {curve['exponent']:.2f}")
+    return "\n".join(lines)
+
+
+def print_results(document):
+    """Print the results table and the scaling curves"""
+    print(f"{'scenario':<8} {'events':>8} {'sites':>5} {'events/s':>11} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'peak MB':>8} {'alerts':>7}")
+    for entry in document['results']:
+        peak = entry.get('peak_memory_bytes')
+        print(f"{entry['scenario']:<8} {entry['events']:>8} {entry['sites']:>5} {entry['events_per_second']:>11.0f} "
+              f"{entry['p50_ms']:>9.1f} {entry['p95_ms']:>9.1f} {entry['p99_ms']:>9.1f} "
+              f"{(peak / 1e6 if peak else float('nan')):>8.1f} {entry['alerts']:>7}")
+    for skipped in document['skipped']:
+        print(f"skipped {skipped['events']} events x {skipped['sites']} sites (over --max-work)")
+
+    print("\nScaling (time per site against catalog size; exponent ~1 is linear)")
+    for curve in document['curves']:
+        exponent = f"{curve['exponent']:.2f}" if curve['exponent'] is not None else "n/a"
+        points = ", ".join(f"{events}: {seconds * 1000:.1f}ms" for events, seconds in curve['points'])
+        print(f"  {curve['scenario']:<7} {curve['sites']:>3} sites  exponent {exponent}  [{points}]")
+
+
+def parse_list(text):
+    """Parse a comma separated list of integers"""
+    return [int(float(value)) for value in text.split(',') if value.strip()]
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark EarthquakeMonitor.process_earthquakes")
+    parser.add_argument('--sizes', type=parse_list, default=DEFAULT_SIZES, help="Comma separated catalog sizes")
+    parser.add_argument('--sites', type=parse_list, default=DEFAULT_SITES, help="Comma separated subscriber counts")
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help="Only this scenario (repeatable)")
+    parser.add_argument('--max-work', type=float, default=DEFAULT_MAX_WORK,
+                        help="Skip combinations with more events x sites than this")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc memory runs")
+    parser.add_argument('--label', help="Name for this run, e.g. the distance engine being tested")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Compare with an earlier results file")
+    args = parser.parse_args()
+
+    document = run_benchmark(sorted(args.sizes), sorted(args.sites), args.scenario or SCENARIOS,
+                             args.max_work, not args.no_memory, args.label)
+    print_results(document)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=4)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print("\n" + compare(document, json.load(f)))
+
+
+if __name__ == '__main__':
+    main()
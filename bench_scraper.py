@@ -0,0 +1,233 @@
+"""
+Tremr - Scraper Benchmark
+Times the PHIVOLCS page parser on generated pages of 10 to 100,000 rows, served from a local fixture,
+for every installed BeautifulSoup backend, and compares the results with a stored baseline
+
+Usage:
+    python bench_scraper.py
+    python bench_scraper.py --sizes 10,1000,10000 --output bench_scraper.json
+    python bench_scraper.py --save-baseline bench_scraper_baseline.json
+    python bench_scraper.py --baseline bench_scraper_baseline.json --tolerance 0.25
+
+Baselines are only comparable on the same machine and Python version.
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bs4 import BeautifulSoup, FeatureNotFound
+
+from phivolcs_fixtures import FixtureServer, render_phivolcs_page
+from phivolcs_scraper import fetch_phivolcs_page, iter_earthquake_rows, parse_earthquake_rows
+
+BACKENDS = ['html.parser', 'lxml', 'html5lib']
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+DEFAULT_TOLERANCE = 0.2
+
+PLACES = ['Calatagan (Batangas)', 'Nasugbu (Batangas)', 'Quezon City', 'Baler (Aurora)', 'Hinatuan (Surigao Del Sur)',
+          'Sablayan (Occidental Mindoro)', 'Governor Generoso (Davao Oriental)', 'Claveria (Cagayan)']
+
+# Tables the real page carries besides the earthquake list: navigation (big enough to pass the size check),
+# and a small legend
+DECOY_TABLES = """<table>
+<tr><th>Menu</th><th>Link</th></tr>
+{links}
+</table>
+<table><tr><td>Legend</td><td>Magnitude</td></tr><tr><td>*</td><td>Revised</td></tr></table>
+"""
+
+
+def available_backends():
+    """The BeautifulSoup tree builders installed here"""
+    backends = []
+    for backend in BACKENDS:
+        try:
+            BeautifulSoup("<table></table>", backend)
+        except FeatureNotFound:
+            continue
+        backends.append(backend)
+    return backends
+
+
+def generate_earthquakes(count, seed=0):
+    """Random earthquakes in mock_data.json format, newest first like the live page"""
+    rng = random.Random(seed)
+    start = datetime(2025, 10, 29, 8, 26)
+    earthquakes = []
+    for i in range(count):
+        origin = start - timedelta(minutes=7 * i)
+        earthquakes.append({
+            'date': f"{origin:%Y-%m-%d}",
+            'time': f"{origin:%H:%M:%S}",
+            'latitude': f"{rng.uniform(4.5, 21.0):.2f}",
+            'longitude': f"{rng.uniform(116.0, 127.0):.2f}",
+            'depth': f"{rng.randint(1, 300):03d} kilometers",
+            'magnitude': f"{rng.uniform(1.0, 6.5):.1f}",
+            'location': f"{rng.randint(1, 40):03d} km N {rng.randint(0, 90)}° E of {rng.choice(PLACES)}"
+        })
+    return earthquakes
+
+
+def generate_page(rows, decoys=True, seed=0):
+    """A PHIVOLCS-shaped page with the given number of earthquake rows, plus decoy tables"""
+    page = render_phivolcs_page(generate_earthquakes(rows, seed)).decode('utf-8')
+    if decoys:
+        links = "\n".join(f"<tr><td>Item {i}</td><td><a href='/page{i}'>Page {i}</a></td></tr>" for i in range(15))
+        page = page.replace("<body>\n", "<body>\n" + DECOY_TABLES.format(links=links), 1)
+    return page.encode('utf-8')
+
+
+def time_parse(content, backend, repeats):
+    """Median and best wall time of a full parse, plus the row count"""
+    timings = []
+    rows = 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        rows = len(parse_earthquake_rows(content, backend))
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), min(timings), rows
+
+
+def time_to_first_row(content, backend, repeats=1):
+    """
+    Best wall time until iter_earthquake_rows, the scraper's own parse, yields its first row,
+    plus that row. BeautifulSoup builds the whole tree before any row comes out, so today this is
+    close to a full parse; it would drop if the scraper started yielding rows as the page streams in
+    """
+    timings = []
+    first = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        first = next(iter_earthquake_rows(content, backend), None)
+        timings.append(time.perf_counter() - started)
+    return min(timings), first
+
+
+def peak_memory(content, backend):
+    """Peak traced memory in bytes while parsing the page once"""
+    tracemalloc.start()
+    try:
+        parse_earthquake_rows(content, backend)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def repeats_for(rows):
+    """Fewer repetitions for the big pages so the whole suite stays under a few minutes"""
+    return 20 if rows <= 100 else 10 if rows <= 1000 else 3 if rows <= 10000 else 1
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, backends=None, repeats=None):
+    """Benchmark every backend on every page size. Returns the results document"""
+    backends = backends or available_backends()
+    pages = {f"/rows{rows}.html": generate_page(rows) for rows in sizes}
+    results = []
+
+    with FixtureServer(pages) as server:
+        for rows in sizes:
+            content = fetch_phivolcs_page(f"{server.url}/rows{rows}.html")
+            for backend in backends:
+                repeats_here = repeats or repeats_for(rows)
+                median, best, parsed = time_parse(content, backend, repeats_here)
+                if parsed != rows:
+                    raise RuntimeError(f"{backend} parsed {parsed} of {rows} rows")
+                results.append({
+                    'backend': backend,
+                    'rows': rows,
+                    'page_bytes': len(content),
+                    'median_seconds': median,
+                    'best_seconds': best,
+                    # Best-of-N is the least noisy estimate of what the parser can do
+                    'rows_per_second': rows / best if best else None,
+                    'first_row_seconds': time_to_first_row(content, backend, repeats_here)[0],
+                    'peak_memory_bytes': peak_memory(content, backend)
+                })
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results
+    }
+
+
+def compare_to_baseline(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    List regressions: rows/s more than `tolerance` below the baseline, or time to first row or peak memory
+    more than `tolerance` above. Only backends and sizes present in both documents are compared
+    """
+    previous = {(entry['backend'], entry['rows']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in current['results']:
+        before = previous.get((entry['backend'], entry['rows']))
+        if not before:
+            continue
+        label = f"{entry['backend']} {entry['rows']} rows"
+        if before['rows_per_second'] and entry['rows_per_second'] < before['rows_per_second'] * (1 - tolerance):
+            regressions.append(f"{label}: {entry['rows_per_second']:.0f} rows/s, "
+                               f"baseline {before['rows_per_second']:.0f} rows/s")
+        if before.get('first_row_seconds') and entry['first_row_seconds'] > before['first_row_seconds'] * (1 + tolerance):
+            regressions.append(f"{label}: first row after {entry['first_row_seconds'] * 1000:.1f} ms, "
+                               f"baseline {before['first_row_seconds'] * 1000:.1f} ms")
+        if entry['peak_memory_bytes'] > before['peak_memory_bytes'] * (1 + tolerance):
+            regressions.append(f"{label}: peak {entry['peak_memory_bytes'] / 1e6:.1f} MB, "
+                               f"baseline {before['peak_memory_bytes'] / 1e6:.1f} MB")
+    return regressions
+
+
+def print_results(document):
+    """Print a results table"""
+    print(f"{'backend':<12} {'rows':>7} {'rows/s':>10} {'median ms':>10} {'first row ms':>13} {'peak MB':>8}")
+    for entry in document['results']:
+        print(f"{entry['backend']:<12} {entry['rows']:>7} {entry['rows_per_second']:>10.0f} "
+              f"{entry['median_seconds'] * 1000:>10.1f} {entry['first_row_seconds'] * 1000:>13.1f} "
+              f"{entry['peak_memory_bytes'] / 1e6:>8.1f}")
+
+
+def parse_sizes(text):
+    """Parse a comma separated list of row counts"""
+    return [int(value) for value in text.split(',') if value.strip()]
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the PHIVOLCS page parser")
+    parser.add_argument('--sizes', type=parse_sizes, default=DEFAULT_SIZES, help="Comma separated row counts")
+    parser.add_argument('--backend', action='append', help="Only this parser backend (repeatable)")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against this results file and fail on regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown or memory growth as a fraction (default: 0.2)")
+    parser.add_argument('--save-baseline', help="Write the results as the new baseline file")
+    args = parser.parse_args()
+
+    document = run_benchmark(args.sizes, args.backend)
+    print_results(document)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=4)
+        print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(document, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
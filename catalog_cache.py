@@ -0,0 +1,73 @@
+"""
+Tremr - Catalog Cache
+Keeps the last good PHIVOLCS catalog on disk so it can be shown at startup and during outages
+"""
+
+import json
+import logging
+import os
+import time
+
+DEFAULT_CACHE_FILE = 'catalog_cache.json'
+DEFAULT_STALE_AFTER_SECONDS = 900
+
+
+def format_age(seconds):
+    """Format an age in seconds as a short human readable string"""
+    if seconds < 60:
+        return f"{int(seconds)} sec"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f} hr"
+    return f"{seconds / 86400:.1f} days"
+
+
+class CatalogCache:
+    """Last-good catalog stored as JSON. The file's modification time is the last successful fetch"""
+
+    def __init__(self, cache_file=DEFAULT_CACHE_FILE, stale_after_seconds=DEFAULT_STALE_AFTER_SECONDS):
+        self.cache_file = cache_file
+        self.stale_after_seconds = stale_after_seconds
+        self.last_saved = None
+
+    def load(self):
+        """Return the cached catalog data, or None if there is no usable cache"""
+        if not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable catalog cache: {e}")
+            return None
+
+        self.last_saved = data.get('earthquakes')
+        return data
+
+    def save(self, data):
+        """Store a freshly fetched catalog. Unchanged catalogs only refresh the timestamp"""
+        try:
+            if data.get('earthquakes') == self.last_saved and os.path.exists(self.cache_file):
+                os.utime(self.cache_file)
+                return
+
+            temp_file = self.cache_file + '.tmp'
+            with open(temp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_file, self.cache_file)
+            self.last_saved = data.get('earthquakes')
+        except OSError as e:
+            logging.warning(f"Could not update catalog cache: {e}")
+
+    def age_seconds(self):
+        """Seconds since the cached catalog was last confirmed, or None if there is no cache"""
+        try:
+            return max(0.0, time.time() - os.path.getmtime(self.cache_file))
+        except OSError:
+            return None
+
+    def is_stale(self):
+        """True when the cache is older than the staleness budget"""
+        age = self.age_seconds()
+        return age is not None and age > self.stale_after_seconds
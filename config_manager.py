@@ -0,0 +1,218 @@
+"""
+Tremr - Configuration Manager
+Validates config.json into an immutable snapshot and reloads it when the file changes, so a
+running monitor picks up new settings on its next check. Each rebuildable part of the monitor
+lists the settings it depends on in DEPENDENCIES; a reload rebuilds only the parts whose
+settings changed, and everything else reads the new snapshot on its next use.
+"""
+
+import json
+import logging
+import math
+import os
+from types import MappingProxyType
+
+NUMBER = 'number'
+INTEGER = 'integer'
+BOOLEAN = 'boolean'
+STRING = 'string'
+STRING_LIST = 'list of strings'
+LIST = 'list'
+
+# key: (kind, required, allows null, (low, high) or None)
+SCHEMA = {
+    'latitude': (NUMBER, True, False, (-90, 90)),
+    'longitude': (NUMBER, True, False, (-180, 180)),
+    'radius_km': (NUMBER, True, True, (0, None)),
+    'min_magnitude': (NUMBER, True, False, (-2, 10)),
+    'check_interval_seconds': (NUMBER, True, False, (1, None)),
+    'address': (STRING, False, True, None),
+    'phivolcs_url': (STRING, False, True, None),
+    'phivolcs_page_url': (STRING, False, True, None),
+    'fetch_timeout_seconds': (NUMBER, False, False, (0, None)),
+    'html_parser': (STRING, False, False, None),
+    'cache_stale_after_seconds': (NUMBER, False, False, (0, None)),
+    'catalog_cache_file': (STRING, False, True, None),
+    'geocode_cache_file': (STRING, False, True, None),
+    'snapshot_archive_dir': (STRING, False, True, None),
+    'snapshot_archive_max_mb': (NUMBER, False, False, (0, None)),
+    'snapshot_archive_max_age_days': (NUMBER, False, False, (0, None)),
+    'instrumentation_enabled': (BOOLEAN, False, False, None),
+    'metrics_log_every_cycles': (INTEGER, False, True, (0, None)),
+    'metrics_port': (INTEGER, False, True, (1, 65535)),
+    'metrics_host': (STRING, False, False, None),
+    'alert_latency_file': (STRING, False, True, None),
+    'alert_latency_slo_seconds': (NUMBER, False, False, (0, None)),
+    'alert_latency_window': (INTEGER, False, False, (1, None)),
+    'log_file': (STRING, False, False, None),
+    'log_max_mb': (NUMBER, False, False, (0, None)),
+    'log_backup_count': (INTEGER, False, False, (0, None)),
+    'log_json': (BOOLEAN, False, False, None),
+    'log_repeat_window_seconds': (NUMBER, False, False, (0, None)),
+    'subscribed_provinces': (STRING_LIST, False, True, None),
+    'subscribed_municipalities': (STRING_LIST, False, True, None),
+    'geofence_file': (STRING, False, True, None),
+    'geofence_zones': (STRING_LIST, False, True, None),
+    'geofence_cell_degrees': (NUMBER, False, False, (0.001, 10)),
+    'alert_rules': (LIST, False, True, None),
+    'subscriber_sites': (LIST, False, True, None),
+    'locality_file': (STRING, False, True, None),
+    'enrichment_places': (INTEGER, False, False, (0, None)),
+    'enrichment_sites': (INTEGER, False, False, (0, None)),
+    'stats_radius_km': (NUMBER, False, True, (0, None)),
+    'stats_bucket_minutes': (NUMBER, False, False, (1, None)),
+    'stats_window_hours': (NUMBER, False, False, (1, None)),
+    'completeness_magnitude': (NUMBER, False, False, (-2, 10)),
+    'anomaly_z_threshold': (NUMBER, False, False, (0, None)),
+    'anomaly_min_events': (INTEGER, False, False, (1, None)),
+    'sequence_link_km': (NUMBER, False, False, (0.1, None)),
+    'sequence_window_hours': (NUMBER, False, False, (0.01, None)),
+    'sequence_min_events': (INTEGER, False, False, (1, None)),
+    'group_sequence_alerts': (BOOLEAN, False, False, None),
+}
+
+# Parts of the monitor built from the settings, and the settings each is built from
+DEPENDENCIES = {
+    'subscription': {'subscribed_provinces', 'subscribed_municipalities'},
+    'geofence': {'geofence_file', 'geofence_zones', 'geofence_cell_degrees'},
+    'rules': {'alert_rules'},
+    'locality_index': {'latitude', 'longitude', 'locality_file', 'subscriber_sites',
+                       'enrichment_places', 'enrichment_sites'},
+    'stats': {'latitude', 'longitude', 'radius_km', 'stats_radius_km', 'stats_bucket_minutes',
+              'stats_window_hours', 'completeness_magnitude', 'anomaly_z_threshold', 'anomaly_min_events'},
+    'sequences': {'sequence_link_km', 'sequence_window_hours', 'sequence_min_events'},
+    'catalog_cache': {'catalog_cache_file', 'cache_stale_after_seconds'},
+    'latency_tracker': {'alert_latency_file', 'alert_latency_slo_seconds', 'alert_latency_window'},
+    'snapshot_archive': {'snapshot_archive_dir', 'snapshot_archive_max_mb', 'snapshot_archive_max_age_days'},
+    'logging': {'log_file', 'log_max_mb', 'log_backup_count', 'log_json', 'log_repeat_window_seconds'},
+    'metrics_exporter': {'metrics_port', 'metrics_host'},
+}
+
+
+class ConfigError(ValueError):
+    """A configuration that does not match the schema"""
+
+
+def freeze(value):
+    """Read-only copy of a JSON value: lists become tuples, objects become mapping proxies"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def check_value(key, value, kind, nullable, bounds):
+    """The value, typed for its kind; raises ConfigError"""
+    if value is None:
+        if nullable:
+            return None
+        raise ConfigError(f"{key} must not be null")
+    if kind in (NUMBER, INTEGER):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ConfigError(f"{key} must be a number, not {value!r}")
+        if kind == INTEGER:
+            if value != int(value):
+                raise ConfigError(f"{key} must be a whole number, not {value!r}")
+            value = int(value)
+        low, high = bounds or (None, None)
+        if (low is not None and value < low) or (high is not None and value > high):
+            raise ConfigError(f"{key} must be between {low} and {high if high is not None else 'any'}, not {value!r}")
+        return value
+    if kind == BOOLEAN:
+        if not isinstance(value, bool):
+            raise ConfigError(f"{key} must be true or false, not {value!r}")
+        return value
+    if kind == STRING:
+        if not isinstance(value, str):
+            raise ConfigError(f"{key} must be a string, not {value!r}")
+        return value
+    if not isinstance(value, (list, tuple)):
+        raise ConfigError(f"{key} must be a list, not {value!r}")
+    if kind == STRING_LIST and not all(isinstance(item, str) for item in value):
+        raise ConfigError(f"{key} must be a list of strings")
+    return value
+
+
+def validate(raw):
+    """
+    Check a configuration against SCHEMA and return it as a read-only snapshot.
+    Keys not in the schema are kept as they are
+    """
+    if not isinstance(raw, dict) and not isinstance(raw, MappingProxyType):
+        raise ConfigError("The configuration must be a JSON object")
+    config = dict(raw)
+    for key, (kind, required, nullable, bounds) in SCHEMA.items():
+        if key not in config:
+            if required:
+                raise ConfigError(f"{key} is missing")
+            continue
+        config[key] = check_value(key, config[key], kind, nullable, bounds)
+    for i, site in enumerate(config.get('subscriber_sites') or ()):
+        if not isinstance(site, (dict, MappingProxyType)):
+            raise ConfigError(f"subscriber_sites entry {i + 1} must be an object")
+        for key, bounds in (('latitude', (-90, 90)), ('longitude', (-180, 180))):
+            check_value(f"subscriber_sites entry {i + 1} {key}", site.get(key), NUMBER, False, bounds)
+    for i, rule in enumerate(config.get('alert_rules') or ()):
+        if not isinstance(rule, str) and not (isinstance(rule, (dict, MappingProxyType)) and isinstance(rule.get('when'), str)):
+            raise ConfigError(f"alert_rules entry {i + 1} must be a string or an object with \"when\"")
+    return freeze(config)
+
+
+def changed_keys(old, new):
+    """Keys added, removed or changed between two configurations"""
+    return frozenset(key for key in set(old) | set(new) if old.get(key, KeyError) != new.get(key, KeyError))
+
+
+def affected(changed):
+    """Names of the DEPENDENCIES parts that depend on any of the changed keys"""
+    return {name for name, keys in DEPENDENCIES.items() if not keys.isdisjoint(changed)}
+
+
+class ConfigManager:
+    """
+    Holds the current snapshot of a config file. reload() is cheap when nothing changed (one
+    stat call) and keeps the previous snapshot when the new file is invalid
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = None
+        self.signature = None
+
+    def file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def read(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return validate(json.load(f))
+
+    def load(self):
+        """Read and validate the file; raises OSError or ValueError (including ConfigError)"""
+        signature = self.file_signature()
+        self.snapshot = self.read()
+        self.signature = signature
+        return self.snapshot
+
+    def reload(self):
+        """
+        Swap in the file's settings if it changed since the last look. Returns the changed keys,
+        or None when there is nothing new
+        """
+        signature = self.file_signature()
+        if signature is None or signature == self.signature:
+            return None
+        # Remember the signature even if the file is invalid, so the error is logged once
+        self.signature = signature
+        try:
+            snapshot = self.read()
+        except (OSError, ValueError) as e:
+            logging.error(f"Ignoring the changed {self.path}, keeping the current settings: {e}")
+            return None
+        changed = changed_keys(self.snapshot or {}, snapshot)
+        self.snapshot = snapshot
+        return changed or None
@@ -0,0 +1,25 @@
+"""
+Test setup: the log file and the generated notification icon go to a temporary directory, not the working tree
+"""
+
+import os
+import shutil
+import tempfile
+
+import logging_setup
+
+OUTPUT_DIRECTORY = tempfile.mkdtemp(prefix='tremr-tests-')
+
+# Monitors built by the tests log through setup_logging_from_config, which reads this default
+logging_setup.DEFAULT_LOG_FILE = os.path.join(OUTPUT_DIRECTORY, 'earthquake_monitor.log')
+
+import main  # noqa: E402 - sets up logging to the working tree's log file on import, replaced below
+
+logging_setup.setup_logging(logging_setup.DEFAULT_LOG_FILE)
+main.ICON_DIRECTORY = OUTPUT_DIRECTORY
+
+
+def pytest_unconfigure(config):
+    """Flush the log and remove the temporary directory once the run is over"""
+    logging_setup.stop_logging()
+    shutil.rmtree(OUTPUT_DIRECTORY, ignore_errors=True)
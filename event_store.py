@@ -0,0 +1,91 @@
+"""
+Tremr - Earthquake Event Store
+SQLite-backed history of every earthquake Tremr has scraped or backfilled
+"""
+
+import sqlite3
+import logging
+from phivolcs_scraper import parse_origin_time
+
+DEFAULT_DB_FILE = 'earthquake_events.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_id    TEXT PRIMARY KEY,
+    origin_time REAL,
+    date        TEXT,
+    time        TEXT,
+    latitude    TEXT,
+    longitude   TEXT,
+    depth       TEXT,
+    magnitude   TEXT,
+    location    TEXT,
+    source      TEXT
+);
+CREATE INDEX IF NOT EXISTS events_origin_time ON events (origin_time);
+"""
+
+COLUMNS = ['date', 'time', 'latitude', 'longitude', 'depth', 'magnitude', 'location']
+
+
+def event_key(earthquake):
+    """Create the store key for an earthquake (same layout as EarthquakeMonitor.create_earthquake_id)"""
+    return f"{earthquake.get('date', '')}_{earthquake.get('time', '')}_{earthquake.get('latitude', '')}_{earthquake.get('longitude', '')}"
+
+
+class EventStore:
+    def __init__(self, db_file=DEFAULT_DB_FILE):
+        """Open (and create if needed) the event database"""
+        self.db_file = db_file
+        self.connection = sqlite3.connect(db_file)
+        self.connection.executescript(SCHEMA)
+
+    def add_events(self, earthquakes, source='live'):
+        """Insert earthquakes in one transaction, ignoring ones already stored. Returns the number inserted"""
+        rows = [
+            (event_key(eq), parse_origin_time(eq)) + tuple(eq.get(column, '') for column in COLUMNS) + (source,)
+            for eq in earthquakes
+        ]
+
+        with self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO events "
+                "(event_id, origin_time, date, time, latitude, longitude, depth, magnitude, location, source) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            inserted = self.connection.total_changes - before
+
+        logging.debug(f"Stored {inserted} of {len(rows)} earthquakes from {source}")
+        return inserted
+
+    def count(self):
+        """Return the number of stored earthquakes"""
+        return self.connection.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def iter_events(self, start=None, end=None):
+        """Yield stored earthquakes in origin-time order, optionally limited to [start, end) Unix times"""
+        query = f"SELECT {', '.join(COLUMNS)} FROM events WHERE origin_time IS NOT NULL"
+        params = []
+        if start is not None:
+            query += " AND origin_time >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND origin_time < ?"
+            params.append(end)
+        query += " ORDER BY origin_time"
+
+        for row in self.connection.execute(query, params):
+            yield dict(zip(COLUMNS, row))
+
+    def numeric_rows(self):
+        """Yield (origin_time, latitude, longitude, magnitude) as floats for every timed event"""
+        return self.connection.execute(
+            "SELECT origin_time, CAST(latitude AS REAL), CAST(longitude AS REAL), CAST(magnitude AS REAL) "
+            "FROM events WHERE origin_time IS NOT NULL"
+        )
+
+    def close(self):
+        """Close the database connection"""
+        self.connection.close()
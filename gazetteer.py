@@ -0,0 +1,254 @@
+"""
+Tremr - Offline Philippine Gazetteer
+A bundled list of provinces, cities and municipalities with coordinates (philippine_places.tsv),
+loaded lazily into a prefix trie for as-you-type completion and for resolving place names
+(including the reference towns in PHIVOLCS location strings) without any network call
+"""
+
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+
+DEFAULT_GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'philippine_places.tsv')
+DEFAULT_LIMIT = 8
+# Completions kept at every trie node, so a one-letter prefix is as cheap as a full name
+TOP_COMPLETIONS = 16
+KIND_RANK = {'province': 0, 'city': 1, 'municipality': 2}
+
+# "005 km S 52° W of Nasugbu (Batangas)" -> "Nasugbu", "Batangas"
+LOCATION_PLACE = re.compile(r'\bof\s+(?P<name>[^()]+?)\s*(?:\((?P<province>[^()]+)\))?\s*$', re.IGNORECASE)
+# "Nasugbu (Batangas)" or "Nasugbu, Batangas"
+QUERY_PLACE = re.compile(r'^(?P<name>[^(),]+?)\s*(?:\((?P<paren>[^()]+)\)|,\s*(?P<comma>[^(),]+))?$')
+
+
+def normalize_name(text):
+    """Lowercase, accents removed ("Parañaque" -> "paranaque"), punctuation as single spaces"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower().replace("'", '')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text).split())
+
+
+class Place(namedtuple('Place', 'name kind province latitude longitude')):
+    """One gazetteer entry"""
+    __slots__ = ()
+
+    @property
+    def label(self):
+        """Display name, e.g. "Nasugbu (Batangas)" or "Batangas (province)" """
+        if self.kind == 'province':
+            return f"{self.name} (province)"
+        return f"{self.name} ({self.province})"
+
+    @property
+    def rank(self):
+        """Sort key: provinces, then cities, then municipalities; shorter names first"""
+        return (KIND_RANK.get(self.kind, len(KIND_RANK)), len(self.name), self.name)
+
+
+def place_to_result(place):
+    """Convert a Place to the result shape used by the geocode cache"""
+    return {'latitude': place.latitude, 'longitude': place.longitude, 'address': f"{place.label}, Philippines"}
+
+
+class TrieNode:
+    __slots__ = ('children', 'best')
+
+    def __init__(self):
+        self.children = {}
+        self.best = []
+
+
+class PrefixTrie:
+    """
+    Character trie over normalized keys. Every node keeps the TOP_COMPLETIONS best-ranked values
+    below it, so completing a prefix costs O(len(prefix)) however many places share it
+    """
+
+    def __init__(self):
+        self.root = TrieNode()
+
+    def insert(self, key, value, rank):
+        node = self.root
+        self.add_best(node, value, rank)
+        for char in key:
+            node = node.children.setdefault(char, TrieNode())
+            self.add_best(node, value, rank)
+
+    @staticmethod
+    def add_best(node, value, rank):
+        best = node.best
+        if len(best) >= TOP_COMPLETIONS and rank >= best[-1][0]:
+            return
+        if any(existing is value for _, existing in best):
+            return
+        # Kept sorted by rank; ties keep insertion order
+        position = len(best)
+        while position and best[position - 1][0] > rank:
+            position -= 1
+        best.insert(position, (rank, value))
+        del best[TOP_COMPLETIONS:]
+
+    def find(self, prefix):
+        """The node for a prefix, or None"""
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """Best-ranked values with a key starting with prefix"""
+        node = self.find(prefix)
+        if node is None:
+            return []
+        return [value for _, value in node.best[:limit]]
+
+    def values(self, prefix):
+        """Every value with a key starting with prefix (a full walk of the subtree)"""
+        node = self.find(prefix)
+        if node is None:
+            return []
+        found = {}
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for _, value in node.best:
+                found[id(value)] = value
+            if len(node.best) >= TOP_COMPLETIONS:
+                stack.extend(node.children.values())
+        return list(found.values())
+
+
+class Gazetteer:
+    """Places indexed by exact normalized name and by prefix of the name or any later word in it"""
+
+    def __init__(self, places):
+        self.places = list(places)
+        self.by_name = {}
+        self.trie = PrefixTrie()
+        for place in self.places:
+            key = normalize_name(place.name)
+            self.by_name.setdefault(key, []).append(place)
+            # "Quezon City" is also found by typing "city", "San Jose" by "jose"
+            words = key.split(' ')
+            for start in range(len(words)):
+                self.trie.insert(' '.join(words[start:]), place, place.rank)
+        for candidates in self.by_name.values():
+            candidates.sort(key=lambda place: place.rank)
+
+    def __len__(self):
+        return len(self.places)
+
+    def complete(self, text, limit=DEFAULT_LIMIT):
+        """
+        Places matching what has been typed so far. "san jose, occ" or "san jose (occ"
+        narrows the matches to provinces starting with the text after the separator
+        """
+        name, _, province = text.replace('(', ',').partition(',')
+        prefix = normalize_name(name)
+        if not prefix:
+            return []
+        province = normalize_name(province)
+        if not province:
+            return self.trie.complete(prefix, limit)
+        matches = [place for place in self.trie.values(prefix) if normalize_name(place.province).startswith(province)]
+        return sorted(matches, key=lambda place: place.rank)[:limit]
+
+    def lookup(self, name, province=None):
+        """Best place with exactly this name (and a province starting with province, if given)"""
+        key = normalize_name(name)
+        keys = [key]
+        # PHIVOLCS writes cities as "City Of Mati" or "Manila City" while the gazetteer has "Mati" and "Manila"
+        if key.startswith('city of '):
+            keys += [key[len('city of '):], key[len('city of '):] + ' city']
+        elif key.endswith(' city'):
+            keys.append(key[:-len(' city')])
+        province_key = normalize_name(province) if province else ''
+        for key in keys:
+            for place in self.by_name.get(key, []):
+                if not province_key or normalize_name(place.province).startswith(province_key):
+                    return place
+        return None
+
+    def resolve(self, text):
+        """
+        The place a search box entry names, or None if it isn't just a place name.
+        Accepts "Nasugbu", "Nasugbu (Batangas)", "Nasugbu, Batangas" and a trailing ", Philippines";
+        street addresses return None so the caller can fall back to an online geocoder
+        """
+        text = re.sub(r',?\s*philippines\s*$', '', text.strip(), flags=re.IGNORECASE)
+        if text.lower().endswith(' (province)'):
+            return self.lookup(text[:-len(' (province)')])
+        match = QUERY_PLACE.match(text)
+        if not match:
+            return None
+        # "Quezon City, Metro Manila" names the province; "Commonwealth, Quezon City" doesn't resolve
+        return self.lookup(match.group('name'), match.group('paren') or match.group('comma'))
+
+    def resolve_location_string(self, location):
+        """The reference town of a PHIVOLCS location string such as "005 km S 52° W of Nasugbu (Batangas)" """
+        if not location:
+            return None
+        match = LOCATION_PLACE.search(location)
+        if match:
+            place = self.lookup(match.group('name'), match.group('province'))
+            if place is None and match.group('province'):
+                place = self.lookup(match.group('province'))
+            return place
+        return self.resolve(location)
+
+
+def load_places(path=DEFAULT_GAZETTEER_FILE):
+    """Read places from a tab separated file: name, kind, province, latitude, longitude"""
+    places = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            try:
+                name, kind, province, latitude, longitude = fields
+                places.append(Place(name, kind, province, float(latitude), float(longitude)))
+            except ValueError:
+                logging.warning(f"Skipping malformed gazetteer line {line_number}: {line!r}")
+    return places
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """The bundled gazetteer, loaded on first use"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                try:
+                    places = load_places()
+                except OSError as e:
+                    logging.warning(f"Could not load gazetteer: {e}")
+                    places = []
+                _gazetteer = Gazetteer(places)
+                logging.info(f"Loaded gazetteer with {len(_gazetteer)} places")
+    return _gazetteer
+
+
+def complete(text, limit=DEFAULT_LIMIT):
+    """Completions for text from the bundled gazetteer"""
+    return get_gazetteer().complete(text, limit)
+
+
+def resolve(text):
+    """Resolve a search box entry with the bundled gazetteer"""
+    return get_gazetteer().resolve(text)
+
+
+def resolve_location_string(location):
+    """Resolve the reference town of a PHIVOLCS location string with the bundled gazetteer"""
+    return get_gazetteer().resolve_location_string(location)
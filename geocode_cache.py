@@ -0,0 +1,172 @@
+"""
+Tremr - Geocoding Cache and Worker
+Address lookups run on a worker thread with debouncing and cancellation,
+and results are kept in a persistent LRU cache so repeat searches are instant
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_GEOCODE_CACHE_FILE = 'geocode_cache.json'
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_DEBOUNCE_SECONDS = 0.4
+
+
+def normalize_query(text):
+    """Cache key for an address: case, spacing and punctuation around commas don't matter"""
+    text = re.sub(r'\s*,\s*', ', ', text.strip().lower())
+    return re.sub(r'\s+', ' ', text).strip(' ,.')
+
+
+class GeocodeCache:
+    """Least-recently-used map of normalized query -> {'latitude', 'longitude', 'address'}, saved to disk"""
+
+    def __init__(self, cache_file=DEFAULT_GEOCODE_CACHE_FILE, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load saved results, oldest first"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                for key, result in json.load(f):
+                    self.entries[key] = result
+        except (OSError, ValueError, TypeError) as e:
+            logging.warning(f"Could not read geocode cache: {e}")
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        """Write the cache atomically"""
+        if not self.cache_file:
+            return
+        with self.lock:
+            items = list(self.entries.items())
+        try:
+            temp_file = self.cache_file + '.tmp'
+            with open(temp_file, 'w') as f:
+                json.dump(items, f)
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            logging.warning(f"Could not save geocode cache: {e}")
+
+    def get(self, query):
+        """Cached result for a query, or None"""
+        key = normalize_query(query)
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+            return result
+
+    def put(self, query, result):
+        """Store a result, evicting the least recently used beyond max_entries"""
+        key = normalize_query(query)
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self.save()
+
+
+def location_to_result(location):
+    """Convert a geopy Location to a cache entry"""
+    return {'latitude': location.latitude, 'longitude': location.longitude, 'address': location.address}
+
+
+class GeocodeWorker:
+    """
+    Runs geocode(query) -> geopy Location (or None) on a background thread
+    Only the latest request is served: a new lookup or cancel() supersedes any pending or in-flight one,
+    and superseded callbacks are never called. Callbacks run on the worker thread, so GUIs should
+    hand them to their event loop (e.g. root.after)
+    """
+
+    def __init__(self, geocode, cache=None, debounce_seconds=DEFAULT_DEBOUNCE_SECONDS):
+        self.geocode = geocode
+        self.cache = cache
+        self.debounce_seconds = debounce_seconds
+        self.generation = 0
+        self.pending = None
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def lookup(self, query, callback, delay=None):
+        """
+        Look up query and call callback(result, error) with a cache entry dict (None if not found)
+        Cached results are returned immediately (the callback is called before lookup returns).
+        delay overrides the debounce, e.g. 0 for an explicit search button
+        """
+        cached = self.cache.get(query) if self.cache else None
+        with self.condition:
+            self.generation += 1
+            if cached is not None:
+                self.pending = None
+            else:
+                due = time.monotonic() + (self.debounce_seconds if delay is None else delay)
+                self.pending = (self.generation, query, callback, due)
+                self.condition.notify()
+        if cached is not None:
+            callback(cached, None)
+            return True
+        return False
+
+    def cancel(self):
+        """Drop the pending request and ignore the result of the one in flight"""
+        with self.condition:
+            self.generation += 1
+            self.pending = None
+
+    def stop(self):
+        """Stop the worker thread"""
+        with self.condition:
+            self.stopped = True
+            self.pending = None
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.stopped:
+                    if self.pending:
+                        wait = self.pending[3] - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self.condition.wait(wait)
+                    else:
+                        self.condition.wait()
+                if self.stopped:
+                    return
+                generation, query, callback, _ = self.pending
+                self.pending = None
+
+            result = error = None
+            try:
+                location = self.geocode(query)
+                result = location_to_result(location) if location else None
+            except Exception as e:
+                error = e
+
+            if result is not None and self.cache:
+                self.cache.put(query, result)
+
+            with self.condition:
+                current = generation == self.generation
+            if current:
+                try:
+                    callback(result, error)
+                except Exception as e:
+                    logging.error(f"Geocode callback failed: {e}")
@@ -0,0 +1,196 @@
+"""
+Tremr - Polygon Geofences
+Alert zones loaded from GeoJSON (provinces, fault corridors, custom areas) and prepared into a
+uniform grid: each cell lists only the zones that reach it, as either "wholly inside" or the few
+zone edges that can cross a ray from that cell. A point is then tested against those edges alone
+with a vectorized ray cast, so lookups cost about the same however many zones are loaded.
+"""
+
+import json
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_CELL_DEGREES = 0.1
+# Cells are classified in chunks so huge zones don't build one enormous points x edges matrix
+CLASSIFY_CHUNK = 2048
+
+Zone = namedtuple('Zone', 'name properties edges bounds')
+
+
+def ring_edges(ring):
+    """(n, 4) array of x1, y1, x2, y2 for a closed or open ring of [lon, lat] positions"""
+    points = np.asarray(ring, dtype=float)[:, :2]
+    if len(points) < 3:
+        return np.empty((0, 4))
+    if not np.array_equal(points[0], points[-1]):
+        points = np.vstack((points, points[:1]))
+    return np.hstack((points[:-1], points[1:]))
+
+
+def ray_cast(xs, ys, edges):
+    """
+    Even-odd point-in-polygon for many points against one set of edges: a boolean per point.
+    Holes and multi-part polygons need no special handling because all their rings are in edges
+    """
+    xs = np.asarray(xs, dtype=float)[:, None]
+    ys = np.asarray(ys, dtype=float)[:, None]
+    x1, y1, x2, y2 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+    straddles = (y1 > ys) != (y2 > ys)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_x = x1 + (ys - y1) * (x2 - x1) / (y2 - y1)
+    return ((straddles & (xs < crossing_x)).sum(axis=1) % 2) == 1
+
+
+def zones_from_geojson(document):
+    """Zones from a GeoJSON FeatureCollection, Feature or bare Polygon/MultiPolygon"""
+    if document.get('type') == 'FeatureCollection':
+        features = document.get('features', [])
+    elif document.get('type') == 'Feature':
+        features = [document]
+    else:
+        features = [{'type': 'Feature', 'properties': {}, 'geometry': document}]
+
+    zones = []
+    for number, feature in enumerate(features, 1):
+        geometry = feature.get('geometry') or {}
+        properties = feature.get('properties') or {}
+        if geometry.get('type') == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            logging.warning(f"Skipping geofence feature {number}: unsupported geometry {geometry.get('type')}")
+            continue
+        edges = [ring_edges(ring) for polygon in polygons for ring in polygon]
+        edges = np.vstack(edges) if edges else np.empty((0, 4))
+        if not len(edges):
+            continue
+        name = properties.get('name') or feature.get('id') or f"Zone {number}"
+        bounds = (min(edges[:, 0].min(), edges[:, 2].min()), min(edges[:, 1].min(), edges[:, 3].min()),
+                  max(edges[:, 0].max(), edges[:, 2].max()), max(edges[:, 1].max(), edges[:, 3].max()))
+        zones.append(Zone(str(name), properties, edges, bounds))
+    return zones
+
+
+def load_zones(path):
+    """Zones from a GeoJSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return zones_from_geojson(json.load(f))
+
+
+class GeofenceIndex:
+    """
+    Uniform grid over the zones' bounding box. cells maps a cell number to a list of
+    (zone number, edges) where edges is None when the whole cell lies inside the zone
+    """
+
+    def __init__(self, zones, cell_degrees=DEFAULT_CELL_DEGREES):
+        self.zones = list(zones)
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+        if not self.zones:
+            self.origin = (0.0, 0.0)
+            self.columns = self.rows = 0
+            return
+        self.origin = (min(zone.bounds[0] for zone in self.zones), min(zone.bounds[1] for zone in self.zones))
+        self.columns = int(np.floor((max(zone.bounds[2] for zone in self.zones) - self.origin[0]) / cell_degrees)) + 1
+        self.rows = int(np.floor((max(zone.bounds[3] for zone in self.zones) - self.origin[1]) / cell_degrees)) + 1
+        for number, zone in enumerate(self.zones):
+            self.prepare(number, zone)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def cell_range(self, low, high, origin, count):
+        first = int(np.floor((low - origin) / self.cell_degrees))
+        last = int(np.floor((high - origin) / self.cell_degrees))
+        return max(first, 0), min(last, count - 1)
+
+    def prepare(self, number, zone):
+        """Classify every cell under a zone's bounding box as boundary, inside or outside"""
+        edges = zone.edges
+        x0, y0 = self.origin
+        size = self.cell_degrees
+
+        # Cells touched by an edge's bounding box may contain boundary: those keep edges to test
+        boundary = set()
+        low_x = np.minimum(edges[:, 0], edges[:, 2])
+        high_x = np.maximum(edges[:, 0], edges[:, 2])
+        low_y = np.minimum(edges[:, 1], edges[:, 3])
+        high_y = np.maximum(edges[:, 1], edges[:, 3])
+        for lx, hx, ly, hy in zip(low_x, high_x, low_y, high_y):
+            first_column, last_column = self.cell_range(lx, hx, x0, self.columns)
+            first_row, last_row = self.cell_range(ly, hy, y0, self.rows)
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    boundary.add(row * self.columns + column)
+
+        for cell in boundary:
+            row, column = divmod(cell, self.columns)
+            band_low, band_high = y0 + row * size, y0 + (row + 1) * size
+            # Only edges in this cell's row band, and reaching right of the cell's left side, can cross the ray
+            useful = (high_y >= band_low) & (low_y <= band_high) & (high_x >= x0 + column * size)
+            self.cells.setdefault(cell, []).append((number, edges[useful]))
+
+        # Every other cell in the bounding box is wholly inside or wholly outside: test its centre once
+        first_column, last_column = self.cell_range(zone.bounds[0], zone.bounds[2], x0, self.columns)
+        first_row, last_row = self.cell_range(zone.bounds[1], zone.bounds[3], y0, self.rows)
+        rows, columns = np.mgrid[first_row:last_row + 1, first_column:last_column + 1]
+        candidates = (rows * self.columns + columns).ravel()
+        candidates = candidates[~np.isin(candidates, list(boundary))]
+        for start in range(0, len(candidates), CLASSIFY_CHUNK):
+            chunk = candidates[start:start + CLASSIFY_CHUNK]
+            chunk_rows, chunk_columns = np.divmod(chunk, self.columns)
+            inside = ray_cast(x0 + (chunk_columns + 0.5) * size, y0 + (chunk_rows + 0.5) * size, edges)
+            for cell in chunk[inside]:
+                self.cells.setdefault(int(cell), []).append((number, None))
+
+    def cell_of(self, lons, lats):
+        """Cell numbers for arrays of points, -1 outside the grid"""
+        columns = np.floor((np.asarray(lons, dtype=float) - self.origin[0]) / self.cell_degrees).astype(int)
+        rows = np.floor((np.asarray(lats, dtype=float) - self.origin[1]) / self.cell_degrees).astype(int)
+        outside = (columns < 0) | (columns >= self.columns) | (rows < 0) | (rows >= self.rows)
+        return np.where(outside, -1, rows * self.columns + columns)
+
+    def zones_at(self, latitude, longitude):
+        """Names of the zones containing a point"""
+        return self.zones_at_batch([latitude], [longitude])[0]
+
+    def zones_at_batch(self, latitudes, longitudes):
+        """Names of the zones containing each point, testing each group of points in a cell together"""
+        lats = np.asarray(latitudes, dtype=float)
+        lons = np.asarray(longitudes, dtype=float)
+        results = [[] for _ in range(len(lats))]
+        if not self.cells or not len(lats):
+            return results
+
+        cells = self.cell_of(lons, lats)
+        for cell in np.unique(cells):
+            entries = self.cells.get(int(cell)) if cell >= 0 else None
+            if not entries:
+                continue
+            members = np.nonzero(cells == cell)[0]
+            for number, edges in entries:
+                inside = members if edges is None else members[ray_cast(lons[members], lats[members], edges)]
+                for member in inside:
+                    results[member].append(self.zones[number].name)
+        return results
+
+    @classmethod
+    def from_config(cls, config):
+        """Zones from the geofence_file GeoJSON, optionally only those named in geofence_zones; None if unset"""
+        path = config.get('geofence_file')
+        if not path:
+            return None
+        try:
+            zones = load_zones(path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not load geofences from {path}: {e}")
+            return None
+        wanted = config.get('geofence_zones')
+        if wanted:
+            zones = [zone for zone in zones if zone.name in set(wanted)]
+        logging.info(f"Loaded {len(zones)} geofence zone(s) from {path}")
+        return cls(zones, config.get('geofence_cell_degrees', DEFAULT_CELL_DEGREES))
@@ -6,12 +6,20 @@ Minimalist interface for earthquake monitoring
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
+import argparse
 import json
 import os
 import sys
 import winreg
 from geopy.geocoders import Nominatim
-from main import EarthquakeMonitor
+from main import EarthquakeMonitor, scrape_options
+from phivolcs_scraper import check_connection
+from poll_scheduler import PollScheduler
+from instrumentation import metrics
+from profiling import add_profile_arguments, create_profiler
+from catalog_cache import CatalogCache, format_age, DEFAULT_CACHE_FILE, DEFAULT_STALE_AFTER_SECONDS
+from geocode_cache import GeocodeCache, GeocodeWorker, DEFAULT_GEOCODE_CACHE_FILE
+import gazetteer
 import logging
 from PIL import Image, ImageTk
 import pystray
@@ -19,8 +27,10 @@ import tempfile
 import tkintermapview
 
 class EarthquakeMonitorGUI:
-    def __init__(self, root):
+    def __init__(self, root, profiler=None):
         self.root = root
+        # profiling.CycleProfiler from --profile, handed to the monitor when it starts
+        self.profiler = profiler
         self.root.title("Tremr")
         self.root.geometry("450x750")  # 50% width (450) x increased height for vertical layout
         self.root.resizable(False, False)
@@ -61,10 +71,11 @@ class EarthquakeMonitorGUI:
 
         # Variables
         self.monitor = None
-        self.monitor_thread = None
+        self.scheduler = None
         self.is_monitoring = False
         self.config_file = 'config.json'
         self.config = self.load_config()
+        self.settings_job = None
 
         # System tray variables
         self.tray_icon = None
@@ -74,8 +85,23 @@ class EarthquakeMonitorGUI:
         self.connection_check_interval = 30000  # Check every 30 seconds
         self.last_connection_status = None
 
-        # Initialize geocoder
+        # Last good catalog, shown immediately and during outages
+        self.catalog_cache = CatalogCache(
+            self.config.get('catalog_cache_file', DEFAULT_CACHE_FILE),
+            self.config.get('cache_stale_after_seconds', DEFAULT_STALE_AFTER_SECONDS)
+        )
+
+        # Initialize geocoder: lookups run on a worker thread, results are cached across sessions
         self.geolocator = Nominatim(user_agent="tremr")
+        self.geocoder = GeocodeWorker(
+            lambda query: self.geolocator.geocode(query, timeout=10),
+            GeocodeCache(self.config.get('geocode_cache_file', DEFAULT_GEOCODE_CACHE_FILE))
+        )
+
+        # Address autocomplete from the offline gazetteer
+        self.suggestion_job = None
+        self.suggested_places = []
+        self.suppress_suggestions = False
 
         # Map variables
         self.map_widget = None
@@ -84,6 +110,7 @@ class EarthquakeMonitorGUI:
         # Setup GUI
         self.setup_ui()
         self.update_status()
+        self.show_cached_catalog()
 
         # Setup system tray
         self.setup_tray_icon()
@@ -109,9 +136,11 @@ class EarthquakeMonitorGUI:
             }
 
     def save_config(self):
-        """Save configuration"""
-        with open(self.config_file, 'w') as f:
+        """Save configuration (written to a temporary file and swapped in, so the monitor never reads half a file)"""
+        temporary = self.config_file + '.tmp'
+        with open(temporary, 'w') as f:
             json.dump(self.config, f, indent=4)
+        os.replace(temporary, self.config_file)
 
     def setup_tray_icon(self):
         """Setup system tray icon"""
@@ -186,6 +215,10 @@ class EarthquakeMonitorGUI:
         """Internal method to quit in main thread"""
         if self.is_monitoring:
             self.stop_monitoring()
+        # Let a check that is past its fetch deliver its alerts and save before exiting
+        if self.scheduler:
+            self.scheduler.join(timeout=5)
+        self.geocoder.stop()
 
         if self.tray_icon:
             self.tray_icon.stop()
@@ -303,6 +336,18 @@ class EarthquakeMonitorGUI:
         )
         self.connection_detail_label.pack(anchor=tk.W)
 
+        # Timing of the latest poll cycle (click for the full breakdown)
+        self.timing_label = tk.Label(
+            status_inner,
+            text="",
+            font=("Segoe UI", 7),
+            foreground=self.text_secondary,
+            bg=self.card_bg,
+            cursor="hand2"
+        )
+        self.timing_label.pack(anchor=tk.W)
+        self.timing_label.bind("<Button-1>", lambda event: self.show_timing_summary())
+
         # Map widget (full width for narrow window)
         try:
             self.map_widget = tkintermapview.TkinterMapView(
@@ -374,6 +419,30 @@ class EarthquakeMonitorGUI:
             bd=0
         )
         self.address_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5), ipady=3)
+        self.address_entry.bind("<Return>", lambda event: self.search_btn.invoke())
+        self.address_entry.bind("<Down>", self.focus_suggestions)
+        self.address_entry.bind("<Escape>", lambda event: self.hide_suggestions())
+        self.address_entry.bind("<FocusOut>", lambda event: self.root.after(200, self.hide_suggestions_unless_focused))
+        self.address_var.trace_add('write', self.on_address_typed)
+
+        # Suggestions drop down under the entry; a child of root so the card doesn't clip it
+        self.suggestion_list = tk.Listbox(
+            self.root,
+            font=("Segoe UI", 8),
+            bg="#0d0d0d",
+            fg=self.text_color,
+            selectbackground="#2a2a2a",
+            selectforeground=self.text_color,
+            relief=tk.FLAT,
+            highlightthickness=1,
+            highlightbackground="#3a3a3a",
+            activestyle=tk.NONE,
+            bd=0
+        )
+        self.suggestion_list.bind("<ButtonRelease-1>", lambda event: self.choose_suggestion())
+        self.suggestion_list.bind("<Return>", lambda event: self.choose_suggestion())
+        self.suggestion_list.bind("<Escape>", lambda event: self.hide_suggestions(focus_entry=True))
+        self.suggestion_list.bind("<FocusOut>", lambda event: self.root.after(200, self.hide_suggestions_unless_focused))
 
         self.search_btn = tk.Button(
             address_row,
@@ -521,6 +590,10 @@ class EarthquakeMonitorGUI:
         self.magnitude_var = tk.DoubleVar(value=self.config.get('min_magnitude', 3.0))
         self.interval_var = tk.IntVar(value=self.config.get('check_interval_seconds', 60))
 
+        # While monitoring, setting changes are saved and picked up by the running monitor
+        for variable in (self.radius_var, self.magnitude_var, self.interval_var):
+            variable.trace_add('write', self.on_settings_changed)
+
         # Add sparkle decoration in bottom right
         self.add_sparkle_decoration()
 
@@ -605,85 +678,185 @@ class EarthquakeMonitorGUI:
         """Load recent logs from file - disabled in new design"""
         pass
 
+    def on_address_typed(self, *args):
+        """Refresh the suggestions shortly after typing pauses"""
+        if self.suppress_suggestions:
+            return
+        if self.suggestion_job:
+            self.root.after_cancel(self.suggestion_job)
+        self.suggestion_job = self.root.after(150, self.update_suggestions)
+
+    def update_suggestions(self):
+        """Show gazetteer completions for the address typed so far"""
+        self.suggestion_job = None
+        text = self.address_var.get()
+        if str(self.address_entry.cget('state')) == tk.DISABLED or len(text.strip()) < 2:
+            self.hide_suggestions()
+            return
+
+        self.suggested_places = gazetteer.complete(text)
+        if not self.suggested_places:
+            self.hide_suggestions()
+            return
+
+        self.suggestion_list.delete(0, tk.END)
+        for place in self.suggested_places:
+            self.suggestion_list.insert(tk.END, place.label)
+        self.suggestion_list.configure(height=len(self.suggested_places))
+        self.suggestion_list.place(in_=self.address_entry, x=0, rely=1.0, relwidth=1.0)
+        self.suggestion_list.lift()
+
+    def focus_suggestions(self, event=None):
+        """Move from the address entry into the suggestions (Down arrow)"""
+        if self.suggestion_list.winfo_ismapped():
+            self.suggestion_list.focus_set()
+            self.suggestion_list.selection_clear(0, tk.END)
+            self.suggestion_list.selection_set(0)
+            self.suggestion_list.activate(0)
+        return "break"
+
+    def hide_suggestions(self, focus_entry=False):
+        """Close the suggestions"""
+        self.suggestion_list.place_forget()
+        if focus_entry:
+            self.address_entry.focus_set()
+
+    def hide_suggestions_unless_focused(self):
+        """Close the suggestions once focus has left both the entry and the list"""
+        if self.root.focus_get() not in (self.address_entry, self.suggestion_list):
+            self.hide_suggestions()
+
+    def choose_suggestion(self):
+        """Use the selected suggestion's coordinates directly, with no network lookup"""
+        selection = self.suggestion_list.curselection()
+        if not selection:
+            return
+        place = self.suggested_places[selection[0]]
+        self.suppress_suggestions = True
+        try:
+            self.address_var.set(place.label)
+        finally:
+            self.suppress_suggestions = False
+        self.hide_suggestions(focus_entry=True)
+        self.geocoder.cancel()
+        self.finish_address_search(place.label, gazetteer.place_to_result(place), None)
+
     def search_address(self):
-        """Search for address and get coordinates"""
+        """Search for address and get coordinates, without blocking the window on the network"""
         address = self.address_var.get().strip()
 
         if not address:
             messagebox.showwarning("Empty Address", "Please enter an address to search.")
             return
 
+        self.hide_suggestions()
         self.log(f"Searching for: {address}")
+
+        # Towns, cities and provinces resolve offline; anything more specific goes to Nominatim
+        place = gazetteer.resolve(address)
+        if place:
+            self.geocoder.cancel()
+            self.finish_address_search(address, gazetteer.place_to_result(place), None)
+            return
+
         self.search_btn.configure(state=tk.DISABLED, text="Searching...")
-        self.root.update()
 
-        try:
-            # Search in a thread to avoid freezing GUI
-            location = self.geolocator.geocode(address, timeout=10)
+        # Cached addresses complete immediately; others are looked up on the geocoding worker
+        self.geocoder.lookup(
+            address,
+            lambda result, error: self.root.after(0, self.finish_address_search, address, result, error),
+            delay=0
+        )
 
-            if location:
-                self.config['latitude'] = location.latitude
-                self.config['longitude'] = location.longitude
-                self.config['address'] = address
+    def finish_address_search(self, address, result, error):
+        """Apply a geocoding result (runs on the Tk main thread)"""
+        self.search_btn.configure(state=tk.NORMAL, text="Search")
 
-                self.coords_label.configure(
-                    text=f"Coordinates: {location.latitude:.4f}, {location.longitude:.4f}"
-                )
-                self.log(f"[+] Found: {location.address}")
-                self.log(f"  Coordinates: {location.latitude:.4f}, {location.longitude:.4f}")
-
-                # Update map marker if map widget exists
-                if self.map_widget:
-                    try:
-                        # Remove old marker if it exists
-                        if self.location_marker:
-                            self.location_marker.delete()
-
-                        # Set new position on map
-                        self.map_widget.set_position(location.latitude, location.longitude)
-                        self.map_widget.set_zoom(6)
-
-                        # Add new marker
-                        self.location_marker = self.map_widget.set_marker(
-                            location.latitude,
-                            location.longitude,
-                            text="",
-                            marker_color_circle="red",
-                            marker_color_outside="darkred"
-                        )
-                    except Exception as e:
-                        logging.error(f"Error updating map: {e}")
+        if error is not None:
+            messagebox.showerror("Error", f"Error searching address:\n{str(error)}")
+            self.log(f"[-] Error: {str(error)}")
+            return
 
-                messagebox.showinfo(
-                    "Location Found",
-                    f"Location set to:\n{location.address}\n\n"
-                    f"Coordinates: {location.latitude:.4f}, {location.longitude:.4f}"
-                )
-            else:
-                messagebox.showerror(
-                    "Location Not Found",
-                    "Could not find the address. Please try:\n"
-                    "- A more specific address\n"
-                    "- Including city and country\n"
-                    "- Example: 'Quezon City, Philippines'"
+        if not result:
+            messagebox.showerror(
+                "Location Not Found",
+                "Could not find the address. Please try:\n"
+                "- A more specific address\n"
+                "- Including city and country\n"
+                "- Example: 'Quezon City, Philippines'"
+            )
+            self.log("[-] Location not found")
+            return
+
+        latitude = result['latitude']
+        longitude = result['longitude']
+        self.config['latitude'] = latitude
+        self.config['longitude'] = longitude
+        self.config['address'] = address
+
+        self.coords_label.configure(
+            text=f"Coordinates: {latitude:.4f}, {longitude:.4f}"
+        )
+        self.log(f"[+] Found: {result['address']}")
+        self.log(f"  Coordinates: {latitude:.4f}, {longitude:.4f}")
+
+        # Update map marker if map widget exists
+        if self.map_widget:
+            try:
+                # Remove old marker if it exists
+                if self.location_marker:
+                    self.location_marker.delete()
+
+                # Set new position on map
+                self.map_widget.set_position(latitude, longitude)
+                self.map_widget.set_zoom(6)
+
+                # Add new marker
+                self.location_marker = self.map_widget.set_marker(
+                    latitude,
+                    longitude,
+                    text="",
+                    marker_color_circle="red",
+                    marker_color_outside="darkred"
                 )
-                self.log("[-] Location not found")
+            except Exception as e:
+                logging.error(f"Error updating map: {e}")
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Error searching address:\n{str(e)}")
-            self.log(f"[-] Error: {str(e)}")
+        messagebox.showinfo(
+            "Location Found",
+            f"Location set to:\n{result['address']}\n\n"
+            f"Coordinates: {latitude:.4f}, {longitude:.4f}"
+        )
 
-        finally:
-            self.search_btn.configure(state=tk.NORMAL, text="Search")
+    def store_settings(self):
+        """Copy the settings widgets into the config and save it. Raises ValueError (or TclError) for bad input"""
+        self.config['radius_km'] = float(self.radius_var.get())
+        self.config['min_magnitude'] = float(self.magnitude_var.get())
+        self.config['check_interval_seconds'] = int(self.interval_var.get())
+        self.save_config()
+
+    def on_settings_changed(self, *args):
+        """Save settings shortly after the slider stops moving, if monitoring"""
+        if not self.is_monitoring:
+            return
+        if self.settings_job:
+            self.root.after_cancel(self.settings_job)
+        self.settings_job = self.root.after(500, self.apply_settings)
+
+    def apply_settings(self):
+        """Save changed settings; the running monitor reloads them on its next check"""
+        self.settings_job = None
+        try:
+            self.store_settings()
+        except (ValueError, tk.TclError):
+            return
+        self.log(f"Settings saved: radius {self.config['radius_km']} km, min magnitude {self.config['min_magnitude']}")
 
     def start_monitoring(self):
         """Start earthquake monitoring"""
         # Save current settings
         try:
-            self.config['radius_km'] = float(self.radius_var.get())
-            self.config['min_magnitude'] = float(self.magnitude_var.get())
-            self.config['check_interval_seconds'] = int(self.interval_var.get())
-            self.save_config()
+            self.store_settings()
         except ValueError as e:
             messagebox.showerror("Invalid Settings", f"Please check your settings:\n{str(e)}")
             return
@@ -696,48 +869,48 @@ class EarthquakeMonitorGUI:
         self.log(f"Min Magnitude: {self.config['min_magnitude']}")
         self.log("=" * 50)
 
-        # Start monitoring in separate thread
+        # Start monitoring in separate thread. A monitor from an earlier run is kept warm; its
+        # first check picks up the settings just saved
         self.is_monitoring = True
-        self.monitor = EarthquakeMonitor(self.config_file)
-
-        self.monitor_thread = threading.Thread(target=self.monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        if self.monitor is None:
+            self.monitor = EarthquakeMonitor(self.config_file)
+        self.monitor.profiler = self.profiler
+        self.monitor.start_metrics_exporter()
+
+        self.scheduler = PollScheduler(
+            self.monitor,
+            on_cycle=lambda: self.root.after(0, self.update_timing_label),
+            on_error=self.on_monitor_error
+        )
+        self.scheduler.start()
 
         # Update UI
+        self.hide_suggestions()
         self.address_entry.configure(state=tk.DISABLED)
         self.search_btn.configure(state=tk.DISABLED)
         self.update_status(monitoring=True)
 
-    def monitor_loop(self):
-        """Monitoring loop running in separate thread"""
-        try:
-            while self.is_monitoring:
-                data = self.monitor.fetch_earthquake_data()
-                if data:
-                    self.monitor.process_earthquakes(data)
-
-                # Check at regular intervals
-                for _ in range(self.config['check_interval_seconds']):
-                    if not self.is_monitoring:
-                        break
-                    import time
-                    time.sleep(1)
-
-        except Exception as e:
-            self.log(f"Error in monitoring: {str(e)}")
-            self.is_monitoring = False
-            self.root.after(0, self.stop_monitoring)
+    def on_monitor_error(self, error):
+        """Stop monitoring after an unexpected error in a check (called on the polling thread)"""
+        self.log(f"Error in monitoring: {str(error)}")
+        self.root.after(0, self.stop_monitoring)
 
     def stop_monitoring(self):
         """Stop earthquake monitoring"""
+        if not self.is_monitoring:
+            return
         self.log("Stopping monitoring...")
         self.is_monitoring = False
 
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=2)
+        # Returns at once: a fetch in flight is abandoned, and the polling thread saves the
+        # seen-set as it exits
+        if self.scheduler:
+            self.scheduler.stop()
 
-        self.monitor = None
-        self.monitor_thread = None
+        if self.monitor:
+            self.monitor.stop_metrics_exporter()
+        if self.profiler:
+            self.profiler.finish()
 
         # Update UI
         self.address_entry.configure(state=tk.NORMAL)
@@ -745,6 +918,17 @@ class EarthquakeMonitorGUI:
         self.update_status(monitoring=False)
         self.log("Monitoring stopped.")
 
+    def update_timing_label(self):
+        """Show how long the latest poll cycle took"""
+        self.timing_label.configure(text=metrics.format_last_cycle())
+
+    def show_timing_summary(self):
+        """Show the full per-stage timing breakdown"""
+        summary = metrics.format_summary() or "No poll cycles recorded yet."
+        if self.monitor:
+            summary += "\n\n" + self.monitor.latency_tracker.format_summary()
+        messagebox.showinfo("Pipeline Timings", summary)
+
     def update_status(self, monitoring=False):
         """Update status display"""
         if monitoring:
@@ -762,12 +946,13 @@ class EarthquakeMonitorGUI:
 
     def check_phivolcs_connection(self):
         """Check PHIVOLCS connection status"""
+        # The running monitor's settings include hot-reloaded edits; otherwise use the GUI's own
+        options = self.monitor.scrape_options() if self.monitor else scrape_options(self.config)
+
         def check_in_thread():
             try:
-                # Create a temporary monitor instance to test connection
-                from main import EarthquakeMonitor
-                temp_monitor = EarthquakeMonitor(self.config_file)
-                is_connected, message = temp_monitor.test_connection()
+                # Only downloads and parses the page: no cache writes and no pipeline metrics
+                is_connected, message = check_connection(**options)
 
                 # Update UI in main thread
                 self.root.after(0, self.update_connection_status, is_connected, message)
@@ -781,6 +966,31 @@ class EarthquakeMonitorGUI:
         # Schedule next check
         self.root.after(self.connection_check_interval, self.check_phivolcs_connection)
 
+    def show_cached_catalog(self):
+        """Show the cached catalog's size and age until the first live check completes"""
+        data = self.catalog_cache.load()
+        if not data:
+            return
+
+        count = len(data.get('earthquakes', []))
+        age = format_age(self.catalog_cache.age_seconds())
+        self.connection_status_label.configure(text=" ● Checking...", foreground="#FFB300")
+        self.connection_detail_label.configure(
+            text=f"Showing cached data: {count} earthquakes, {age} old",
+            foreground="#FFB300"
+        )
+        self.log(f"Loaded cached catalog: {count} earthquakes, {age} old")
+
+    def cached_catalog_note(self):
+        """Describe the cached catalog used during an outage, or an empty string if there is none"""
+        age = self.catalog_cache.age_seconds()
+        if age is None:
+            return ""
+        note = f" - using cached data ({format_age(age)} old)"
+        if self.catalog_cache.is_stale():
+            note += ", STALE"
+        return note
+
     def update_connection_status(self, is_connected, message):
         """Update connection status display"""
         if is_connected:
@@ -798,7 +1008,7 @@ class EarthquakeMonitorGUI:
                 foreground="#FF4444"
             )
             self.connection_detail_label.configure(
-                text=f"Issue: {message}",
+                text=f"Issue: {message}{self.cached_catalog_note()}",
                 foreground="#FF4444"
             )
 
@@ -890,6 +1100,7 @@ class EarthquakeMonitorGUI:
                 self.hide_window()
             elif response is False:  # No - exit
                 self.stop_monitoring()
+                self.geocoder.stop()
                 if self.tray_icon:
                     self.tray_icon.stop()
                 self.root.destroy()
@@ -906,6 +1117,7 @@ class EarthquakeMonitorGUI:
             if response:  # Yes - minimize to tray
                 self.hide_window()
             else:  # No - exit
+                self.geocoder.stop()
                 if self.tray_icon:
                     self.tray_icon.stop()
                 self.root.destroy()
@@ -951,6 +1163,10 @@ def check_single_instance():
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="Tremr")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
     # Check for single instance
     can_run, lock_file = check_single_instance()
 
@@ -975,7 +1191,7 @@ def main():
     style = ttk.Style()
     style.theme_use('vista')  # Modern Windows theme
 
-    app = EarthquakeMonitorGUI(root)
+    app = EarthquakeMonitorGUI(root, create_profiler(args))
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
 
     try:
@@ -0,0 +1,168 @@
+"""
+Tremr - Pipeline Instrumentation
+Fixed-bucket latency histograms and counters for the poll pipeline (fetch, parse, filter, enrich, stats, cluster, persist, notify)
+"""
+
+import logging
+import time
+from bisect import bisect_left
+
+# Upper bounds of the latency buckets in milliseconds; the last bucket catches everything slower
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, float('inf'))
+
+STAGES = ('fetch', 'parse', 'filter', 'enrich', 'stats', 'cluster', 'persist', 'notify', 'cycle')
+
+
+class Histogram:
+    """Counts observations into fixed buckets; constant memory however many are recorded"""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, value):
+        """Record one value"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of observations (the max for the last bucket)"""
+        if self.count == 0:
+            return None
+        target = fraction * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        """Count, mean, p50, p95, max and last value"""
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'max': self.max,
+            'last': self.last
+        }
+
+
+class StageTimer:
+    """Context manager timing one stage into a histogram, in milliseconds"""
+
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe((time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class NullTimer:
+    """Stand-in used when instrumentation is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Instrumentation:
+    def __init__(self, enabled=True):
+        """Create an empty set of histograms and counters"""
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+
+    def histogram(self, name):
+        """Get or create the histogram for a stage"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def stage(self, name):
+        """Time a block: with metrics.stage('parse'): ..."""
+        if not self.enabled:
+            return NULL_TIMER
+        return StageTimer(self.histogram(name))
+
+    def observe(self, name, milliseconds):
+        """Record a duration measured elsewhere"""
+        if self.enabled:
+            self.histogram(name).observe(milliseconds)
+
+    def count(self, name, amount=1):
+        """Increase a counter"""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def count_error(self, error_class):
+        """Count an upstream failure by its class, e.g. Timeout, ConnectionError, HTTPError"""
+        self.count(f'upstream_errors{{class="{error_class}"}}')
+
+    def summary(self):
+        """Histogram summaries (milliseconds) and counter values"""
+        return {
+            'stages': {name: histogram.summary() for name, histogram in self.histograms.items()},
+            'counters': dict(self.counters)
+        }
+
+    def format_summary(self):
+        """One line per stage, for logs"""
+        lines = []
+        names = [name for name in STAGES if name in self.histograms]
+        names += sorted(name for name in self.histograms if name not in STAGES)
+        for name in names:
+            stats = self.histograms[name].summary()
+            lines.append(
+                f"{name:<12} n={stats['count']:<6} mean={stats['mean']:.1f}ms "
+                f"p50<={stats['p50']:.0f}ms p95<={stats['p95']:.0f}ms max={stats['max']:.1f}ms"
+            )
+        if self.counters:
+            lines.append("counters: " + ", ".join(f"{name}={value}" for name, value in sorted(self.counters.items())))
+        return "\n".join(lines)
+
+    def format_last_cycle(self):
+        """Short description of the latest cycle, for the GUI"""
+        cycle = self.histograms.get('cycle')
+        if not cycle or not cycle.count:
+            return ""
+        # persist and notify only run when something changed, so their last value may be from an older cycle
+        parts = [f"{name} {self.histograms[name].last:.0f}" for name in ('fetch', 'parse', 'filter') if name in self.histograms]
+        return f"Last check: {cycle.last:.0f} ms ({', '.join(parts)})"
+
+    def log_summary(self):
+        """Write the summary to the log"""
+        logging.info("Pipeline timings:\n" + self.format_summary())
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        self.histograms = {}
+        self.counters = {}
+
+
+# Shared by the scraper and the monitor
+metrics = Instrumentation()
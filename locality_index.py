@@ -0,0 +1,195 @@
+"""
+Tremr - Nearest Locality Enrichment
+Finds the nearest populated places and subscriber sites for each earthquake with prebuilt k-d trees
+over unit-sphere coordinates, where straight-line (chord) distance orders points exactly as
+great-circle distance does. Queries run as one batch per scrape and results are cached by event id.
+"""
+
+import heapq
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from gazetteer import DEFAULT_GAZETTEER_FILE, load_places
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_LEAF_SIZE = 16
+DEFAULT_NEAREST_PLACES = 3
+DEFAULT_NEAREST_SITES = 3
+COMPASS_POINTS = ('N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW')
+
+# place is a gazetteer.Place; bearing is the compass direction from the place to the earthquake
+NearbyPlace = namedtuple('NearbyPlace', 'place distance_km bearing')
+NearbySite = namedtuple('NearbySite', 'name distance_km')
+Enrichment = namedtuple('Enrichment', 'places sites')
+
+
+def to_unit_vectors(latitudes, longitudes):
+    """(n, 3) array of points on the unit sphere"""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    """Great-circle distance for a chord length between unit-sphere points"""
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+def compass_bearing(from_lat, from_lon, to_lat, to_lon):
+    """8-point compass direction of the second point as seen from the first"""
+    from_lat, to_lat = math.radians(from_lat), math.radians(to_lat)
+    delta_lon = math.radians(to_lon - from_lon)
+    x = math.sin(delta_lon) * math.cos(to_lat)
+    y = math.cos(from_lat) * math.sin(to_lat) - math.sin(from_lat) * math.cos(to_lat) * math.cos(delta_lon)
+    degrees = math.degrees(math.atan2(x, y)) % 360.0
+    return COMPASS_POINTS[int((degrees + 22.5) // 45) % 8]
+
+
+class KDTree:
+    """
+    Static k-d tree over an (n, d) array. Nodes live in flat lists; leaves are contiguous slices of
+    the reordered points, so each leaf is scanned with one vectorized distance computation
+    """
+
+    def __init__(self, points, leaf_size=DEFAULT_LEAF_SIZE):
+        points = np.asarray(points, dtype=float)
+        self.size = len(points)
+        self.leaf_size = leaf_size
+        self.order = np.arange(self.size)
+        # Per node: split dimension (-1 for leaves), split value, children, and slice of self.order
+        self.dims = []
+        self.values = []
+        self.lefts = []
+        self.rights = []
+        self.starts = []
+        self.ends = []
+        if self.size:
+            self.build(points, 0, self.size)
+        self.data = points[self.order]
+
+    def add_node(self, dim, value, start, end):
+        self.dims.append(dim)
+        self.values.append(value)
+        self.lefts.append(-1)
+        self.rights.append(-1)
+        self.starts.append(start)
+        self.ends.append(end)
+        return len(self.dims) - 1
+
+    def build(self, points, start, end):
+        """Split on the widest dimension at the median, down to leaf_size points"""
+        indices = self.order[start:end]
+        if end - start <= self.leaf_size:
+            return self.add_node(-1, 0.0, start, end)
+        chunk = points[indices]
+        dim = int(np.argmax(chunk.max(axis=0) - chunk.min(axis=0)))
+        middle = (end - start) // 2
+        partition = np.argpartition(chunk[:, dim], middle)
+        self.order[start:end] = indices[partition]
+        node = self.add_node(dim, float(points[self.order[start + middle], dim]), start, end)
+        self.lefts[node] = self.build(points, start, start + middle)
+        self.rights[node] = self.build(points, start + middle, end)
+        return node
+
+    def query(self, point, k=1):
+        """(distances, indices) of the k nearest points, nearest first"""
+        k = min(k, self.size)
+        if k <= 0:
+            return np.empty(0), np.empty(0, dtype=int)
+        point = np.asarray(point, dtype=float)
+        best = []  # max-heap of (-squared distance, index)
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            dim = self.dims[node]
+            if dim < 0:
+                start, end = self.starts[node], self.ends[node]
+                squared = ((self.data[start:end] - point) ** 2).sum(axis=1)
+                candidates = np.argpartition(squared, k - 1)[:k] if len(squared) > k else range(len(squared))
+                for i in candidates:
+                    distance = float(squared[i])
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, start + int(i)))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, start + int(i)))
+                continue
+            offset = point[dim] - self.values[node]
+            near, far = (self.lefts[node], self.rights[node]) if offset < 0 else (self.rights[node], self.lefts[node])
+            # Visit the near side first (pushed last); the far side only if the split plane is close enough
+            stack.append((far, max(bound, offset * offset)))
+            stack.append((near, bound))
+        best.sort(reverse=True)
+        return (np.sqrt([-distance for distance, _ in best]),
+                self.order[[position for _, position in best]])
+
+    def query_batch(self, points, k=1):
+        """(distances, indices) arrays of shape (m, k) for an (m, d) array of query points"""
+        k = min(k, self.size)
+        points = np.asarray(points, dtype=float).reshape(-1, self.data.shape[1] if self.size else 3)
+        distances = np.empty((len(points), k))
+        indices = np.empty((len(points), k), dtype=int)
+        for row, point in enumerate(points):
+            distances[row], indices[row] = self.query(point, k)
+        return distances, indices
+
+
+class LocalityIndex:
+    """Nearest populated places (cities and municipalities) and subscriber sites for batches of earthquakes"""
+
+    def __init__(self, places, sites=(), nearest_places=DEFAULT_NEAREST_PLACES, nearest_sites=DEFAULT_NEAREST_SITES):
+        # Province entries sit on their capitals, which are already in the list as towns
+        self.places = [place for place in places if place.kind != 'province']
+        self.sites = [(name, float(lat), float(lon)) for name, lat, lon in sites]
+        self.nearest_places = nearest_places
+        self.nearest_sites = nearest_sites
+        self.place_tree = KDTree(to_unit_vectors([p.latitude for p in self.places],
+                                                 [p.longitude for p in self.places]))
+        self.site_tree = KDTree(to_unit_vectors([s[1] for s in self.sites], [s[2] for s in self.sites]))
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Places from locality_file (gazetteer format, default the bundled gazetteer); sites are the
+        configured location plus any subscriber_sites entries ({"name", "latitude", "longitude"})
+        """
+        places = load_places(config.get('locality_file') or DEFAULT_GAZETTEER_FILE)
+        sites = [("Your location", config['latitude'], config['longitude'])]
+        sites += [(site.get('name', f"Site {i + 1}"), site['latitude'], site['longitude'])
+                  for i, site in enumerate(config.get('subscriber_sites') or [])]
+        return cls(places, sites, config.get('enrichment_places', DEFAULT_NEAREST_PLACES),
+                   config.get('enrichment_sites', DEFAULT_NEAREST_SITES))
+
+    def enrich(self, latitudes, longitudes):
+        """One Enrichment per (latitude, longitude) pair, from a single batch query per tree"""
+        if not len(latitudes):
+            return []
+        points = to_unit_vectors(latitudes, longitudes)
+        place_chords, place_indices = self.place_tree.query_batch(points, self.nearest_places)
+        site_chords, site_indices = self.site_tree.query_batch(points, self.nearest_sites)
+        place_km = chord_to_km(place_chords)
+        site_km = chord_to_km(site_chords)
+
+        enrichments = []
+        for row, (lat, lon) in enumerate(zip(latitudes, longitudes)):
+            places = []
+            for column, index in enumerate(place_indices[row]):
+                place = self.places[index]
+                places.append(NearbyPlace(place, float(place_km[row, column]),
+                                          compass_bearing(place.latitude, place.longitude, lat, lon)))
+            sites = [NearbySite(self.sites[index][0], float(site_km[row, column]))
+                     for column, index in enumerate(site_indices[row])]
+            enrichments.append(Enrichment(places, sites))
+        return enrichments
+
+
+def describe(enrichment):
+    """Short text for the nearest place, e.g. "4.1 km SW of Nasugbu (Batangas)" """
+    if not enrichment or not enrichment.places:
+        return None
+    nearest = enrichment.places[0]
+    return f"{nearest.distance_km:.1f} km {nearest.bearing} of {nearest.place.label}"
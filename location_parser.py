@@ -0,0 +1,159 @@
+"""
+Tremr - PHIVOLCS Location Parsing
+Splits location text such as "005 km S 52° W of Nasugbu (Batangas)" into offset distance, bearing,
+reference town and province, indexes events by province and town, and matches province/town
+subscriptions with a set lookup per event
+"""
+
+import re
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+from gazetteer import get_gazetteer, normalize_name
+
+# "005 km S 52° W of Nasugbu (Batangas)", "002 km N of Manila City", "Calatagan (Batangas)"
+LOCATION_PATTERN = re.compile(
+    r'^\s*(?:(?P<distance>\d+(?:\.\d+)?)\s*km\s+(?P<bearing>[NSEW](?:\s*\d+(?:\.\d+)?\s*°?\s*[EW])?)\s+of\s+)?'
+    r'(?P<town>[^()]*?)\s*(?:\((?P<province>[^()]*)\))?\s*$',
+    re.IGNORECASE
+)
+BEARING_ANGLE = re.compile(r'\s*(\d+(?:\.\d+)?)\s*°?\s*')
+CARDINAL_DEGREES = {'N': 0.0, 'E': 90.0, 'S': 180.0, 'W': 270.0}
+# Most catalogs repeat the same few hundred location strings on every scrape
+PARSE_CACHE_SIZE = 8192
+
+
+class ParsedLocation(namedtuple('ParsedLocation', 'distance_km bearing town province town_key province_key')):
+    """
+    A parsed location. town/province are as written (province filled in from the gazetteer when
+    PHIVOLCS leaves it out); the *_key fields are normalized for matching. Strings are interned
+    """
+    __slots__ = ()
+
+    @property
+    def azimuth(self):
+        """Bearing in degrees clockwise from north ("S 52° W" -> 232), or None"""
+        if not self.bearing:
+            return None
+        parts = self.bearing.replace('°', '').split()
+        if len(parts) == 1:
+            return CARDINAL_DEGREES.get(parts[0])
+        start, angle, towards = parts
+        angle = float(angle)
+        if start == 'N':
+            return angle if towards == 'E' else (360.0 - angle) % 360.0
+        return 180.0 - angle if towards == 'E' else 180.0 + angle
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def place_key(name):
+    """Matching key for a town or province: "City Of Mati", "Mati" and "Mati City" share one"""
+    key = normalize_name(name or '')
+    if key.startswith('city of '):
+        key = key[len('city of '):]
+    elif key.endswith(' city'):
+        key = key[:-len(' city')]
+    return sys.intern(key)
+
+
+def intern_or_none(text):
+    return sys.intern(text) if text else None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_location(location):
+    """Parse a PHIVOLCS location string. Returns a ParsedLocation, or None for empty text"""
+    if not location or not location.strip():
+        return None
+    match = LOCATION_PATTERN.match(location)
+    if not match or not match.group('town'):
+        # Not the usual shape: keep the whole text as the town so it can still be indexed
+        town, province, distance, bearing = location.strip(), None, None, None
+    else:
+        town = match.group('town')
+        province = (match.group('province') or '').strip() or None
+        distance = float(match.group('distance')) if match.group('distance') else None
+        bearing = match.group('bearing')
+        if bearing:
+            bearing = BEARING_ANGLE.sub(r' \1° ', bearing.upper()).strip()
+
+    if province is None:
+        place = get_gazetteer().lookup(town)
+        if place is not None:
+            province = place.province
+
+    return ParsedLocation(
+        distance,
+        intern_or_none(bearing),
+        sys.intern(town),
+        intern_or_none(province),
+        place_key(town),
+        place_key(province) if province else None
+    )
+
+
+class LocationIndex:
+    """Event ids by province key and by town key"""
+
+    def __init__(self):
+        self.by_province = {}
+        self.by_town = {}
+        self.locations = {}
+
+    def __len__(self):
+        return len(self.locations)
+
+    def add(self, event_id, location):
+        """Index an event by its location text (re-adding an event moves it)"""
+        parsed = parse_location(location)
+        self.remove(event_id)
+        if parsed is None:
+            return
+        self.locations[event_id] = parsed
+        if parsed.province_key:
+            self.by_province.setdefault(parsed.province_key, set()).add(event_id)
+        self.by_town.setdefault(parsed.town_key, set()).add(event_id)
+
+    def remove(self, event_id):
+        """Drop an event from the index"""
+        parsed = self.locations.pop(event_id, None)
+        if parsed is None:
+            return
+        for index, key in ((self.by_province, parsed.province_key), (self.by_town, parsed.town_key)):
+            events = index.get(key)
+            if events is not None:
+                events.discard(event_id)
+                if not events:
+                    del index[key]
+
+    def in_province(self, province):
+        """Ids of indexed events in a province"""
+        return set(self.by_province.get(place_key(province), ()))
+
+    def in_town(self, town):
+        """Ids of indexed events whose reference town is town"""
+        return set(self.by_town.get(place_key(town), ()))
+
+
+class LocationSubscription:
+    """Provinces and towns (municipalities or cities) to alert on, wherever they are relative to radius_km"""
+
+    def __init__(self, provinces=(), towns=()):
+        self.provinces = frozenset(place_key(name) for name in provinces)
+        self.towns = frozenset(place_key(name) for name in towns)
+
+    def __bool__(self):
+        return bool(self.provinces or self.towns)
+
+    def matches(self, location):
+        """Whether a location string is in a subscribed province or town"""
+        parsed = parse_location(location)
+        if parsed is None:
+            return False
+        return parsed.province_key in self.provinces or parsed.town_key in self.towns
+
+    @classmethod
+    def from_config(cls, config):
+        """Build from the subscribed_provinces and subscribed_municipalities config lists"""
+        return cls(config.get('subscribed_provinces') or (), config.get('subscribed_municipalities') or ())
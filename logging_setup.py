@@ -0,0 +1,215 @@
+"""
+Tremr - Logging Setup
+Queue-based logging: callers only enqueue records, and a listener thread does the file and console I/O.
+The log file rotates by size and at midnight, old logs are gzipped, and repeated error lines are rate-limited
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+DEFAULT_LOG_FILE = 'earthquake_monitor.log'
+DEFAULT_MAX_MB = 5
+DEFAULT_BACKUP_COUNT = 7
+DEFAULT_REPEAT_WINDOW_SECONDS = 300
+DEFAULT_REPEAT_LIMIT = 3
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+_queue_handler = None
+_settings = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers and grep-by-field"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class RepeatFilter(logging.Filter):
+    """
+    Rate-limits identical warning and error lines (e.g. the same fetch error every poll during an outage)
+    The first `limit` copies in each window pass; the rest are counted, and the count is reported
+    on the next copy that gets through
+    """
+
+    def __init__(self, window_seconds=DEFAULT_REPEAT_WINDOW_SECONDS, limit=DEFAULT_REPEAT_LIMIT):
+        super().__init__()
+        self.window_seconds = window_seconds
+        self.limit = limit
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+
+        message = record.getMessage()
+        now = time.monotonic()
+        with self.lock:
+            window_start, passed, suppressed = self.seen.get(message, (now, 0, 0))
+            if now - window_start >= self.window_seconds:
+                window_start, passed = now, 0
+            if passed >= self.limit:
+                self.seen[message] = (window_start, passed, suppressed + 1)
+                return False
+            self.seen[message] = (window_start, passed + 1, 0)
+            if len(self.seen) > 1000:
+                self.seen = {key: value for key, value in self.seen.items() if now - value[0] < self.window_seconds}
+
+        if suppressed:
+            record.msg = f"{message} (repeated {suppressed} more times)"
+            record.args = None
+        return True
+
+
+class RotatingLogHandler(logging.handlers.TimedRotatingFileHandler):
+    """Rotates at midnight or when the file passes max_bytes, whichever comes first, gzipping old files"""
+
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, backup_count=DEFAULT_BACKUP_COUNT):
+        super().__init__(filename, when='midnight', backupCount=backup_count, encoding='utf-8', delay=True)
+        self.max_bytes = max_bytes
+        self.namer = self.gzip_name
+        self.rotator = self.gzip_rotate
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if not self.max_bytes:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() >= self.max_bytes
+
+    def rotation_filename(self, default_name):
+        # Size rollovers can happen several times a day, so every archive carries a sequence
+        # number after its date (monitor.log.2024-05-01.1.gz, .2.gz, ...). Numbers are never reused,
+        # even once pruning has deleted the file that held them
+        dated = os.path.basename(default_name)
+        sequence = max((number for name, number in self.archives() if name == dated), default=0) + 1
+        return super().rotation_filename(f"{default_name}.{sequence}")
+
+    def archives(self):
+        """(log name with date, sequence number) of each archived log, oldest first"""
+        directory, base = os.path.split(self.baseFilename)
+        pattern = re.compile(rf"^({re.escape(base)}\.\d{{4}}-\d{{2}}-\d{{2}})(?:\.(\d+))?\.gz$")
+        archived = []
+        for name in os.listdir(directory or '.'):
+            match = pattern.match(name)
+            if match:
+                archived.append((match.group(1), int(match.group(2) or 0)))
+        return sorted(archived)
+
+    def getFilesToDelete(self):
+        # The base class only matches uncompressed date suffixes; ours carry a sequence number too
+        old_logs = self.archives()
+        if len(old_logs) <= self.backupCount:
+            return []
+        directory = os.path.dirname(self.baseFilename)
+        return [os.path.join(directory, f"{name}.{number}.gz" if number else f"{name}.gz")
+                for name, number in old_logs[:len(old_logs) - self.backupCount]]
+
+    @staticmethod
+    def gzip_name(name):
+        return name + '.gz'
+
+    @staticmethod
+    def gzip_rotate(source, dest):
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+
+def setup_logging(log_file=DEFAULT_LOG_FILE, level=logging.INFO, max_mb=DEFAULT_MAX_MB,
+                  backup_count=DEFAULT_BACKUP_COUNT, json_lines=False, console=True,
+                  repeat_window_seconds=DEFAULT_REPEAT_WINDOW_SECONDS, repeat_limit=DEFAULT_REPEAT_LIMIT):
+    """
+    Route the root logger through a queue to a listener thread writing the log file (and console)
+    Calling again with different settings replaces the previous setup; the same settings are a no-op
+    """
+    global _listener, _queue_handler, _settings
+
+    settings = (log_file, level, max_mb, backup_count, json_lines, console, repeat_window_seconds, repeat_limit)
+    if settings == _settings:
+        return
+    stop_logging()
+
+    formatter = JsonLinesFormatter() if json_lines else logging.Formatter(TEXT_FORMAT)
+    handlers = []
+    if log_file:
+        file_handler = RotatingLogHandler(log_file, int(max_mb * 1024 * 1024), backup_count)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    if repeat_limit:
+        _queue_handler.addFilter(RepeatFilter(repeat_window_seconds, repeat_limit))
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    _settings = settings
+
+
+def setup_logging_from_config(config):
+    """Apply the optional log_* settings of a monitor configuration"""
+    setup_logging(
+        log_file=config.get('log_file', DEFAULT_LOG_FILE),
+        max_mb=config.get('log_max_mb', DEFAULT_MAX_MB),
+        backup_count=config.get('log_backup_count', DEFAULT_BACKUP_COUNT),
+        json_lines=config.get('log_json', False),
+        repeat_window_seconds=config.get('log_repeat_window_seconds', DEFAULT_REPEAT_WINDOW_SECONDS)
+    )
+
+
+def flush_logging():
+    """Write out every record queued so far; logging carries on afterwards"""
+    if _listener:
+        # stop() handles what is already queued before it returns; records logged meanwhile wait for start()
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.flush()
+        _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler, _settings
+
+    if _queue_handler:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    _settings = None
+
+
+atexit.register(stop_logging)
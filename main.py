@@ -9,32 +9,102 @@ import json
 import os
 import sys
 import platform
+import threading
 from datetime import datetime
+import numpy as np
 from geopy.distance import geodesic
 from plyer import notification
 import logging
+from scrape_diff import ScrapeDiff, ScrapeDelta
+from instrumentation import metrics
+from logging_setup import flush_logging, setup_logging, setup_logging_from_config
+from alert_latency import AlertLatencyTracker, DEFAULT_LATENCY_FILE, DEFAULT_SLO_SECONDS, DEFAULT_WINDOW
+from phivolcs_scraper import parse_origin_time
+from catalog_cache import CatalogCache, format_age, DEFAULT_CACHE_FILE, DEFAULT_STALE_AFTER_SECONDS
+from location_parser import LocationIndex, LocationSubscription
+from locality_index import LocalityIndex, describe
+from geofence import GeofenceIndex
+from alert_rules import EventBatch, RuleSet, RuleSyntaxError
+from seismicity_stats import SeismicityStats, SITE_REGION
+from aftershock_clusters import SequenceClusterer, describe_sequence
+from config_manager import ConfigManager, affected, changed_keys, validate
+from poll_scheduler import PollScheduler
+
+# A degree of latitude is never shorter than this, so it bounds the true distance from below
+KM_PER_DEGREE_LATITUDE = 110.57
+
+# Where ensure_icon_exists finds, or draws, the notification icon
+ICON_DIRECTORY = '.'
+
+# Setup logging: records are queued here and written by a listener thread
+setup_logging()
+
+
+def scrape_options(config):
+    """Page URL, parser and timeout for the scraper (the URL can point at phivolcs_standin.py for testing)"""
+    from phivolcs_scraper import PHIVOLCS_URL, DEFAULT_HTML_PARSER
+    return {
+        'url': config.get('phivolcs_page_url', PHIVOLCS_URL),
+        'parser': config.get('html_parser', DEFAULT_HTML_PARSER),
+        'timeout': config.get('fetch_timeout_seconds', 30)
+    }
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('earthquake_monitor.log'),
-        logging.StreamHandler()
-    ]
-)
 
 class EarthquakeMonitor:
-    def __init__(self, config_file='config.json'):
-        """Initialize the earthquake monitor with configuration"""
-        self.config = self.load_config(config_file)
+    def __init__(self, config_file='config.json', config=None):
+        """Initialize the earthquake monitor with configuration (pass config to skip reading config_file)"""
+        # Watches config_file for changes; None when the config was passed in
+        self.config_manager = None
+        self.config = dict(config) if config is not None else self.load_config(config_file)
+        setup_logging_from_config(self.config)
         self.seen_earthquakes = set()
         self.load_seen_earthquakes()
+        self.scrape_diff = ScrapeDiff()
+        self.last_delta = None
+        # Provinces/towns alerted on in addition to (or, with radius_km null, instead of) the radius
+        self.subscription = LocationSubscription.from_config(self.config)
+        # Polygon alert zones from geofence_file, matched like subscriptions
+        self.geofence = GeofenceIndex.from_config(self.config)
+        # alert_rules, when configured, replace the radius/magnitude/subscription checks
+        self.rules = self.load_rules()
+        self.rule_matches = {}
+        # Running counts, magnitude histograms, b-value and rate anomalies per region
+        self.stats = SeismicityStats.from_config(self.config)
+        # Aftershock sequences: each new event is linked to a sequence or starts one
+        self.sequences = SequenceClusterer.from_config(self.config)
+        # Events of the current catalog by province and town
+        self.location_index = LocationIndex()
+        # Nearest places and sites per event id; the k-d trees are built on first use
+        self.locality_index = None
+        self.enrichments = {}
+        self.catalog_cache = CatalogCache(
+            self.config.get('catalog_cache_file', DEFAULT_CACHE_FILE),
+            self.config.get('cache_stale_after_seconds', DEFAULT_STALE_AFTER_SECONDS)
+        )
+        self.data_source = None
+        self.snapshot_archive = self.create_snapshot_archive()
+        metrics.enabled = self.config.get('instrumentation_enabled', True)
+        self.latency_tracker = AlertLatencyTracker(
+            self.config.get('alert_latency_file', DEFAULT_LATENCY_FILE),
+            self.config.get('alert_latency_slo_seconds', DEFAULT_SLO_SECONDS),
+            self.config.get('alert_latency_window', DEFAULT_WINDOW)
+        )
+        self.pending_notifications = 0
+        self.metrics_exporter = None
+        # Set to a profiling.CycleProfiler by --profile
+        self.profiler = None
+        # Start times of the two most recent successful fetches, for estimating when events appeared upstream
+        self.last_fetch_at = None
+        self.previous_fetch_at = None
+        # Held for a whole check, so a restarted loop never overlaps one still finishing
+        self.poll_lock = threading.Lock()
+        # Set by run() to the PollScheduler driving it
+        self.scheduler = None
         self.icon_path = self.ensure_icon_exists()
         self.sound_enabled = True
 
     def load_config(self, config_file):
-        """Load configuration from JSON file"""
+        """Load configuration from JSON file as a validated snapshot, and watch the file for changes"""
         if not os.path.exists(config_file):
             # Default configuration
             default_config = {
@@ -48,10 +118,86 @@ class EarthquakeMonitor:
             with open(config_file, 'w') as f:
                 json.dump(default_config, f, indent=4)
             logging.info(f"Created default config file: {config_file}")
-            return default_config
 
-        with open(config_file, 'r') as f:
-            return json.load(f)
+        self.config_manager = ConfigManager(config_file)
+        return self.config_manager.load()
+
+    def reload_config(self):
+        """Pick up changes to the config file. Returns the changed keys (empty if none)"""
+        if self.config_manager is None:
+            return frozenset()
+        changed = self.config_manager.reload()
+        if not changed:
+            return frozenset()
+        self.apply_config(self.config_manager.snapshot, changed)
+        return changed
+
+    def update_config(self, **settings):
+        """Change settings in memory, validated like a reload; raises ConfigError. Returns the changed keys"""
+        snapshot = validate(dict(self.config, **settings))
+        changed = changed_keys(self.config, snapshot)
+        if changed:
+            self.apply_config(snapshot, changed)
+        return changed
+
+    def apply_config(self, snapshot, changed):
+        """
+        Switch to a new configuration, rebuilding only what depends on the changed keys.
+        Indexes over events are refilled from the current catalog, so they stay warm
+        """
+        self.config = snapshot
+        rebuild = affected(changed)
+        rows = self.scrape_diff.rows()
+        metrics.enabled = snapshot.get('instrumentation_enabled', True)
+
+        if 'logging' in rebuild:
+            setup_logging_from_config(snapshot)
+        if 'subscription' in rebuild:
+            self.subscription = LocationSubscription.from_config(snapshot)
+        if 'geofence' in rebuild:
+            self.geofence = GeofenceIndex.from_config(snapshot)
+        if 'rules' in rebuild:
+            self.rules = self.load_rules()
+            self.rule_matches = {}
+            if self.rules is not None and rows:
+                self.match_rules(rows)
+        if 'locality_index' in rebuild:
+            self.locality_index = None
+            self.enrichments = {}
+        if ('locality_index' in rebuild or 'min_magnitude' in changed) and rows:
+            self.enrich_earthquakes([eq for eq in rows if self.meets_min_magnitude(eq)])
+        if 'stats' in rebuild:
+            self.stats = SeismicityStats.from_config(snapshot)
+            self.stats.advance(self.now())
+            self.stats.update(ScrapeDelta(rows, [], []))
+        if 'sequences' in rebuild:
+            self.sequences = SequenceClusterer.from_config(snapshot)
+            self.sequences.update(ScrapeDelta(rows, [], []), self.create_earthquake_id)
+        if 'catalog_cache' in rebuild:
+            self.catalog_cache = CatalogCache(
+                snapshot.get('catalog_cache_file', DEFAULT_CACHE_FILE),
+                snapshot.get('cache_stale_after_seconds', DEFAULT_STALE_AFTER_SECONDS)
+            )
+        if 'latency_tracker' in rebuild:
+            self.latency_tracker = AlertLatencyTracker(
+                snapshot.get('alert_latency_file', DEFAULT_LATENCY_FILE),
+                snapshot.get('alert_latency_slo_seconds', DEFAULT_SLO_SECONDS),
+                snapshot.get('alert_latency_window', DEFAULT_WINDOW)
+            )
+        if 'snapshot_archive' in rebuild:
+            self.snapshot_archive = self.create_snapshot_archive()
+        if 'metrics_exporter' in rebuild and self.metrics_exporter:
+            self.stop_metrics_exporter()
+            self.start_metrics_exporter()
+
+        logging.info(
+            f"Settings changed: {', '.join(sorted(changed))}"
+            + (f" (rebuilt {', '.join(sorted(rebuild))})" if rebuild else "")
+        )
+
+    def now(self):
+        """The current Unix time, which time windows such as the statistics follow; replays use their own clock"""
+        return time.time()
 
     def load_seen_earthquakes(self):
         """Load previously seen earthquakes from file"""
@@ -65,6 +211,61 @@ class EarthquakeMonitor:
         with open('seen_earthquakes.json', 'w') as f:
             json.dump(list(self.seen_earthquakes), f)
 
+    def create_snapshot_archive(self):
+        """Create the raw snapshot archive if snapshot_archive_dir is configured"""
+        archive_dir = self.config.get('snapshot_archive_dir')
+        if not archive_dir:
+            return None
+
+        from snapshot_archive import SnapshotArchive, DEFAULT_MAX_MB, DEFAULT_MAX_AGE_DAYS
+        try:
+            return SnapshotArchive(
+                archive_dir,
+                max_bytes=self.config.get('snapshot_archive_max_mb', DEFAULT_MAX_MB) * 1024 * 1024,
+                max_age_days=self.config.get('snapshot_archive_max_age_days', DEFAULT_MAX_AGE_DAYS)
+            )
+        except OSError as e:
+            logging.warning(f"Snapshot archive disabled: {e}")
+            return None
+
+    def start_metrics_exporter(self):
+        """Serve metrics for a local Prometheus scraper if metrics_port is configured"""
+        port = self.config.get('metrics_port')
+        if not port or self.metrics_exporter:
+            return
+
+        from metrics_exporter import MetricsExporter
+        exporter = MetricsExporter(metrics, host=self.config.get('metrics_host', '127.0.0.1'), port=port)
+        exporter.add_gauge('notification_queue_depth', "Alerts waiting to be shown",
+                           lambda: self.pending_notifications)
+        exporter.add_gauge('seen_earthquakes', "Earthquakes in the seen-set",
+                           lambda: len(self.seen_earthquakes))
+        exporter.add_gauge('site_window_events', "Earthquakes near your location in the statistics window",
+                           lambda: self.stats.region(SITE_REGION).total)
+        exporter.add_gauge('site_rate_zscore', "How unusual the latest bucket near your location is (z-score)",
+                           lambda: self.stats.region(SITE_REGION).rate_zscore() or 0.0)
+        exporter.add_gauge('site_b_value', "Gutenberg-Richter b-value near your location",
+                           lambda: self.stats.region(SITE_REGION).b_value()[0] or float('nan'))
+        exporter.add_gauge('active_sequences', "Earthquake sequences with more than one event in the window",
+                           lambda: len(self.sequences.active()))
+        try:
+            exporter.start()
+        except OSError as e:
+            logging.warning(f"Could not start metrics endpoint on port {port}: {e}")
+            return
+        self.metrics_exporter = exporter
+        logging.info(f"Metrics available at http://{exporter.host}:{exporter.port}/metrics")
+
+    def stop_metrics_exporter(self):
+        """Stop the metrics endpoint"""
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+            self.metrics_exporter = None
+
+    def scrape_options(self):
+        """Page URL, parser and timeout for the scraper"""
+        return scrape_options(self.config)
+
     def test_connection(self):
         """Test connection to PHIVOLCS website"""
         try:
@@ -72,9 +273,11 @@ class EarthquakeMonitor:
             from phivolcs_scraper import scrape_phivolcs_earthquakes
 
             # Try to scrape data
-            data = scrape_phivolcs_earthquakes()
+            data = scrape_phivolcs_earthquakes(**self.scrape_options())
 
             if data and 'earthquakes' in data and len(data['earthquakes']) > 0:
+                # A successful check doubles as a background refresh of the cache
+                self.catalog_cache.save(data)
                 return True, "Connected"
             else:
                 return False, "No earthquake data available"
@@ -90,26 +293,55 @@ class EarthquakeMonitor:
         except Exception as e:
             return False, f"Error: {str(e)}"
 
-    def fetch_earthquake_data(self):
-        """Fetch latest earthquake data from PHIVOLCS by scraping their website"""
+    def fetch_earthquake_data(self, cancel=None):
+        """
+        Fetch latest earthquake data from PHIVOLCS by scraping their website.
+        With a poll_scheduler.CancelToken as cancel, raises Cancelled as soon as it is cancelled
+        """
         try:
             # Import scraper
             from phivolcs_scraper import scrape_phivolcs_earthquakes
 
             # Scrape earthquake data from PHIVOLCS website
-            data = scrape_phivolcs_earthquakes()
+            fetch_started = time.time()
+            data = scrape_phivolcs_earthquakes(archive=self.snapshot_archive, cancel=cancel, **self.scrape_options())
 
             if data:
+                self.previous_fetch_at, self.last_fetch_at = self.last_fetch_at, fetch_started
                 logging.info(f"Successfully fetched {len(data.get('earthquakes', []))} earthquakes from PHIVOLCS")
+                with metrics.stage('persist'):
+                    self.catalog_cache.save(data)
+                self.data_source = 'live'
                 return data
             else:
                 logging.error("Failed to scrape earthquake data from PHIVOLCS")
-                return None
 
         except Exception as e:
             logging.error(f"Error fetching earthquake data: {e}")
+
+        # PHIVOLCS is down or slow: fall back to the last good catalog
+        return self.load_cached_catalog()
+
+    def load_cached_catalog(self):
+        """Return the last good catalog from disk, warning when it is past the staleness budget"""
+        data = self.catalog_cache.load()
+        if not data:
+            self.data_source = None
             return None
 
+        age = self.catalog_cache.age_seconds()
+        self.data_source = 'cache'
+        if self.last_fetch_at is None:
+            self.last_fetch_at = time.time() - age
+        if self.catalog_cache.is_stale():
+            logging.warning(
+                f"Using cached catalog from {format_age(age)} ago - "
+                f"older than the {format_age(self.catalog_cache.stale_after_seconds)} staleness budget"
+            )
+        else:
+            logging.info(f"Using cached catalog from {format_age(age)} ago ({len(data.get('earthquakes', []))} earthquakes)")
+        return data
+
     def calculate_distance(self, lat, lon):
         """Calculate distance from configured location to earthquake"""
         user_location = (self.config['latitude'], self.config['longitude'])
@@ -125,7 +357,7 @@ class EarthquakeMonitor:
         """Ensure the earthquake warning icon exists, create if not"""
         # On Windows, we need .ico format, on other platforms .png works
         is_windows = platform.system() == 'Windows'
-        icon_path = 'earthquake_warning.ico' if is_windows else 'earthquake_warning.png'
+        icon_path = os.path.join(ICON_DIRECTORY, 'earthquake_warning.ico' if is_windows else 'earthquake_warning.png')
 
         if os.path.exists(icon_path):
             return os.path.abspath(icon_path)
@@ -257,8 +489,12 @@ class EarthquakeMonitor:
         date_time = f"{earthquake.get('date', '')} {earthquake.get('time', '')}"
 
         title = f"EARTHQUAKE ALERT - Magnitude {magnitude}"
+        nearest = describe(self.enrichments.get(self.create_earthquake_id(earthquake)))
+        sequence = describe_sequence(self.sequences.sequence_of(self.create_earthquake_id(earthquake)))
         message = (
             f"Location: {location}\n"
+            + (f"Nearest town: {nearest}\n" if nearest else "")
+            + (f"Sequence: {sequence}\n" if sequence else "") +
             f"Distance: {distance:.1f} km away\n"
             f"Depth: {depth}\n"
             f"Time: {date_time}"
@@ -277,84 +513,360 @@ class EarthquakeMonitor:
                 timeout=15
             )
             logging.info(f"Notification sent with sound and icon: {title}")
+
+            delivered_at = time.time()
+            self.latency_tracker.record(
+                earthquake,
+                parse_origin_time(earthquake),
+                self.previous_fetch_at,
+                self.last_fetch_at if self.last_fetch_at is not None else delivered_at,
+                delivered_at
+            )
         except Exception as e:
             logging.error(f"Error showing notification: {e}")
 
-    def process_earthquakes(self, data):
-        """Process earthquake data and check for nearby events"""
-        if not data or 'earthquakes' not in data:
-            logging.warning("No earthquake data to process")
-            return
-
-        earthquakes = data['earthquakes']
-        new_earthquakes_found = 0
+    def load_rules(self):
+        """Compile alert_rules from the config, or None to use radius_km and min_magnitude"""
+        try:
+            rules = RuleSet.from_config(self.config)
+        except (RuleSyntaxError, KeyError, TypeError) as e:
+            logging.error(f"Invalid alert rule, using radius_km and min_magnitude instead: {e}")
+            return None
+        if rules:
+            logging.info(f"Loaded {len(rules)} alert rule(s)")
+        return rules
+
+    def match_rules(self, earthquakes):
+        """Evaluate every alert rule over the whole scrape in one pass; keeps the matches by event id"""
+        batch = EventBatch(earthquakes, self.config['latitude'], self.config['longitude'], self.geofence)
+        self.rule_matches = {
+            self.create_earthquake_id(earthquake): names
+            for earthquake, names in zip(earthquakes, self.rules.matches(batch)) if names
+        }
+
+    def in_subscribed_area(self, earthquake, lat, lon):
+        """Whether an earthquake is in a subscribed province or town, or inside an alert zone"""
+        if self.subscription and self.subscription.matches(earthquake.get('location')):
+            return True
+        return bool(self.geofence) and bool(self.geofence.zones_at(lat, lon))
+
+    def evaluate_earthquake(self, earthquake):
+        """
+        Return (is_nearby, distance, magnitude) for an earthquake, or None if its data is invalid
+        distance is None when the earthquake was ruled out before the distance was needed
+        """
+        try:
+            lat = float(earthquake.get('latitude', 0))
+            lon = float(earthquake.get('longitude', 0))
+            magnitude = float(earthquake.get('magnitude', 0))
+        except (ValueError, TypeError):
+            logging.warning(f"Invalid earthquake data: {earthquake}")
+            return None
 
-        for earthquake in earthquakes:
+        if self.rules is not None:
+            if not self.rule_matches.get(self.create_earthquake_id(earthquake)):
+                return False, None, magnitude
+            return True, self.calculate_distance(lat, lon), magnitude
+
+        # Cheap rejections first: too weak, or further north/south than the radius allows
+        if magnitude < self.config['min_magnitude']:
+            return False, None, magnitude
+        radius = self.config.get('radius_km')
+        subscribed = self.in_subscribed_area(earthquake, lat, lon)
+        if not subscribed and (not radius or abs(lat - self.config['latitude']) * KM_PER_DEGREE_LATITUDE > radius):
+            return False, None, magnitude
+
+        # Calculate distance
+        distance = self.calculate_distance(lat, lon)
+
+        # Check if earthquake is in a subscribed place or zone, or within radius (magnitude was checked above)
+        is_nearby = subscribed or distance <= radius
+        return is_nearby, distance, magnitude
+
+    def alert_mask(self, batch):
+        """
+        evaluate_earthquake for a whole EventBatch at once: whether each row would be alerted on.
+        Rows with unreadable numbers never are. Subscriptions and zones are looked up only for
+        strong enough rows outside the radius
+        """
+        magnitude = batch.column(('magnitude',))
+        readable = ~(np.isnan(batch.latitude) | np.isnan(batch.longitude) | np.isnan(magnitude))
+        if self.rules is not None:
+            matched = np.fromiter((bool(names) for names in self.rules.matches(batch)), dtype=bool, count=len(batch))
+            return readable & matched
+
+        candidates = readable & (magnitude >= self.config['min_magnitude'])
+        radius = self.config.get('radius_km')
+        if radius:
+            alerting = candidates & (batch.column(('distance',)) <= radius)
+        else:
+            alerting = np.zeros(len(batch), dtype=bool)
+        if self.subscription or self.geofence:
+            for index in np.nonzero(candidates & ~alerting)[0]:
+                alerting[index] = self.in_subscribed_area(
+                    batch.earthquakes[index], batch.latitude[index], batch.longitude[index])
+        return alerting
+
+    def find_alerts(self, delta):
+        """Check the rows that changed since the last scrape. Returns (earthquake, distance) pairs to notify about"""
+        alerts = []
+        new_events = 0
+
+        for earthquake in delta.inserted:
             # Create unique ID for this earthquake
             eq_id = self.create_earthquake_id(earthquake)
 
             # Skip if we've already processed this earthquake
             if eq_id in self.seen_earthquakes:
                 continue
+            new_events += 1
 
-            # Get earthquake details
-            try:
-                lat = float(earthquake.get('latitude', 0))
-                lon = float(earthquake.get('longitude', 0))
-                magnitude = float(earthquake.get('magnitude', 0))
-            except (ValueError, TypeError):
-                logging.warning(f"Invalid earthquake data: {earthquake}")
+            result = self.evaluate_earthquake(earthquake)
+            if result is None:
                 continue
+            is_nearby, distance, magnitude = result
 
-            # Calculate distance
-            distance = self.calculate_distance(lat, lon)
-
-            # Check if earthquake is within radius and meets magnitude threshold
-            if (distance <= self.config['radius_km'] and
-                magnitude >= self.config['min_magnitude']):
-
+            if is_nearby:
                 logging.info(
                     f"NEW EARTHQUAKE: Magnitude {magnitude}, "
                     f"Distance {distance:.1f}km, "
                     f"Location: {earthquake.get('location', 'Unknown')}"
                 )
-
-                # Show notification
-                self.show_notification(earthquake, distance)
-                new_earthquakes_found += 1
+                alerts.append((earthquake, distance))
 
             # Mark as seen
             self.seen_earthquakes.add(eq_id)
 
-        if new_earthquakes_found > 0:
-            self.save_seen_earthquakes()
-            logging.info(f"Processed {new_earthquakes_found} new nearby earthquake(s)")
+        for old_earthquake, earthquake in delta.modified:
+            eq_id = self.create_earthquake_id(earthquake)
+            logging.info(
+                f"REVISED EARTHQUAKE: {earthquake.get('date', '')} {earthquake.get('time', '')} - "
+                f"Magnitude {old_earthquake.get('magnitude', '?')} -> {earthquake.get('magnitude', '?')}, "
+                f"Location: {old_earthquake.get('location', 'Unknown')} -> {earthquake.get('location', 'Unknown')}"
+            )
+
+            result = self.evaluate_earthquake(earthquake)
+            if result is None:
+                continue
+            is_nearby, distance, magnitude = result
+
+            # Alert when a revision newly brings the earthquake over the thresholds
+            old_result = self.evaluate_earthquake(old_earthquake)
+            was_nearby = old_result is not None and old_result[0]
+            if is_nearby and not was_nearby:
+                logging.info(
+                    f"REVISED EARTHQUAKE NOW NEARBY: Magnitude {magnitude}, "
+                    f"Distance {distance:.1f}km, "
+                    f"Location: {earthquake.get('location', 'Unknown')}"
+                )
+                alerts.append((earthquake, distance))
+
+            self.seen_earthquakes.add(eq_id)
+
+        metrics.count('new_events', new_events)
+        return alerts
+
+    def update_location_index(self, delta):
+        """Keep the province/town index in step with the catalog"""
+        for earthquake in delta.removed:
+            self.location_index.remove(self.create_earthquake_id(earthquake))
+        for old_earthquake, earthquake in delta.modified:
+            self.location_index.remove(self.create_earthquake_id(old_earthquake))
+            self.location_index.add(self.create_earthquake_id(earthquake), earthquake.get('location'))
+        for earthquake in delta.inserted:
+            self.location_index.add(self.create_earthquake_id(earthquake), earthquake.get('location'))
+
+    def enrich_earthquakes(self, earthquakes):
+        """Look up nearest places and sites for earthquakes not yet enriched, in one batch"""
+        pending = []
+        for earthquake in earthquakes:
+            eq_id = self.create_earthquake_id(earthquake)
+            if eq_id in self.enrichments:
+                continue
+            try:
+                pending.append((eq_id, float(earthquake['latitude']), float(earthquake['longitude'])))
+            except (KeyError, ValueError, TypeError):
+                continue
+        if not pending:
+            return
+
+        if self.locality_index is None:
+            self.locality_index = LocalityIndex.from_config(self.config)
+        _, latitudes, longitudes = zip(*pending)
+        for (eq_id, _, _), enrichment in zip(pending, self.locality_index.enrich(latitudes, longitudes)):
+            self.enrichments[eq_id] = enrichment
+
+    def update_enrichments(self, delta):
+        """
+        Enrich the rows that changed this scrape and drop the ones that left the catalog.
+        Rows below min_magnitude are skipped: they are never alerted on or shown
+        """
+        for earthquake in delta.removed:
+            self.enrichments.pop(self.create_earthquake_id(earthquake), None)
+        for old_earthquake, _ in delta.modified:
+            self.enrichments.pop(self.create_earthquake_id(old_earthquake), None)
+
+        changed = delta.inserted + [earthquake for _, earthquake in delta.modified]
+        self.enrich_earthquakes([eq for eq in changed if self.meets_min_magnitude(eq)])
+
+    def group_sequence_alerts(self, alerts):
+        """
+        Keep one alert per aftershock sequence unless a later event is bigger than any already
+        notified in it. Lone events always pass
+        """
+        kept = []
+        for earthquake, distance in alerts:
+            sequence = self.sequences.sequence_of(self.create_earthquake_id(earthquake))
+            try:
+                magnitude = float(earthquake.get('magnitude', 0))
+            except (ValueError, TypeError):
+                magnitude = 0.0
+            if sequence is not None and sequence.notified_magnitude is not None and magnitude <= sequence.notified_magnitude:
+                logging.info(
+                    f"Grouped alert: Magnitude {magnitude} at {earthquake.get('location', 'Unknown')} "
+                    f"is part of earthquake sequence #{sequence.number} ({sequence.count} events)"
+                )
+                metrics.count('grouped_alerts')
+                continue
+            if sequence is not None:
+                sequence.notified_magnitude = magnitude
+            kept.append((earthquake, distance))
+        return kept
+
+    def meets_min_magnitude(self, earthquake):
+        """Whether an earthquake's magnitude is at least min_magnitude"""
+        try:
+            return float(earthquake.get('magnitude', 0)) >= self.config['min_magnitude']
+        except (ValueError, TypeError):
+            return False
+
+    def process_earthquakes(self, data, delta=None):
+        """
+        Process earthquake data and check for nearby events. A caller that already knows what
+        changed (replay.py scrolling a page) passes the ScrapeDelta instead of having data diffed
+        """
+        if not data or 'earthquakes' not in data:
+            logging.warning("No earthquake data to process")
+            return None
+
+        # Only rows that changed since the previous scrape need any work
+        with metrics.stage('filter'):
+            if delta is None:
+                delta = self.scrape_diff.diff(data['earthquakes'])
+            if self.rules is not None and (delta.inserted or delta.modified):
+                self.match_rules(data['earthquakes'])
+            alerts = self.find_alerts(delta)
+            self.update_location_index(delta)
+        with metrics.stage('enrich'):
+            self.update_enrichments(delta)
+        with metrics.stage('stats'):
+            self.stats.advance(self.now())
+            self.stats.update(delta)
+        with metrics.stage('cluster'):
+            self.sequences.update(delta, self.create_earthquake_id)
+            if alerts and self.config.get('group_sequence_alerts', False):
+                alerts = self.group_sequence_alerts(alerts)
+        self.last_delta = delta
+        if not (delta.inserted or delta.removed or delta.modified):
+            metrics.count('unchanged_polls')
+
+        if alerts:
+            # Record the earthquakes as seen before notifying, so a crash can't alert twice
+            with metrics.stage('persist'):
+                self.save_seen_earthquakes()
+
+            with metrics.stage('notify'):
+                self.pending_notifications = len(alerts)
+                for earthquake, distance in alerts:
+                    self.show_notification(earthquake, distance)
+                    self.pending_notifications -= 1
+
+            metrics.count('alerts', len(alerts))
+            logging.info(f"Processed {len(alerts)} new nearby earthquake(s)")
+
+        return delta
+
+    def poll_once(self, cancel=None):
+        """
+        Fetch and process one scrape, timing the whole cycle. cancel (a CancelToken) can abort the
+        fetch; once the data is in, the alerts and persistence always run to the end
+        """
+        with self.poll_lock:
+            self.reload_config()
+            if self.profiler:
+                self.profiler.start_cycle()
+            try:
+                with metrics.stage('cycle'):
+                    data = self.fetch_earthquake_data(cancel)
+                    if data:
+                        self.process_earthquakes(data)
+                metrics.count('polls')
+            finally:
+                # A cancelled or failed check still closes its profile, or the profiler stays running
+                if self.profiler:
+                    self.profiler.end_cycle(seen_earthquakes=len(self.seen_earthquakes))
+
+        log_every = self.config.get('metrics_log_every_cycles', 60)
+        if metrics.enabled and log_every and metrics.counters.get('polls', 0) % log_every == 0:
+            metrics.log_summary()
 
     def run(self):
         """Main monitoring loop"""
         logging.info("=" * 60)
         logging.info("Tremr - Earthquake Monitor Started")
         logging.info(f"Monitoring location: {self.config['latitude']}, {self.config['longitude']}")
-        logging.info(f"Alert radius: {self.config['radius_km']} km")
+        logging.info(f"Alert radius: {self.config['radius_km']} km" if self.config.get('radius_km') else "Alert radius: off")
+        if self.subscription:
+            logging.info(f"Subscribed places: {', '.join(sorted(self.subscription.provinces | self.subscription.towns))}")
+        if self.geofence:
+            logging.info(f"Alert zones: {', '.join(zone.name for zone in self.geofence.zones)}")
         logging.info(f"Minimum magnitude: {self.config['min_magnitude']}")
         logging.info(f"Check interval: {self.config['check_interval_seconds']} seconds")
         logging.info("=" * 60)
 
-        while True:
-            try:
-                data = self.fetch_earthquake_data()
-                if data:
-                    self.process_earthquakes(data)
+        self.start_metrics_exporter()
 
-                time.sleep(self.config['check_interval_seconds'])
+        # Serve the last good catalog straight away; the first poll below revalidates it
+        cached = self.load_cached_catalog()
+        if cached:
+            self.process_earthquakes(cached)
 
-            except KeyboardInterrupt:
-                logging.info("Monitoring stopped by user")
-                break
-            except Exception as e:
-                logging.error(f"Unexpected error: {e}")
-                time.sleep(self.config['check_interval_seconds'])
+        self.scheduler = PollScheduler(self)
+        try:
+            self.scheduler.run_forever()
+            logging.info("Monitoring stopped")
+        except KeyboardInterrupt:
+            # The scheduler has drained on its way out
+            logging.info("Monitoring stopped by user")
+        finally:
+            self.stop_metrics_exporter()
+            if self.profiler:
+                self.profiler.finish()
+
+    def stop(self):
+        """Make run() return, from any thread: a fetch in flight is abandoned, a check past its fetch finishes"""
+        if self.scheduler:
+            self.scheduler.stop()
+
+    def drain(self):
+        """
+        Persist what the checks so far have left: the seen-set, including events that raised no alert,
+        and the queued log records. The catalog cache and snapshot archive are written within a check,
+        so once the poll lock is free they are on disk
+        """
+        with self.poll_lock:
+            self.save_seen_earthquakes()
+        flush_logging()
 
 if __name__ == '__main__':
-    monitor = EarthquakeMonitor()
+    import argparse
+    from profiling import add_profile_arguments, create_profiler
+
+    parser = argparse.ArgumentParser(description="Tremr - PHIVOLCS Earthquake Monitor")
+    parser.add_argument('--config', default='config.json', help="Configuration file")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    monitor = EarthquakeMonitor(args.config)
+    monitor.profiler = create_profiler(args)
     monitor.run()
@@ -0,0 +1,125 @@
+"""
+Tremr - Metrics Exporter
+Serves the monitor's counters and histograms in Prometheus text exposition format
+"""
+
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PREFIX = 'tremr'
+
+COUNTER_HELP = {
+    'polls': "Poll cycles run",
+    'unchanged_polls': "Polls whose scrape was identical to the previous one",
+    'rows_parsed': "Earthquake rows parsed from PHIVOLCS pages",
+    'new_events': "Earthquakes seen for the first time",
+    'alerts': "Alerts sent",
+    'upstream_errors': "Failed PHIVOLCS fetches by error class"
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def split_counter_key(key):
+    """Split 'upstream_errors{class="Timeout"}' into ('upstream_errors', '{class="Timeout"}')"""
+    name, brace, labels = key.partition('{')
+    return name, brace + labels
+
+
+def format_number(value):
+    """Format a sample value the way Prometheus expects"""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsExporter:
+    """Reads an Instrumentation's counters from a server thread; the monitor never takes a lock to update them"""
+
+    def __init__(self, instrumentation, host='127.0.0.1', port=9464):
+        self.instrumentation = instrumentation
+        self.host = host
+        self.port = port
+        self.gauges = []
+        self.server = None
+        self.thread = None
+
+    def add_gauge(self, name, help_text, read_value):
+        """Export the value returned by read_value() at scrape time"""
+        self.gauges.append((name, help_text, read_value))
+
+    def render(self):
+        """Build the exposition text"""
+        lines = []
+
+        # Copy before iterating: the monitor thread may add keys while we read
+        counters = {}
+        for key, value in list(self.instrumentation.counters.items()):
+            name, labels = split_counter_key(key)
+            counters.setdefault(name, []).append((labels, value))
+
+        for name in sorted(counters):
+            metric = f"{PREFIX}_{name}_total"
+            lines.append(f"# HELP {metric} {COUNTER_HELP.get(name, name.replace('_', ' '))}")
+            lines.append(f"# TYPE {metric} counter")
+            for labels, value in sorted(counters[name]):
+                lines.append(f"{metric}{labels} {format_number(value)}")
+
+        histograms = list(self.instrumentation.histograms.items())
+        if histograms:
+            metric = f"{PREFIX}_stage_duration_seconds"
+            lines.append(f"# HELP {metric} Time spent in each poll pipeline stage")
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, histogram in sorted(histograms):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, list(histogram.counts)):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else format_number(bound / 1000)
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {format_number(histogram.total / 1000)}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {cumulative}')
+
+        for name, help_text, read_value in self.gauges:
+            metric = f"{PREFIX}_{name}"
+            try:
+                value = read_value()
+            except Exception as e:
+                logging.debug(f"Could not read gauge {name}: {e}")
+                continue
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {format_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        """Start serving /metrics in a background thread"""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop serving"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
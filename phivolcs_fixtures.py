@@ -0,0 +1,101 @@
+"""
+PHIVOLCS Page Fixtures
+Renders PHIVOLCS-shaped HTML pages and serves them locally so tests never touch the real site
+"""
+
+import threading
+from datetime import datetime
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PAGE_TEMPLATE = """<html>
+<head><title>PHIVOLCS Latest Earthquake Information</title></head>
+<body>
+<table>
+<tr><th>Date - Time (Philippine Time)</th><th>Latitude (&deg;N)</th><th>Longitude (&deg;E)</th><th>Depth (km)</th><th>Mag</th><th>Location</th></tr>
+{rows}
+</table>
+</body>
+</html>
+"""
+
+ROW_TEMPLATE = "<tr><td>{datetime}</td><td>{latitude}</td><td>{longitude}</td><td>{depth}</td><td>{magnitude}</td><td>{location}</td></tr>"
+
+
+def format_page_datetime(earthquake):
+    """Format an earthquake's date and time the way PHIVOLCS shows it, e.g. '29 October 2025 - 08:26 AM'"""
+    for layout in ('%Y-%m-%d %H:%M:%S', '%d %B %Y %I:%M %p'):
+        try:
+            origin = datetime.strptime(f"{earthquake['date']} {earthquake['time']}", layout)
+            return f"{origin:%d %B %Y - %I:%M %p}"
+        except ValueError:
+            continue
+    return f"{earthquake['date']} - {earthquake['time']}"
+
+
+def render_phivolcs_page(earthquakes):
+    """Render earthquakes (mock_data.json format) as a PHIVOLCS earthquake table page"""
+    rows = "\n".join(
+        ROW_TEMPLATE.format(
+            datetime=escape(format_page_datetime(eq)),
+            latitude=escape(eq['latitude']),
+            longitude=escape(eq['longitude']),
+            depth=escape(eq['depth'].replace(' kilometers', '')),
+            magnitude=escape(eq['magnitude']),
+            location=escape(eq['location'])
+        )
+        for eq in earthquakes
+    )
+    return PAGE_TEMPLATE.format(rows=rows).encode('utf-8')
+
+
+class FixtureServer:
+    """Serve a dict of path -> page bytes on a local port"""
+
+    def __init__(self, pages=None, host='127.0.0.1', port=0):
+        self.pages = dict(pages or {})
+        self.requests = []
+
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fixture.requests.append(self.path)
+                body = fixture.pages.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    @property
+    def url(self):
+        """Base URL of the running server"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Start serving in a background thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and release the port"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -6,107 +6,247 @@ Scrapes earthquake data from PHIVOLCS website since JSON API is no longer availa
 import requests
 import urllib3
 from bs4 import BeautifulSoup
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import logging
 import re
+from functools import lru_cache
+from instrumentation import metrics
+from poll_scheduler import run_cancellable
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-def scrape_phivolcs_earthquakes():
+PHIVOLCS_URL = "https://earthquake.phivolcs.dost.gov.ph/"
+
+# PHIVOLCS publishes times in Philippine Standard Time
+PHILIPPINE_TIME = timezone(timedelta(hours=8))
+
+# Date and time layouts seen on the live page, the monthly archive and mock data
+DATE_FORMATS = ['%d %B %Y', '%Y-%m-%d']
+TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp][Mm])?$')
+
+# BeautifulSoup tree builder; 'lxml' or 'html5lib' work too when installed (see bench_scraper.py)
+DEFAULT_HTML_PARSER = 'html.parser'
+
+
+def download_page(url, timeout, session=None):
+    """GET a page, body included; raises for HTTP errors"""
+    response = (session or requests).get(url, timeout=timeout, verify=False)
+    response.raise_for_status()
+    # Read the body here, so a slow transfer is part of what can be abandoned
+    response.content
+    return response
+
+
+def fetch_phivolcs_page(url=PHIVOLCS_URL, timeout=30, cancel=None):
+    """
+    Download a PHIVOLCS page and return the raw response body.
+    With a poll_scheduler.CancelToken as cancel, only the download runs on a helper thread and
+    Cancelled is raised as soon as it is cancelled. The fetch's own session is closed then too,
+    which stops a body still streaming in; a request still waiting for its headers runs into the timeout
+    """
+    session = requests.Session()
+    responses = []
+    session.hooks['response'].append(lambda response, *args, **kwargs: responses.append(response))
+
+    def close():
+        for response in responses:
+            response.close()
+        session.close()
+
+    unregister = cancel.on_cancel(close) if cancel is not None else (lambda: None)
+    try:
+        with metrics.stage('fetch'):
+            response = run_cancellable(download_page, cancel, url, timeout, session)
+    finally:
+        unregister()
+        session.close()
+    # Time to response headers: DNS, connect, TLS and server time together
+    metrics.observe('fetch_ttfb', response.elapsed.total_seconds() * 1000)
+    return response.content
+
+
+def check_connection(url=PHIVOLCS_URL, parser=DEFAULT_HTML_PARSER, timeout=30):
+    """
+    Download a page and check that it lists earthquakes. Returns (connected, message)
+    Records no metrics and writes no cache or archive, so it can run on a timer beside the monitor
+    """
+    try:
+        content = download_page(url, timeout).content
+    except requests.exceptions.Timeout:
+        return False, "Connection timeout"
+    except requests.exceptions.SSLError:
+        return False, "SSL certificate error"
+    except requests.exceptions.ConnectionError:
+        return False, "Cannot connect to server"
+    except requests.exceptions.HTTPError as e:
+        return False, f"HTTP Error: {e.response.status_code}"
+    except requests.exceptions.RequestException as e:
+        return False, f"Error: {str(e)}"
+
+    if next(iter_earthquake_rows(content, parser), None) is None:
+        return False, "No earthquake data available"
+    return True, "Connected"
+
+
+def parse_earthquake_rows(content, parser=DEFAULT_HTML_PARSER):
+    """
+    Extract earthquake rows from a PHIVOLCS page
+    Shared by the live scraper and the historical backfill so both read pages the same way
+    """
+    return list(iter_earthquake_rows(content, parser))
+
+
+def iter_earthquake_rows(content, parser=DEFAULT_HTML_PARSER):
+    """Yield earthquake rows from a PHIVOLCS page as they are extracted"""
+    soup = BeautifulSoup(content, parser)
+
+    # Find all tables on the page
+    tables = soup.find_all('table')
+
+    # Look for the table with earthquake data (typically table with most rows)
+    for table in tables:
+        rows = table.find_all('tr')
+
+        # Skip small tables
+        if len(rows) < 10:
+            continue
+
+        # Check if this is the earthquake data table by looking at headers
+        header_row = rows[0] if rows else None
+        if header_row:
+            headers = [cell.get_text(strip=True) for cell in header_row.find_all(['th', 'td'])]
+
+            # Check if this looks like the earthquake table
+            if len(headers) >= 6 and ('Date' in headers[0] or 'Latitude' in str(headers)):
+                # Process data rows
+                for row in rows[1:]:  # Skip header row
+                    cells = row.find_all('td')
+
+                    if len(cells) >= 6:
+                        try:
+                            # Extract data based on column positions
+                            # Column 0: Date-Time
+                            # Column 1: Latitude
+                            # Column 2: Longitude
+                            # Column 3: Depth
+                            # Column 4: Magnitude
+                            # Column 5: Location
+
+                            datetime_text = cells[0].get_text(strip=True)
+                            latitude = cells[1].get_text(strip=True)
+                            longitude = cells[2].get_text(strip=True)
+                            depth = cells[3].get_text(strip=True)
+                            magnitude = cells[4].get_text(strip=True)
+                            location = cells[5].get_text(strip=True)
+
+                            # Parse date and time
+                            # Format: "29 October 2025 - 08:26 AM"
+                            date_str = ""
+                            time_str = "00:00:00"
+
+                            if ' - ' in datetime_text:
+                                parts = datetime_text.split(' - ')
+                                date_str = parts[0].strip()
+                                if len(parts) > 1:
+                                    time_str = parts[1].strip()
+
+                            # Format depth to include 'kilometers'
+                            depth_formatted = f"{depth} kilometers"
+
+                            earthquake = {
+                                'date': date_str,
+                                'time': time_str,
+                                'latitude': latitude,
+                                'longitude': longitude,
+                                'depth': depth_formatted,
+                                'magnitude': magnitude,
+                                'location': location
+                            }
+                            yield earthquake
+
+                        except Exception as e:
+                            logging.debug(f"Error parsing row: {e}")
+                            continue
+
+
+@lru_cache(maxsize=4096)
+def parse_date(date_str):
+    """Parse a PHIVOLCS date into the Unix time of its midnight (Philippine time), or None"""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, date_format).replace(tzinfo=PHILIPPINE_TIME).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=4096)
+def parse_time(time_str):
+    """Parse a PHIVOLCS time of day ('08:26 AM', '14:30:45') into seconds after midnight, or None"""
+    match = TIME_PATTERN.match(time_str)
+    if not match:
+        return None
+
+    hour, minute, second, meridiem = match.groups()
+    hour = int(hour)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.upper() == 'PM' else 0)
+    if hour > 23 or int(minute) > 59:
+        return None
+    return hour * 3600 + int(minute) * 60 + int(second or 0)
+
+
+def parse_origin_time(earthquake):
+    """Return the event's origin time as a Unix timestamp, or None if it cannot be parsed"""
+    midnight = parse_date(earthquake.get('date', '').strip())
+    seconds = parse_time(earthquake.get('time', '').strip())
+    if midnight is None or seconds is None:
+        return None
+    return midnight + seconds
+
+
+def scrape_phivolcs_earthquakes(url=PHIVOLCS_URL, content=None, archive=None, parser=DEFAULT_HTML_PARSER, timeout=30,
+                                cancel=None):
     """
     Scrape latest earthquake data from PHIVOLCS website
     Returns data in the same format as the old JSON API
+
+    Pass content to parse an already downloaded page (e.g. an archived snapshot),
+    or a SnapshotArchive as archive to keep a copy of each changed response.
+    parser picks the BeautifulSoup tree builder; timeout is in seconds.
+    cancel (a CancelToken) can abandon the download; archiving and parsing stay on the calling thread.
     """
     try:
-        url = "https://earthquake.phivolcs.dost.gov.ph/"
-        response = requests.get(url, timeout=30, verify=False)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Find all tables on the page
-        tables = soup.find_all('table')
-
-        earthquakes = []
-
-        # Look for the table with earthquake data (typically table with most rows)
-        for table in tables:
-            rows = table.find_all('tr')
-
-            # Skip small tables
-            if len(rows) < 10:
-                continue
-
-            # Check if this is the earthquake data table by looking at headers
-            header_row = rows[0] if rows else None
-            if header_row:
-                headers = [cell.get_text(strip=True) for cell in header_row.find_all(['th', 'td'])]
-
-                # Check if this looks like the earthquake table
-                if len(headers) >= 6 and ('Date' in headers[0] or 'Latitude' in str(headers)):
-                    # Process data rows
-                    for row in rows[1:]:  # Skip header row
-                        cells = row.find_all('td')
-
-                        if len(cells) >= 6:
-                            try:
-                                # Extract data based on column positions
-                                # Column 0: Date-Time
-                                # Column 1: Latitude
-                                # Column 2: Longitude
-                                # Column 3: Depth
-                                # Column 4: Magnitude
-                                # Column 5: Location
-
-                                datetime_text = cells[0].get_text(strip=True)
-                                latitude = cells[1].get_text(strip=True)
-                                longitude = cells[2].get_text(strip=True)
-                                depth = cells[3].get_text(strip=True)
-                                magnitude = cells[4].get_text(strip=True)
-                                location = cells[5].get_text(strip=True)
-
-                                # Parse date and time
-                                # Format: "29 October 2025 - 08:26 AM"
-                                date_str = ""
-                                time_str = "00:00:00"
-
-                                if ' - ' in datetime_text:
-                                    parts = datetime_text.split(' - ')
-                                    date_str = parts[0].strip()
-                                    if len(parts) > 1:
-                                        time_str = parts[1].strip()
-
-                                # Format depth to include 'kilometers'
-                                depth_formatted = f"{depth} kilometers"
-
-                                earthquake = {
-                                    'date': date_str,
-                                    'time': time_str,
-                                    'latitude': latitude,
-                                    'longitude': longitude,
-                                    'depth': depth_formatted,
-                                    'magnitude': magnitude,
-                                    'location': location
-                                }
-                                earthquakes.append(earthquake)
-
-                            except Exception as e:
-                                logging.debug(f"Error parsing row: {e}")
-                                continue
+        if content is None:
+            content = fetch_phivolcs_page(url, timeout, cancel)
+            if archive is not None:
+                try:
+                    archive.store(content, url=url)
+                except OSError as e:
+                    logging.warning(f"Could not archive PHIVOLCS snapshot: {e}")
+
+        with metrics.stage('parse'):
+            earthquakes = parse_earthquake_rows(content, parser)
+        metrics.count('rows_parsed', len(earthquakes))
 
         if earthquakes:
             logging.info(f"Scraped {len(earthquakes)} earthquakes from PHIVOLCS")
             return {'earthquakes': earthquakes}
         else:
             logging.warning("No earthquake data found on PHIVOLCS website")
+            metrics.count_error('NoEarthquakeTable')
             return None
 
     except requests.exceptions.RequestException as e:
         logging.error(f"Error scraping PHIVOLCS website: {e}")
+        metrics.count_error(type(e).__name__)
         return None
     except Exception as e:
         logging.error(f"Unexpected error scraping PHIVOLCS: {e}")
+        metrics.count_error(type(e).__name__)
         return None
 
 
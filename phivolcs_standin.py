@@ -0,0 +1,290 @@
+"""
+Tremr - PHIVOLCS Stand-in Server
+A local HTTP server that behaves like the PHIVOLCS earthquake page, with faults on demand:
+latency, timeouts, 5xx errors, truncated bodies, slow-drip responses and schema changes.
+A script of steps makes new earthquakes appear (or faults happen) on chosen polls.
+
+Point the monitor at it with "phivolcs_page_url": "http://127.0.0.1:8765/" in config.json.
+
+Usage:
+    python phivolcs_standin.py --mock mock_data.json --port 8765
+    python phivolcs_standin.py --mock mock_data.json --latency 2 --error-rate 0.2 --timeout-rate 0.1
+    python phivolcs_standin.py --page snapshot.html --slow-drip 0.5
+    python phivolcs_standin.py --mock mock_data.json --script script.json
+
+A script is a JSON list of steps, one per request of the page:
+    [{}, {"events": [{"date": ..., "time": ..., ...}]}, {"fault": {"status": 503}}, {"new_events": 3}]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from phivolcs_fixtures import ROW_TEMPLATE, format_page_datetime, render_phivolcs_page
+from phivolcs_scraper import PHILIPPINE_TIME
+
+PAGE_PATH = '/'
+SCHEMA_CHANGES = ('renamed_headers', 'extra_column', 'no_table')
+DRIP_CHUNK_BYTES = 512
+
+# What the page would look like if PHIVOLCS reworked its table
+RENAMED_HEADER = ("<tr><th>Origin (PST)</th><th>Lat</th><th>Lon</th><th>Depth (km)</th><th>Magnitude</th>"
+                  "<th>Epicenter</th></tr>")
+EXTRA_COLUMN_HEADER = ("<tr><th>Date - Time (Philippine Time)</th><th>Region</th><th>Latitude (&deg;N)</th>"
+                       "<th>Longitude (&deg;E)</th><th>Depth (km)</th><th>Mag</th><th>Location</th></tr>")
+EXTRA_COLUMN_ROW = ROW_TEMPLATE.replace("<td>{latitude}</td>", "<td>Region IV-A</td><td>{latitude}</td>")
+
+
+def render_schema_change(earthquakes, change):
+    """Render the page with one of the SCHEMA_CHANGES applied"""
+    if change == 'no_table':
+        return b"<html><body><p>Earthquake information is temporarily unavailable.</p></body></html>"
+
+    page = render_phivolcs_page(earthquakes).decode('utf-8')
+    header_start = page.index('<tr>')
+    header_end = page.index('</tr>', header_start) + len('</tr>')
+    if change == 'renamed_headers':
+        page = page[:header_start] + RENAMED_HEADER + page[header_end:]
+    elif change == 'extra_column':
+        rows = "\n".join(
+            EXTRA_COLUMN_ROW.format(
+                datetime=escape(format_page_datetime(eq)),
+                latitude=escape(eq['latitude']),
+                longitude=escape(eq['longitude']),
+                depth=escape(eq['depth'].replace(' kilometers', '')),
+                magnitude=escape(eq['magnitude']),
+                location=escape(eq['location'])
+            )
+            for eq in earthquakes
+        )
+        table_end = page.index('</table>')
+        page = page[:header_start] + EXTRA_COLUMN_HEADER + "\n" + rows + "\n" + page[table_end:]
+    else:
+        raise ValueError(f"Unknown schema change: {change}")
+    return page.encode('utf-8')
+
+
+def make_earthquake(latitude, longitude, magnitude, location, origin=None, depth=10):
+    """An earthquake in mock_data.json format, at origin (a datetime) or now in Philippine time"""
+    origin = origin or datetime.now(PHILIPPINE_TIME)
+    return {
+        'date': f"{origin:%Y-%m-%d}",
+        'time': f"{origin:%H:%M:%S}",
+        'latitude': f"{latitude:.2f}",
+        'longitude': f"{longitude:.2f}",
+        'depth': f"{depth:03d} kilometers",
+        'magnitude': f"{magnitude:.1f}",
+        'location': location
+    }
+
+
+class Fault:
+    """How to misbehave on one response. All off by default"""
+
+    def __init__(self, latency=0.0, hang=0.0, status=None, truncate=None, slow_drip=0.0, schema=None):
+        self.latency = latency        # seconds before the response starts
+        self.hang = hang              # seconds to hold the connection and then close it without a response
+        self.status = status          # e.g. 500, 502, 503
+        self.truncate = truncate      # fraction of the body sent before the connection drops
+        self.slow_drip = slow_drip    # seconds between DRIP_CHUNK_BYTES chunks of the body
+        self.schema = schema          # one of SCHEMA_CHANGES
+
+    @classmethod
+    def from_dict(cls, options):
+        """Build a fault from a script step's "fault" object"""
+        return cls(**options)
+
+
+class StandinServer:
+    """
+    Serves a PHIVOLCS-shaped page at / from a catalog (mock_data.json format, newest first) or a recorded page
+    Every request of the page consumes the next script step, if any
+    """
+
+    def __init__(self, earthquakes=None, page=None, script=None, fault=None, error_rate=0.0, timeout_rate=0.0,
+                 seed=0, host='127.0.0.1', port=0):
+        self.earthquakes = list(earthquakes or [])
+        self.page = page
+        self.script = list(script or [])
+        self.fault = fault or Fault()
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.rng = random.Random(seed)
+        self.requests = []
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != PAGE_PATH:
+                    self.send_error(404)
+                    return
+                standin.respond(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    @property
+    def url(self):
+        """URL of the page"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{PAGE_PATH}"
+
+    def add_earthquakes(self, earthquakes):
+        """Publish earthquakes at the top of the page, as PHIVOLCS does"""
+        with self.lock:
+            self.earthquakes[:0] = earthquakes
+
+    def random_earthquakes(self, count):
+        """New earthquakes at random places in the Philippines, timed now"""
+        return [
+            make_earthquake(self.rng.uniform(5.0, 19.0), self.rng.uniform(118.0, 127.0),
+                            self.rng.uniform(1.5, 5.5), f"Synthetic event {self.rng.randint(1, 99999)}")
+            for _ in range(count)
+        ]
+
+    def next_fault(self):
+        """Advance the script and return the fault for this request"""
+        with self.lock:
+            step = self.script.pop(0) if self.script else {}
+        if step.get('events'):
+            self.add_earthquakes(step['events'])
+        if step.get('new_events'):
+            self.add_earthquakes(self.random_earthquakes(step['new_events']))
+        if 'fault' in step:
+            return Fault.from_dict(step['fault'])
+
+        roll = self.rng.random()
+        if roll < self.timeout_rate:
+            return Fault(hang=max(self.fault.hang, 60))
+        if roll < self.timeout_rate + self.error_rate:
+            return Fault(latency=self.fault.latency, status=503)
+        return self.fault
+
+    def render(self, fault):
+        """The page body for this request"""
+        if self.page is not None:
+            return self.page
+        with self.lock:
+            earthquakes = list(self.earthquakes)
+        if fault.schema:
+            return render_schema_change(earthquakes, fault.schema)
+        return render_phivolcs_page(earthquakes)
+
+    def respond(self, handler):
+        """Serve one request of the page, applying its fault"""
+        self.requests.append(time.time())
+        fault = self.next_fault()
+
+        if fault.latency and self.stopping.wait(fault.latency):
+            return
+        if fault.hang:
+            # Hold the connection open past the client's timeout, then drop it
+            self.stopping.wait(fault.hang)
+            handler.close_connection = True
+            return
+        if fault.status:
+            handler.send_error(fault.status)
+            return
+
+        body = self.render(fault)
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/html; charset=utf-8')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+
+        if fault.truncate is not None:
+            # Promise the whole body, send part of it and drop the connection
+            body = body[:int(len(body) * fault.truncate)]
+            handler.close_connection = True
+
+        try:
+            if fault.slow_drip:
+                for start in range(0, len(body), DRIP_CHUNK_BYTES):
+                    handler.wfile.write(body[start:start + DRIP_CHUNK_BYTES])
+                    handler.wfile.flush()
+                    if self.stopping.wait(fault.slow_drip):
+                        return
+            else:
+                handler.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def start(self):
+        """Start serving in a background thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server, releasing any requests held by latency or hang faults"""
+        self.stopping.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Serve a PHIVOLCS-like page locally, with optional faults")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--mock', help="Catalog in mock_data.json format")
+    source.add_argument('--page', help="Recorded PHIVOLCS page to serve as-is")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--script', help="JSON list of per-request steps")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds before every response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="Fraction of requests that never answer")
+    parser.add_argument('--truncate', type=float, help="Send only this fraction of every body")
+    parser.add_argument('--slow-drip', type=float, default=0.0, help="Seconds between 512-byte chunks")
+    parser.add_argument('--schema', choices=SCHEMA_CHANGES, help="Serve a changed page layout")
+    parser.add_argument('--new-event-every', type=int, default=0,
+                        help="Publish a random new earthquake every N requests (when no script is given)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    earthquakes = page = None
+    if args.mock:
+        with open(args.mock, 'r') as f:
+            earthquakes = json.load(f)['earthquakes']
+    else:
+        with open(args.page, 'rb') as f:
+            page = f.read()
+
+    script = None
+    if args.script:
+        with open(args.script, 'r') as f:
+            script = json.load(f)
+    elif args.new_event_every:
+        script = ([{}] * (args.new_event_every - 1) + [{'new_events': 1}]) * 10000
+
+    fault = Fault(latency=args.latency, truncate=args.truncate, slow_drip=args.slow_drip, schema=args.schema)
+    server = StandinServer(earthquakes, page, script, fault, args.error_rate, args.timeout_rate, args.seed,
+                           args.host, args.port)
+    print(f"Serving PHIVOLCS stand-in at {server.url} (Ctrl+C to stop)")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
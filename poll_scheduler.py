@@ -0,0 +1,161 @@
+"""
+Tremr - Poll Scheduler
+Runs the monitor's checks with cooperative cancellation. Between checks the loop sleeps on a
+threading.Event, so it is idle until the next check or a stop. A stop returns at once: a fetch
+still waiting on PHIVOLCS is abandoned, while a check that already has its data runs to the
+end, so its alerts are shown and the seen-set saved before the loop exits.
+"""
+
+import logging
+import threading
+
+
+class Cancelled(BaseException):
+    """
+    Raised when a wait is cancelled. A BaseException, like KeyboardInterrupt, so the broad
+    `except Exception` handlers around fetching and parsing let it through
+    """
+
+
+class CancelToken:
+    """A stop request that sleeps and waits can be woken by"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = []
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self):
+        """Request the stop; callable from any thread, any number of times"""
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """Call callback when cancelled (now, if already cancelled). Returns a function that unregisters it"""
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return lambda: self.discard(callback)
+        callback()
+        return lambda: None
+
+    def discard(self, callback):
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def check(self):
+        """Raise Cancelled if a stop was requested"""
+        if self.event.is_set():
+            raise Cancelled()
+
+    def sleep(self, seconds):
+        """Wait up to seconds, raising Cancelled as soon as a stop is requested"""
+        if self.event.wait(seconds):
+            raise Cancelled()
+
+
+def run_cancellable(function, token, *args, **kwargs):
+    """
+    Call function on a daemon thread and wait for it, or raise Cancelled as soon as token is
+    cancelled. A cancelled call is abandoned: it finishes or times out in the background and its
+    result is dropped, even if it came in first (another cancel callback may have cut it short).
+    With no token, function is simply called
+    """
+    if token is None:
+        return function(*args, **kwargs)
+    token.check()
+
+    done = threading.Event()
+    outcome = {}
+
+    def call():
+        try:
+            outcome['result'] = function(*args, **kwargs)
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=call, name=f"tremr-{getattr(function, '__name__', 'call')}", daemon=True).start()
+    unregister = token.on_cancel(done.set)
+    try:
+        done.wait()
+    finally:
+        unregister()
+    if token.cancelled:
+        raise Cancelled()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+class PollScheduler:
+    """
+    Calls monitor.poll_once(token) now and then every check_interval_seconds (read before each
+    sleep, so config reloads apply) until stopped. on_cycle runs after each check and on_error
+    with each unexpected exception; both run on the polling thread
+    """
+
+    def __init__(self, monitor, on_cycle=None, on_error=None):
+        self.monitor = monitor
+        self.on_cycle = on_cycle
+        self.on_error = on_error
+        self.token = None
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.token is not None and not self.token.cancelled
+
+    def start(self):
+        """Start polling on a new daemon thread; returns at once"""
+        if self.running:
+            return
+        self.token = CancelToken()
+        self.thread = threading.Thread(target=self.run, args=(self.token,), name='tremr-poller', daemon=True)
+        self.thread.start()
+
+    def run_forever(self):
+        """Poll on the calling thread until stop() is called from another thread"""
+        self.token = CancelToken()
+        self.run(self.token)
+
+    def stop(self):
+        """Ask the loop to stop; returns at once"""
+        if self.token is not None:
+            self.token.cancel()
+
+    def join(self, timeout=None):
+        """Wait for the polling thread to finish its current check. Returns whether it has"""
+        if self.thread is None:
+            return True
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+    def run(self, token):
+        """The loop; returns once token is cancelled, after saving the seen-set"""
+        try:
+            while not token.cancelled:
+                try:
+                    self.monitor.poll_once(token)
+                    if self.on_cycle:
+                        self.on_cycle()
+                except Exception as e:
+                    logging.error(f"Unexpected error: {e}")
+                    if self.on_error:
+                        self.on_error(e)
+                token.sleep(self.monitor.config['check_interval_seconds'])
+        except Cancelled:
+            pass
+        finally:
+            self.monitor.drain()
@@ -0,0 +1,240 @@
+"""
+Tremr - Profiling Mode
+Profiles a number of poll cycles in the running monitor and writes CPU and allocation reports
+
+Usage:
+    python main.py --profile
+    python main.py --profile --profile-cycles 30 --profiler cprofile --profile-dir profiles
+    python gui.py --profile
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+DEFAULT_PROFILE_DIR = 'profiles'
+DEFAULT_PROFILE_CYCLES = 10
+DEFAULT_SAMPLE_INTERVAL = 0.005
+TOP_ALLOCATORS = 25
+TRACEMALLOC_FRAMES = 10
+
+# Allocations made by the profiler and the import machinery are noise in the reports
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>')
+)
+
+
+def frame_label(frame):
+    """module:function label for one stack frame"""
+    code = frame.f_code
+    return f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}"
+
+
+class StackSampler:
+    """Samples one thread's call stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.sampling = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start the sampling thread (it only records while resume() is in effect)"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def resume(self):
+        self.sampling.set()
+
+    def pause(self):
+        self.sampling.clear()
+
+    def stop(self):
+        """Stop the sampling thread"""
+        self.stopped.set()
+        self.sampling.set()
+        if self.thread:
+            self.thread.join(timeout=1)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.sampling.wait()
+            if self.stopped.is_set():
+                break
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                labels = []
+                while frame is not None:
+                    labels.append(frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(labels))] += 1
+            del frame
+            time.sleep(self.interval)
+
+    def write_collapsed(self, path):
+        """Write 'stack count' lines, the input format of flamegraph.pl and speedscope"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class CycleProfiler:
+    """
+    Profiles the next `cycles` poll cycles, then writes its reports and switches itself off
+    Call start_cycle()/end_cycle() around each poll; both are no-ops once finished
+    """
+
+    def __init__(self, report_dir=DEFAULT_PROFILE_DIR, cycles=DEFAULT_PROFILE_CYCLES, profiler='sample',
+                 sample_interval=DEFAULT_SAMPLE_INTERVAL, trace_memory=True):
+        self.report_dir = os.path.join(report_dir, time.strftime('%Y%m%d-%H%M%S'))
+        self.cycles = cycles
+        self.profiler = profiler
+        self.sample_interval = sample_interval
+        self.trace_memory = trace_memory
+        self.completed = 0
+        self.finished = False
+        self.started = False
+        self.sampler = None
+        self.cprofile = None
+        self.baseline = None
+        self.previous = None
+        self.cycle_started = None
+        self.cycle_log = []
+
+    def begin(self):
+        """Set up the profilers on the polling thread, before its first cycle"""
+        os.makedirs(self.report_dir, exist_ok=True)
+        if self.profiler == 'cprofile':
+            self.cprofile = cProfile.Profile()
+        else:
+            self.sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            self.sampler.start()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.baseline = self.previous = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        self.started = True
+        logging.info(f"Profiling the next {self.cycles} poll cycles into {self.report_dir}")
+
+    def start_cycle(self):
+        """Call at the start of a poll cycle"""
+        if self.finished:
+            return
+        if not self.started:
+            self.begin()
+        self.cycle_started = time.perf_counter()
+        if self.cprofile:
+            self.cprofile.enable()
+        if self.sampler:
+            self.sampler.resume()
+
+    def end_cycle(self, **notes):
+        """Call at the end of a poll cycle; notes (e.g. seen_earthquakes=len(...)) go into the summary"""
+        if self.finished or self.cycle_started is None:
+            return
+        if self.sampler:
+            self.sampler.pause()
+        if self.cprofile:
+            self.cprofile.disable()
+
+        self.completed += 1
+        entry = {'cycle': self.completed, 'ms': (time.perf_counter() - self.cycle_started) * 1000}
+        entry.update(notes)
+        self.cycle_started = None
+
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+            current, peak = tracemalloc.get_traced_memory()
+            entry['traced_kb'] = current / 1024
+            entry['peak_kb'] = peak / 1024
+            self.write_memory_report(snapshot)
+            self.previous = snapshot
+        self.cycle_log.append(entry)
+
+        if self.completed >= self.cycles:
+            self.finish()
+
+    def write_memory_report(self, snapshot):
+        """Top allocating lines by growth since the previous cycle"""
+        path = os.path.join(self.report_dir, f"memory_cycle_{self.completed:03d}.txt")
+        with open(path, 'w') as f:
+            f.write(f"Top allocators after cycle {self.completed}, by growth since the previous cycle\n")
+            for stat in snapshot.compare_to(self.previous, 'lineno')[:TOP_ALLOCATORS]:
+                f.write(f"{stat}\n")
+
+    def write_growth_report(self):
+        """Call stacks behind the memory still held since profiling began (the slow comparison, done once)"""
+        with open(os.path.join(self.report_dir, 'memory_growth.txt'), 'w') as f:
+            f.write(f"Growth over {self.completed} cycles by allocating call stack\n")
+            for stat in self.previous.compare_to(self.baseline, 'traceback')[:TOP_ALLOCATORS]:
+                f.write(f"{stat}\n")
+                for line in stat.traceback.format()[-6:]:
+                    f.write(f"    {line}\n")
+
+    def finish(self):
+        """Write the CPU report and summary, and stop profiling"""
+        if self.finished:
+            return
+        self.finished = True
+        if not self.started:
+            return
+
+        if self.sampler:
+            self.sampler.stop()
+            self.sampler.write_collapsed(os.path.join(self.report_dir, 'cpu.collapsed'))
+        if self.cprofile:
+            self.cprofile.dump_stats(os.path.join(self.report_dir, 'cpu.prof'))
+            text = io.StringIO()
+            pstats.Stats(self.cprofile, stream=text).sort_stats('cumulative').print_stats(40)
+            with open(os.path.join(self.report_dir, 'cpu_top.txt'), 'w') as f:
+                f.write(text.getvalue())
+        if self.trace_memory:
+            self.write_growth_report()
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+        with open(os.path.join(self.report_dir, 'summary.txt'), 'w') as f:
+            f.write(self.format_summary())
+        logging.info(f"Profiling finished after {self.completed} cycles, reports in {self.report_dir}")
+
+    def format_summary(self):
+        """One line per profiled cycle"""
+        lines = [f"Profiled {self.completed} poll cycles with the {self.profiler} profiler"]
+        for entry in self.cycle_log:
+            lines.append("  ".join(
+                f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}" for key, value in entry.items()
+            ))
+        if self.trace_memory and len(self.cycle_log) > 1:
+            growth = self.cycle_log[-1]['traced_kb'] - self.cycle_log[0]['traced_kb']
+            lines.append(f"Traced memory grew {growth:.1f} KB from the first to the last profiled cycle")
+        return "\n".join(lines) + "\n"
+
+
+def add_profile_arguments(parser):
+    """Add the --profile options to an argparse parser"""
+    parser.add_argument('--profile', action='store_true', help="Profile the first poll cycles and write reports")
+    parser.add_argument('--profile-cycles', type=int, default=DEFAULT_PROFILE_CYCLES, help="Number of cycles to profile")
+    parser.add_argument('--profile-dir', default=DEFAULT_PROFILE_DIR, help="Directory for profiling reports")
+    parser.add_argument('--profiler', choices=['sample', 'cprofile'], default='sample',
+                        help="Sampling profiler (low overhead) or cProfile (exact call counts)")
+    parser.add_argument('--no-trace-memory', action='store_true', help="Skip tracemalloc snapshots")
+
+
+def create_profiler(args):
+    """Build a CycleProfiler from parsed arguments, or None without --profile"""
+    if not args.profile:
+        return None
+    return CycleProfiler(args.profile_dir, args.profile_cycles, args.profiler, trace_memory=not args.no_trace_memory)
@@ -0,0 +1,326 @@
+"""
+Tremr - Alert Replay and Backtest
+Streams a historical catalog through EarthquakeMonitor.process_earthquakes on a virtual clock
+to show which alerts would have fired, when, and how late
+
+Usage:
+    python replay.py --store earthquake_events.db --radius-km 50 --min-magnitude 4.0
+    python replay.py --mock mock_data.json
+    python replay.py --snapshots snapshots
+"""
+
+import argparse
+import json
+import logging
+import math
+import time
+from datetime import datetime
+
+import numpy as np
+
+from alert_rules import EventBatch
+from geo_utils import haversine_km
+from main import EarthquakeMonitor
+from phivolcs_scraper import parse_origin_time, PHILIPPINE_TIME
+
+# About as many rows as the live PHIVOLCS page lists; older events scroll off it
+DEFAULT_PAGE_ROWS = 500
+
+
+class VirtualClock:
+    """Simulated time. With a speed factor, advancing also sleeps so replays can be watched"""
+
+    def __init__(self, start=0.0, speed=None):
+        self.now = start
+        self.speed = speed
+
+    def advance_to(self, timestamp):
+        """Move the clock forward to timestamp"""
+        if self.speed and timestamp > self.now:
+            time.sleep((timestamp - self.now) / self.speed)
+        self.now = max(self.now, timestamp)
+
+
+class ReplayMonitor(EarthquakeMonitor):
+    """Monitor with persistence and notifications stubbed out, recording alerts on a virtual clock"""
+
+    def __init__(self, config, clock):
+        self.clock = clock
+        self.alerts = []
+        config = dict(config)
+        config.pop('snapshot_archive_dir', None)
+        config['alert_latency_file'] = None
+        super().__init__(config=config)
+        self.sound_enabled = False
+
+    def load_seen_earthquakes(self):
+        """Replays always start with an empty seen-set"""
+        pass
+
+    def save_seen_earthquakes(self):
+        """Replays never write seen_earthquakes.json"""
+        pass
+
+    def ensure_icon_exists(self):
+        """No icon is needed for stubbed notifications"""
+        return None
+
+    def now(self):
+        """Statistics windows follow the virtual clock, so historical events land in them"""
+        return self.clock.now
+
+    def calculate_distance(self, lat, lon):
+        """Haversine distance - geodesic accuracy is not worth its cost when replaying whole catalogs"""
+        return haversine_km(self.config['latitude'], self.config['longitude'], lat, lon)
+
+    def show_notification(self, earthquake, distance):
+        """Record the alert instead of showing it"""
+        origin_time = parse_origin_time(earthquake)
+        self.alerts.append({
+            'date': earthquake.get('date', ''),
+            'time': earthquake.get('time', ''),
+            'magnitude': earthquake.get('magnitude', ''),
+            'location': earthquake.get('location', ''),
+            'distance_km': round(distance, 1),
+            'origin_time': origin_time,
+            'fired_at': self.clock.now,
+            'latency_seconds': self.clock.now - origin_time if origin_time is not None else None
+        })
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class ReplayEngine:
+    def __init__(self, config, poll_interval=None, publish_delay=0.0, speed=None, page_rows=DEFAULT_PAGE_ROWS,
+                 full_pipeline=False):
+        """
+        Set up a replay of the alert rules in config. Catalog replays only decide alerts unless
+        full_pipeline is set, which runs every stage of the live monitor (enrichment, statistics,
+        sequences) on each poll
+        """
+        self.poll_interval = poll_interval or config.get('check_interval_seconds', 60)
+        self.publish_delay = publish_delay
+        self.page_rows = page_rows
+        self.full_pipeline = full_pipeline
+        self.clock = VirtualClock(speed=speed)
+        self.monitor = ReplayMonitor(config, self.clock)
+        self.events = 0
+        self.skipped = 0
+        self.polls = 0
+        self.wall_seconds = 0.0
+
+    def replay_events(self, earthquakes):
+        """
+        Replay a catalog of individual earthquakes. Each one becomes visible upstream
+        publish_delay seconds after its origin time and is picked up by the next poll. Like the
+        live page, the simulated page holds the newest page_rows events; older ones scroll off
+        and the monitor drops what it kept for them
+        """
+        # Paced replays and grouped sequence alerts need the monitor to see every poll
+        if not (self.full_pipeline or self.clock.speed or self.monitor.config.get('group_sequence_alerts')):
+            self.replay_columns(earthquakes)
+            return
+
+        started = time.perf_counter()
+
+        timed = []
+        for earthquake in earthquakes:
+            origin_time = parse_origin_time(earthquake)
+            if origin_time is None:
+                self.skipped += 1
+                continue
+            timed.append((origin_time + self.publish_delay, earthquake))
+        timed.sort(key=lambda item: item[0])
+
+        interval = self.poll_interval
+        index = 0
+        while index < len(timed):
+            # Polls that would see nothing new are skipped rather than simulated
+            poll_time = math.ceil(timed[index][0] / interval) * interval
+            batch = []
+            while index < len(timed) and timed[index][0] <= poll_time:
+                batch.append(timed[index][1])
+                index += 1
+
+            self.clock.advance_to(poll_time)
+            delta = self.monitor.scrape_diff.scroll(batch, self.page_rows)
+            # Only alert rules look at the whole page; don't copy it out otherwise
+            page = self.monitor.scrape_diff.rows() if self.monitor.rules is not None else batch
+            self.monitor.process_earthquakes({'earthquakes': page}, delta)
+            self.polls += 1
+            self.events += len(batch)
+
+        self.wall_seconds += time.perf_counter() - started
+
+    def replay_columns(self, earthquakes):
+        """
+        replay_events without the per-poll pipeline: the alert rules are evaluated over the whole
+        catalog as columns, then alerts fire in the order and at the polls the live monitor would
+        have fired them
+        """
+        started = time.perf_counter()
+
+        earthquakes = list(earthquakes)
+        monitor = self.monitor
+        batch = EventBatch(earthquakes, monitor.config['latitude'], monitor.config['longitude'], monitor.geofence)
+        origins = batch.column(('origin',))
+        timed = np.flatnonzero(~np.isnan(origins))
+        self.skipped += len(earthquakes) - len(timed)
+
+        visible = origins[timed] + self.publish_delay
+        order = np.argsort(visible, kind='stable')
+        timed = timed[order]
+        interval = self.poll_interval
+        poll_times = np.ceil(visible[order] / interval) * interval
+
+        alerting = monitor.alert_mask(batch)
+        distances = batch.column(('distance',))
+        seen = monitor.seen_earthquakes
+        for index, poll_time in zip(timed.tolist(), poll_times.tolist()):
+            earthquake = earthquakes[index]
+            earthquake_id = monitor.create_earthquake_id(earthquake)
+            if earthquake_id in seen:
+                continue
+            seen.add(earthquake_id)
+            if alerting[index]:
+                self.clock.advance_to(poll_time)
+                monitor.show_notification(earthquake, float(distances[index]))
+
+        if len(poll_times):
+            self.clock.advance_to(poll_times[-1])
+        self.polls += len(np.unique(poll_times))
+        self.events += len(timed)
+        self.wall_seconds += time.perf_counter() - started
+
+    def replay_pages(self, pages):
+        """Replay whole scraped pages, given as (fetched_at, data) pairs in fetch order"""
+        started = time.perf_counter()
+        for fetched_at, data in pages:
+            if not data:
+                continue
+            self.clock.advance_to(fetched_at)
+            delta = self.monitor.process_earthquakes(data)
+            self.polls += 1
+            self.events += len(delta.inserted) + len(delta.modified)
+        self.wall_seconds += time.perf_counter() - started
+
+    def report(self):
+        """Summarise the replay: alerts that would have fired, their latency and replay speed"""
+        latencies = sorted(alert['latency_seconds'] for alert in self.monitor.alerts
+                           if alert['latency_seconds'] is not None)
+        return {
+            'rules': {
+                'latitude': self.monitor.config['latitude'],
+                'longitude': self.monitor.config['longitude'],
+                'radius_km': self.monitor.config['radius_km'],
+                'min_magnitude': self.monitor.config['min_magnitude'],
+                'poll_interval_seconds': self.poll_interval,
+                'publish_delay_seconds': self.publish_delay
+            },
+            'events': self.events,
+            'skipped_events': self.skipped,
+            'polls': self.polls,
+            'alerts': self.monitor.alerts,
+            'latency_seconds': {
+                'p50': percentile(latencies, 0.50),
+                'p95': percentile(latencies, 0.95),
+                'max': latencies[-1] if latencies else None
+            },
+            'wall_seconds': self.wall_seconds,
+            'events_per_second': self.events / self.wall_seconds if self.wall_seconds > 0 else None
+        }
+
+
+def load_config_file(config_file):
+    """Load config.json without creating one"""
+    try:
+        with open(config_file, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Backtest Tremr alert settings against historical earthquakes")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--store', help="Event store database (see backfill.py)")
+    source.add_argument('--snapshots', help="Snapshot archive directory")
+    source.add_argument('--mock', help="JSON file in mock_data.json format")
+    parser.add_argument('--config', default='config.json', help="Base configuration")
+    parser.add_argument('--latitude', type=float)
+    parser.add_argument('--longitude', type=float)
+    parser.add_argument('--radius-km', type=float)
+    parser.add_argument('--min-magnitude', type=float)
+    parser.add_argument('--interval', type=float, help="Poll interval in seconds (default: check_interval_seconds)")
+    parser.add_argument('--publish-delay', type=float, default=0.0, help="Seconds between origin time and PHIVOLCS posting it")
+    parser.add_argument('--page-rows', type=int, default=DEFAULT_PAGE_ROWS, help="Rows on the simulated PHIVOLCS page")
+    parser.add_argument('--speed', type=float, help="Pace the replay at this multiple of real time (default: as fast as possible)")
+    parser.add_argument('--full-pipeline', action='store_true',
+                        help="Run every monitor stage on each poll, not just the alert rules")
+    parser.add_argument('--json', help="Write the full report to this file")
+    args = parser.parse_args()
+
+    # Keep per-alert log lines out of the console; the report lists them
+    logging.getLogger().setLevel(logging.WARNING)
+
+    config = {
+        "latitude": 14.5995,
+        "longitude": 120.9842,
+        "radius_km": 100,
+        "min_magnitude": 3.0,
+        "check_interval_seconds": 60
+    }
+    config.update(load_config_file(args.config))
+    for key, value in [('latitude', args.latitude), ('longitude', args.longitude),
+                       ('radius_km', args.radius_km), ('min_magnitude', args.min_magnitude)]:
+        if value is not None:
+            config[key] = value
+
+    engine = ReplayEngine(config, poll_interval=args.interval, publish_delay=args.publish_delay, speed=args.speed,
+                          page_rows=args.page_rows, full_pipeline=args.full_pipeline)
+
+    if args.store:
+        from event_store import EventStore
+        store = EventStore(args.store)
+        engine.replay_events(store.iter_events())
+        store.close()
+    elif args.snapshots:
+        from snapshot_archive import SnapshotArchive
+        archive = SnapshotArchive(args.snapshots)
+        engine.replay_pages((entry['fetched_at'], data) for entry, data in archive.replay())
+    else:
+        with open(args.mock, 'r') as f:
+            engine.replay_events(json.load(f)['earthquakes'])
+
+    report = engine.report()
+
+    print("=" * 60)
+    print(f"Replayed {report['events']} earthquakes in {report['polls']} polls "
+          f"({report['wall_seconds']:.2f}s, {report['events_per_second'] or 0:,.0f} events/s)")
+    print(f"Rules: within {config['radius_km']} km of {config['latitude']}, {config['longitude']}, "
+          f"magnitude >= {config['min_magnitude']}")
+    print(f"Alerts that would have fired: {len(report['alerts'])}")
+    print("=" * 60)
+    for alert in report['alerts']:
+        fired = datetime.fromtimestamp(alert['fired_at'], PHILIPPINE_TIME).strftime('%Y-%m-%d %H:%M:%S')
+        latency = f"{alert['latency_seconds']:.0f}s" if alert['latency_seconds'] is not None else "?"
+        print(f"  {fired}  M{alert['magnitude']:<4} {alert['distance_km']:>6.1f} km  latency {latency:>6}  {alert['location']}")
+    if report['alerts']:
+        latency = report['latency_seconds']
+        print(f"\nLatency p50 {latency['p50']:.0f}s, p95 {latency['p95']:.0f}s, max {latency['max']:.0f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"\nFull report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
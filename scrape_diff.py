@@ -0,0 +1,110 @@
+"""
+Tremr - Scrape Diff Engine
+Compares consecutive PHIVOLCS scrapes and reports only the rows that changed
+"""
+
+from collections import deque, namedtuple
+from operator import itemgetter
+
+ROW_FIELDS = ('date', 'time', 'latitude', 'longitude', 'depth', 'magnitude', 'location')
+
+# inserted/removed are lists of rows, modified is a list of (old_row, new_row) pairs
+ScrapeDelta = namedtuple('ScrapeDelta', ['inserted', 'removed', 'modified'])
+
+
+get_row_fields = itemgetter(*ROW_FIELDS)
+
+
+def row_fingerprint(row):
+    """Fingerprint a scraped row by every published field"""
+    return tuple(row.get(field, '') for field in ROW_FIELDS)
+
+
+def fingerprint_rows(rows):
+    """Fingerprint a whole scrape, using the C-level itemgetter when every row has every field"""
+    try:
+        return dict(zip(map(get_row_fields, rows), rows))
+    except KeyError:
+        return dict(zip(map(row_fingerprint, rows), rows))
+
+
+def row_origin_key(row):
+    """Key used to recognise the same event across a revision (PHIVOLCS keeps the origin time)"""
+    return (row.get('date', ''), row.get('time', ''))
+
+
+class ScrapeDiff:
+    """Keeps the previous scrape's fingerprints and diffs each new scrape against them"""
+
+    def __init__(self):
+        self.previous = {}
+        # Fingerprints oldest first, kept by scroll()
+        self.order = None
+
+    def diff(self, rows):
+        """Return the ScrapeDelta between the previous scrape and rows, then remember rows"""
+        current = fingerprint_rows(rows)
+        self.order = None
+
+        if not self.previous:
+            self.previous = current
+            return ScrapeDelta(list(current.values()), [], [])
+
+        added = current.keys() - self.previous.keys()
+        gone = self.previous.keys() - current.keys()
+
+        inserted = []
+        modified = []
+        removed = {}
+
+        if added and gone:
+            # Pair an added row with a removed row of the same origin time: that's a revision
+            for fingerprint in gone:
+                row = self.previous[fingerprint]
+                removed.setdefault(row_origin_key(row), []).append(row)
+
+            for fingerprint in added:
+                row = current[fingerprint]
+                candidates = removed.get(row_origin_key(row))
+                if candidates and len(candidates) == 1:
+                    modified.append((candidates.pop(), row))
+                else:
+                    inserted.append(row)
+
+            removed_rows = [row for rows_at_time in removed.values() for row in rows_at_time]
+        else:
+            inserted = [current[fingerprint] for fingerprint in added]
+            removed_rows = [self.previous[fingerprint] for fingerprint in gone]
+
+        self.previous = current
+        return ScrapeDelta(inserted, removed_rows, modified)
+
+    def scroll(self, rows, page_rows):
+        """
+        Put rows at the top of the remembered page and let the oldest scroll off past page_rows,
+        as they do on the PHIVOLCS page. Returns the ScrapeDelta that diff() would give for the
+        resulting page, at a cost of the rows added and removed rather than the page size
+        """
+        if self.order is None:
+            # Pages are listed newest first
+            self.order = deque(reversed(list(self.previous)))
+        inserted = []
+        for row in rows:
+            fingerprint = row_fingerprint(row)
+            if fingerprint not in self.previous:
+                self.previous[fingerprint] = row
+                self.order.append(fingerprint)
+                inserted.append(row)
+        removed = []
+        while len(self.order) > page_rows:
+            removed.append(self.previous.pop(self.order.popleft()))
+        return ScrapeDelta(inserted, removed, [])
+
+    def rows(self):
+        """The rows of the previous scrape"""
+        return list(self.previous.values())
+
+    def reset(self):
+        """Forget the previous scrape so the next one is treated as all new"""
+        self.previous = {}
+        self.order = None
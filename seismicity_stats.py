@@ -0,0 +1,247 @@
+"""
+Tremr - Seismicity Statistics
+Running aggregates over the earthquake stream, updated in O(1) per event and read in O(1):
+rolling counts per region in fixed time buckets, magnitude histograms, a Gutenberg-Richter
+b-value (Aki-Utsu maximum likelihood) and a z-score of the current bucket's count against the
+rest of the window, which flags unusual activity
+"""
+
+import logging
+import math
+
+from location_parser import parse_location
+from phivolcs_scraper import parse_origin_time
+
+DEFAULT_BUCKET_MINUTES = 60
+DEFAULT_WINDOW_HOURS = 7 * 24
+DEFAULT_COMPLETENESS_MAGNITUDE = 2.5
+DEFAULT_Z_THRESHOLD = 3.0
+DEFAULT_MIN_EVENTS = 3
+MAGNITUDE_BIN = 0.1
+MAGNITUDE_BINS = 100  # 0.0 - 9.9
+EARTH_RADIUS_KM = 6371.0088
+SITE_REGION = 'site'
+ALL_REGION = 'all'
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class RegionStats:
+    """
+    Aggregates for one region. counts is a ring of per-bucket event counts covering the window;
+    total and total_squares are kept alongside so window means and variances need no rescan
+    """
+
+    def __init__(self, buckets, completeness_magnitude=DEFAULT_COMPLETENESS_MAGNITUDE):
+        self.buckets = buckets
+        self.counts = [0] * buckets
+        self.head = None  # number of the newest bucket in the ring
+        self.total = 0
+        self.total_squares = 0
+        self.histogram = [0] * MAGNITUDE_BINS
+        self.completeness_magnitude = completeness_magnitude
+        self.complete_events = 0
+        self.complete_magnitude_sum = 0.0
+        self.events = 0
+
+    def advance(self, bucket):
+        """Move the window forward so bucket is the newest; clears at most one window of buckets"""
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        for number in range(max(self.head + 1, bucket - self.buckets + 1), bucket + 1):
+            slot = number % self.buckets
+            count = self.counts[slot]
+            self.total -= count
+            self.total_squares -= count * count
+            self.counts[slot] = 0
+        self.head = bucket
+
+    def add(self, bucket, magnitude, sign=1):
+        """Count (sign=1) or uncount (sign=-1) an event"""
+        self.events += sign
+        if magnitude is not None:
+            self.histogram[min(MAGNITUDE_BINS - 1, max(0, int(round(magnitude / MAGNITUDE_BIN))))] += sign
+            if magnitude >= self.completeness_magnitude - 1e-9:
+                self.complete_events += sign
+                self.complete_magnitude_sum += sign * magnitude
+
+        # Only the clock moves the window (SeismicityStats.advance): events from before it or
+        # stamped ahead of it (a skewed upstream clock) count towards magnitudes only
+        if bucket is None or self.head is None or bucket <= self.head - self.buckets or bucket > self.head:
+            return
+        slot = bucket % self.buckets
+        count = self.counts[slot]
+        if count + sign < 0:
+            return
+        self.counts[slot] = count + sign
+        self.total += sign
+        self.total_squares += (count + sign) ** 2 - count * count
+
+    def current_count(self):
+        """Events in the newest bucket"""
+        return self.counts[self.head % self.buckets] if self.head is not None else 0
+
+    def rate_zscore(self):
+        """
+        How unusual the newest bucket is: (count - mean) / std over the other buckets in the window.
+        The std is at least sqrt(mean) (Poisson) and at least 1/sqrt(buckets), so quiet regions
+        aren't flagged for a single event. None until there is any history
+        """
+        if self.head is None or self.buckets < 2:
+            return None
+        current = self.current_count()
+        others = self.buckets - 1
+        mean = (self.total - current) / others
+        variance = max(0.0, (self.total_squares - current * current) / others - mean * mean)
+        std = max(math.sqrt(variance), math.sqrt(mean), 1.0 / math.sqrt(others))
+        return (current - mean) / std
+
+    def b_value(self):
+        """Aki-Utsu b-value over events at or above the completeness magnitude, with its standard error"""
+        if self.complete_events < 2:
+            return None, None
+        mean = self.complete_magnitude_sum / self.complete_events
+        excess = mean - (self.completeness_magnitude - MAGNITUDE_BIN / 2)
+        if excess <= 0:
+            return None, None
+        b = math.log10(math.e) / excess
+        return b, b / math.sqrt(self.complete_events)
+
+
+class SeismicityStats:
+    """
+    RegionStats for every region: 'all', 'site' (within radius_km of the configured location)
+    and each province named in PHIVOLCS location text
+    """
+
+    def __init__(self, latitude, longitude, radius_km, bucket_minutes=DEFAULT_BUCKET_MINUTES,
+                 window_hours=DEFAULT_WINDOW_HOURS, completeness_magnitude=DEFAULT_COMPLETENESS_MAGNITUDE,
+                 z_threshold=DEFAULT_Z_THRESHOLD, min_events=DEFAULT_MIN_EVENTS):
+        self.site = (latitude, longitude)
+        self.radius_km = radius_km
+        self.bucket_seconds = bucket_minutes * 60
+        self.buckets = max(2, int(round(window_hours * 60 / bucket_minutes)))
+        self.completeness_magnitude = completeness_magnitude
+        self.z_threshold = z_threshold
+        self.min_events = min_events
+        self.regions = {}
+        self.flagged = set()
+        self.now_bucket = None
+
+    @classmethod
+    def from_config(cls, config):
+        radius = config.get('stats_radius_km') or config.get('radius_km') or 100
+        return cls(config['latitude'], config['longitude'], radius,
+                   config.get('stats_bucket_minutes', DEFAULT_BUCKET_MINUTES),
+                   config.get('stats_window_hours', DEFAULT_WINDOW_HOURS),
+                   config.get('completeness_magnitude', DEFAULT_COMPLETENESS_MAGNITUDE),
+                   config.get('anomaly_z_threshold', DEFAULT_Z_THRESHOLD),
+                   config.get('anomaly_min_events', DEFAULT_MIN_EVENTS))
+
+    def region(self, name):
+        """The RegionStats for a region, created on first use"""
+        stats = self.regions.get(name)
+        if stats is None:
+            stats = self.regions[name] = RegionStats(self.buckets, self.completeness_magnitude)
+            # A new region's window ends now, not at its first (possibly days old) event
+            if self.now_bucket is not None:
+                stats.advance(self.now_bucket)
+        return stats
+
+    def regions_of(self, earthquake):
+        """Region names an earthquake counts towards"""
+        names = [ALL_REGION]
+        try:
+            if haversine_km(*self.site, float(earthquake['latitude']), float(earthquake['longitude'])) <= self.radius_km:
+                names.append(SITE_REGION)
+        except (KeyError, ValueError, TypeError):
+            pass
+        parsed = parse_location(earthquake.get('location'))
+        if parsed is not None and parsed.province_key:
+            names.append(f"province:{parsed.province_key}")
+        return names
+
+    def add(self, earthquake, sign=1):
+        """Count an earthquake (sign=-1 takes it back out, e.g. before counting its revision)"""
+        origin = parse_origin_time(earthquake)
+        bucket = int(origin // self.bucket_seconds) if origin is not None else None
+        try:
+            magnitude = float(earthquake.get('magnitude'))
+        except (TypeError, ValueError):
+            magnitude = None
+        names = self.regions_of(earthquake)
+        for name in names:
+            self.region(name).add(bucket, magnitude, sign)
+        return names
+
+    def advance(self, now):
+        """Move every region's window up to the time now (Unix seconds)"""
+        bucket = int(now // self.bucket_seconds)
+        self.now_bucket = bucket
+        for stats in self.regions.values():
+            stats.advance(bucket)
+
+    def is_anomalous(self, name):
+        """Whether a region's newest bucket is unusually busy"""
+        stats = self.regions.get(name)
+        if stats is None or stats.current_count() < self.min_events:
+            return False
+        z = stats.rate_zscore()
+        return z is not None and z >= self.z_threshold
+
+    def check_anomalies(self, names):
+        """Log regions among names that just became unusual; returns those names"""
+        started = []
+        for name in names:
+            if self.is_anomalous(name):
+                if name not in self.flagged:
+                    self.flagged.add(name)
+                    started.append(name)
+                    stats = self.regions[name]
+                    others = stats.buckets - 1
+                    logging.warning(
+                        f"Unusual earthquake activity ({name}): {stats.current_count()} events in the last "
+                        f"{self.bucket_seconds // 60} minutes vs {(stats.total - stats.current_count()) / others:.2f} "
+                        f"typical (z={stats.rate_zscore():.1f})"
+                    )
+            else:
+                self.flagged.discard(name)
+        return started
+
+    def update(self, delta):
+        """
+        Count a scrape's new and revised rows and check the regions they touched. Removed rows have
+        only scrolled off the PHIVOLCS page, so they stay counted
+        """
+        touched = set()
+        for old_earthquake, earthquake in delta.modified:
+            touched.update(self.add(old_earthquake, -1))
+            touched.update(self.add(earthquake))
+        for earthquake in delta.inserted:
+            touched.update(self.add(earthquake))
+        return self.check_anomalies(sorted(touched))
+
+    def summary(self, name=SITE_REGION):
+        """Current figures for a region, as a dict"""
+        stats = self.regions.get(name)
+        if stats is None:
+            return None
+        b, b_error = stats.b_value()
+        return {
+            'events': stats.events,
+            'window_events': stats.total,
+            'current_bucket_events': stats.current_count(),
+            'rate_zscore': stats.rate_zscore(),
+            'anomalous': self.is_anomalous(name),
+            'b_value': b,
+            'b_value_error': b_error,
+            'magnitude_histogram': {round(i * MAGNITUDE_BIN, 1): count
+                                    for i, count in enumerate(stats.histogram) if count}
+        }
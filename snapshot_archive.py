@@ -0,0 +1,166 @@
+"""
+Tremr - Raw Snapshot Archive
+Keeps compressed, content-addressed copies of the PHIVOLCS pages the scraper saw,
+so misparsed rows can be debugged and replayed through the parser later
+
+Usage:
+    python snapshot_archive.py list
+    python snapshot_archive.py replay [--since "2025-10-28 00:00"]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+DEFAULT_ARCHIVE_DIR = 'snapshots'
+DEFAULT_MAX_MB = 50
+DEFAULT_MAX_BYTES = DEFAULT_MAX_MB * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class SnapshotArchive:
+    """Stores each changed upstream response once, indexed by fetch time"""
+
+    def __init__(self, archive_dir=DEFAULT_ARCHIVE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.archive_dir = archive_dir
+        self.blob_dir = os.path.join(archive_dir, 'blobs')
+        self.index_file = os.path.join(archive_dir, 'index.jsonl')
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 86400
+        self.max_entries = max_entries
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.entries = self.load_index()
+        self.blob_sizes = {entry['sha256']: entry['compressed_size'] for entry in self.entries}
+
+    def load_index(self):
+        """Load index entries (oldest first)"""
+        entries = []
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        logging.warning(f"Skipping corrupt snapshot index line in {self.index_file}")
+        return entries
+
+    def blob_path(self, digest):
+        """Path of the compressed blob for a content hash"""
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.gz")
+
+    def store(self, content, url=None, fetched_at=None):
+        """Archive a response body if it differs from the last one. Returns its hash, or None if unchanged"""
+        digest = hashlib.sha256(content).hexdigest()
+        if self.entries and self.entries[-1]['sha256'] == digest:
+            return None
+
+        if digest not in self.blob_sizes:
+            path = self.blob_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(gzip.compress(content))
+            os.replace(temp_path, path)
+            self.blob_sizes[digest] = os.path.getsize(path)
+
+        entry = {
+            'fetched_at': fetched_at if fetched_at is not None else time.time(),
+            'sha256': digest,
+            'size': len(content),
+            'compressed_size': self.blob_sizes[digest],
+            'url': url
+        }
+        self.entries.append(entry)
+        with open(self.index_file, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+        self.apply_retention()
+        return digest
+
+    def apply_retention(self, now=None):
+        """Drop entries that are too old or over the size/count budget, and delete unreferenced blobs"""
+        now = now if now is not None else time.time()
+        keep = [entry for entry in self.entries if now - entry['fetched_at'] <= self.max_age_seconds]
+        if len(keep) > self.max_entries:
+            keep = keep[-self.max_entries:]
+
+        referenced = {entry['sha256'] for entry in keep}
+        total = sum(self.blob_sizes[digest] for digest in referenced)
+        while total > self.max_bytes and len(keep) > 1:
+            dropped = keep.pop(0)['sha256']
+            if not any(entry['sha256'] == dropped for entry in keep):
+                referenced.discard(dropped)
+                total -= self.blob_sizes[dropped]
+
+        if len(keep) == len(self.entries):
+            return
+
+        for digest in set(self.blob_sizes) - referenced:
+            try:
+                os.remove(self.blob_path(digest))
+            except OSError:
+                pass
+            del self.blob_sizes[digest]
+
+        self.entries = keep
+        temp_file = self.index_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            for entry in keep:
+                f.write(json.dumps(entry) + '\n')
+        os.replace(temp_file, self.index_file)
+
+    def load(self, digest):
+        """Return the original response body for a content hash"""
+        with open(self.blob_path(digest), 'rb') as f:
+            return gzip.decompress(f.read())
+
+    def find(self, start=None, end=None):
+        """List index entries fetched within [start, end) Unix times"""
+        return [
+            entry for entry in self.entries
+            if (start is None or entry['fetched_at'] >= start) and (end is None or entry['fetched_at'] < end)
+        ]
+
+    def replay(self, start=None, end=None):
+        """Feed archived snapshots back through the scraper. Yields (entry, scraped_data) in fetch order"""
+        from phivolcs_scraper import scrape_phivolcs_earthquakes
+
+        for entry in self.find(start, end):
+            yield entry, scrape_phivolcs_earthquakes(content=self.load(entry['sha256']))
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Inspect and replay archived PHIVOLCS snapshots")
+    parser.add_argument('command', choices=['list', 'replay'])
+    parser.add_argument('--dir', default=DEFAULT_ARCHIVE_DIR, help="Archive directory")
+    parser.add_argument('--since', help="Only snapshots fetched after this time, e.g. '2025-10-28 00:00'")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    archive = SnapshotArchive(args.dir)
+    start = datetime.strptime(args.since, '%Y-%m-%d %H:%M').timestamp() if args.since else None
+
+    if args.command == 'list':
+        for entry in archive.find(start):
+            fetched = datetime.fromtimestamp(entry['fetched_at']).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"{fetched}  {entry['sha256'][:12]}  {entry['size']:>8} bytes  ({entry['compressed_size']} compressed)")
+        print(f"\n{len(archive.entries)} snapshots, {sum(archive.blob_sizes.values())} bytes on disk")
+    else:
+        for entry, data in archive.replay(start):
+            fetched = datetime.fromtimestamp(entry['fetched_at']).strftime('%Y-%m-%d %H:%M:%S')
+            rows = len(data['earthquakes']) if data else 0
+            print(f"{fetched}  {entry['sha256'][:12]}  {rows} earthquakes parsed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+Tremr - Synthetic Earthquake Catalogs
+Generates realistic workloads for stress testing: background seismicity in Philippine source zones,
+Gutenberg-Richter magnitudes, and ETAS aftershock cascades (Omori-Utsu decay in time, clustering
+around the parent in space). Seedable, and vectorized so millions of events take seconds.
+
+Usage:
+    python synthetic_catalog.py --days 30 --output synthetic.json
+    python synthetic_catalog.py --days 2 --mainshock 7.1:9.3:126.3 --format script --poll-seconds 60 --output storm.json
+    python synthetic_catalog.py --days 365 --rate 300 --format npz --output year.npz
+    python synthetic_catalog.py --days 1 --format html --output pages/
+
+Columns share the layout used by threshold_sweep.py (origin_time, latitude, longitude, magnitude),
+plus depth, zone and parent (-1 for background events).
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from phivolcs_fixtures import render_phivolcs_page
+
+# name, latitude, longitude, spread (km), share of background events, typical depth (km), reference town
+SOURCE_ZONES = [
+    ('Philippine Trench (Surigao)', 9.0, 126.6, 60, 0.16, 30, 'Hinatuan (Surigao Del Sur)'),
+    ('Philippine Trench (Davao Oriental)', 7.0, 126.8, 60, 0.14, 40, 'Governor Generoso (Davao Oriental)'),
+    ('East Luzon Trough', 15.6, 122.6, 70, 0.06, 25, 'Baler (Aurora)'),
+    ('Manila Trench', 15.0, 119.3, 80, 0.08, 35, 'Iba (Zambales)'),
+    ('Batanes', 20.4, 121.9, 60, 0.06, 30, 'Itbayat (Batanes)'),
+    ('Philippine Fault (Luzon)', 15.8, 121.1, 40, 0.06, 12, 'Rizal (Nueva Ecija)'),
+    ('Philippine Fault (Masbate)', 12.3, 123.7, 40, 0.08, 12, 'Dimasalang (Masbate)'),
+    ('Philippine Fault (Leyte)', 10.9, 125.0, 40, 0.06, 12, 'Abuyog (Leyte)'),
+    ('Lubang Fault (Mindoro)', 13.7, 120.6, 40, 0.07, 20, 'Calatagan (Batangas)'),
+    ('Negros Trench', 10.0, 122.2, 50, 0.05, 30, 'Sipalay City (Negros Occidental)'),
+    ('Cotabato Trench', 6.2, 124.0, 60, 0.09, 35, 'Kalamansig (Sultan Kudarat)'),
+    ('Central Mindanao', 7.3, 124.8, 50, 0.05, 15, 'Makilala (Cotabato)'),
+    ('Bohol', 9.8, 124.2, 35, 0.04, 15, 'Sagbayan (Bohol)'),
+]
+
+PHILIPPINE_BOUNDS = (4.5, 21.5, 116.0, 127.5)
+KM_PER_DEGREE = 111.2
+SECONDS_PER_DAY = 86400.0
+PHILIPPINE_OFFSET_SECONDS = 8 * 3600
+COLUMNS = ('origin_time', 'latitude', 'longitude', 'depth', 'magnitude', 'zone', 'parent')
+
+
+class ETASModel:
+    """Parameters of the epidemic-type aftershock sequence model"""
+
+    def __init__(self, background_per_day=60.0, b_value=1.0, min_magnitude=1.5, max_magnitude=8.5,
+                 productivity=0.06, alpha=0.8, omori_c_days=0.01, omori_p=1.1, max_generations=30):
+        self.background_per_day = background_per_day
+        self.b_value = b_value
+        self.min_magnitude = min_magnitude
+        self.max_magnitude = max_magnitude
+        self.productivity = productivity      # K: expected aftershocks of a min_magnitude event
+        self.alpha = alpha                    # growth of productivity with magnitude
+        self.omori_c_days = omori_c_days
+        self.omori_p = omori_p
+        self.max_generations = max_generations
+
+    def branching_ratio(self):
+        """Mean number of direct aftershocks per event; must stay below 1 for a stable catalog"""
+        b = self.b_value
+        return self.productivity * b / (b - self.alpha) if b > self.alpha else float('inf')
+
+
+def gutenberg_richter(rng, count, model):
+    """Magnitudes following Gutenberg-Richter above min_magnitude, truncated at max_magnitude"""
+    beta = model.b_value * np.log(10)
+    span = model.max_magnitude - model.min_magnitude
+    # Inverse transform of the truncated exponential
+    u = rng.random(count)
+    return model.min_magnitude - np.log1p(-u * (1 - np.exp(-beta * span))) / beta
+
+
+def omori_delays(rng, count, model):
+    """Aftershock delays in seconds from the Omori-Utsu law"""
+    c = model.omori_c_days
+    p = model.omori_p
+    u = rng.random(count)
+    return c * ((1 - u) ** (1 / (1 - p)) - 1) * SECONDS_PER_DAY
+
+
+def offset_positions(rng, latitude, longitude, spread_km):
+    """Scatter points around (latitude, longitude) with a Gaussian of spread_km"""
+    count = len(latitude)
+    north = rng.normal(0, 1, count) * spread_km
+    east = rng.normal(0, 1, count) * spread_km
+    lat = latitude + north / KM_PER_DEGREE
+    lon = longitude + east / (KM_PER_DEGREE * np.cos(np.radians(lat)))
+    south, north_bound, west, east_bound = PHILIPPINE_BOUNDS
+    return np.clip(lat, south, north_bound), np.clip(lon, west, east_bound)
+
+
+def background_events(rng, model, start, days):
+    """Poisson background seismicity spread over the source zones"""
+    count = rng.poisson(model.background_per_day * days)
+    weights = np.array([zone[4] for zone in SOURCE_ZONES])
+    zone = rng.choice(len(SOURCE_ZONES), size=count, p=weights / weights.sum())
+    centers = np.array([(z[1], z[2], z[3], z[5]) for z in SOURCE_ZONES])[zone]
+    latitude, longitude = offset_positions(rng, centers[:, 0], centers[:, 1], centers[:, 2])
+    return {
+        'origin_time': start + rng.random(count) * days * SECONDS_PER_DAY,
+        'latitude': latitude,
+        'longitude': longitude,
+        'depth': np.maximum(1, rng.gamma(2.0, centers[:, 3] / 2.0)),
+        'magnitude': gutenberg_richter(rng, count, model),
+        'zone': zone,
+        'parent': np.full(count, -1)
+    }
+
+
+def mainshock_events(mainshocks, start):
+    """Fixed (magnitude, latitude, longitude[, day offset]) mainshocks, assigned to the nearest zone"""
+    rows = []
+    for shock in mainshocks:
+        magnitude, latitude, longitude = shock[:3]
+        offset_days = shock[3] if len(shock) > 3 else 0.0
+        zone = int(np.argmin([(z[1] - latitude) ** 2 + (z[2] - longitude) ** 2 for z in SOURCE_ZONES]))
+        rows.append((start + offset_days * SECONDS_PER_DAY, latitude, longitude, SOURCE_ZONES[zone][5], magnitude, zone))
+    table = np.array(rows, dtype=float).reshape(-1, 6)
+    return {
+        'origin_time': table[:, 0],
+        'latitude': table[:, 1],
+        'longitude': table[:, 2],
+        'depth': table[:, 3],
+        'magnitude': table[:, 4],
+        'zone': table[:, 5].astype(int),
+        'parent': np.full(len(table), -1)
+    }
+
+
+def concatenate(batches):
+    """Join column batches"""
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in COLUMNS}
+
+
+def aftershocks(rng, parents, first_index, model, end):
+    """One ETAS generation: the direct aftershocks of the parent events that fall before end"""
+    expected = model.productivity * 10 ** (model.alpha * (parents['magnitude'] - model.min_magnitude))
+    counts = rng.poisson(expected)
+    total = int(counts.sum())
+    parent_index = np.repeat(np.arange(len(counts)), counts)
+
+    # Ruptures grow with magnitude, and so does the area their aftershocks cover
+    spread_km = 10 ** (0.5 * parents['magnitude'][parent_index] - 1.8) + 2
+    latitude, longitude = offset_positions(rng, parents['latitude'][parent_index],
+                                           parents['longitude'][parent_index], spread_km)
+    children = {
+        'origin_time': parents['origin_time'][parent_index] + omori_delays(rng, total, model),
+        'latitude': latitude,
+        'longitude': longitude,
+        'depth': np.maximum(1, parents['depth'][parent_index] + rng.normal(0, 5, total)),
+        'magnitude': gutenberg_richter(rng, total, model),
+        'zone': parents['zone'][parent_index],
+        'parent': first_index + parent_index
+    }
+    keep = children['origin_time'] < end
+    return {name: values[keep] for name, values in children.items()}
+
+
+def generate_catalog(days=30.0, seed=0, model=None, start=None, mainshocks=()):
+    """
+    Generate a catalog as a dict of columns sorted by origin time (magnitudes unrounded)
+    mainshocks: (magnitude, latitude, longitude[, day offset]) events to add, with their aftershock sequences
+    """
+    model = model or ETASModel()
+    if model.branching_ratio() >= 1:
+        raise ValueError(f"Unstable ETAS parameters: branching ratio {model.branching_ratio():.2f} >= 1")
+    rng = np.random.default_rng(seed)
+    start = 1735660800.0 if start is None else start  # 2025-01-01 00:00 Philippine time
+    end = start + days * SECONDS_PER_DAY
+
+    generation = background_events(rng, model, start, days)
+    if mainshocks:
+        generation = concatenate([generation, mainshock_events(mainshocks, start)])
+
+    batches = [generation]
+    emitted = len(generation['magnitude'])
+    for _ in range(model.max_generations):
+        generation = aftershocks(rng, generation, emitted - len(generation['magnitude']), model, end)
+        if not len(generation['magnitude']):
+            break
+        batches.append(generation)
+        emitted += len(generation['magnitude'])
+
+    catalog = concatenate(batches)
+    order = np.argsort(catalog['origin_time'], kind='stable')
+    # Parent indexes refer to generation order; remap them to the sorted order
+    position = np.empty_like(order)
+    position[order] = np.arange(len(order))
+    catalog = {name: values[order] for name, values in catalog.items()}
+    has_parent = catalog['parent'] >= 0
+    catalog['parent'][has_parent] = position[catalog['parent'][has_parent]]
+    return catalog
+
+
+def location_strings(catalog):
+    """PHIVOLCS-style relative locations, e.g. '012 km N 45° E of Hinatuan (Surigao Del Sur)'"""
+    towns = np.array([(z[1], z[2]) for z in SOURCE_ZONES])[catalog['zone']]
+    names = [z[6] for z in SOURCE_ZONES]
+    north = (catalog['latitude'] - towns[:, 0]) * KM_PER_DEGREE
+    east = (catalog['longitude'] - towns[:, 1]) * KM_PER_DEGREE * np.cos(np.radians(catalog['latitude']))
+    distance = np.rint(np.hypot(north, east)).astype(int)
+    angle = np.rint(np.degrees(np.arctan2(np.abs(east), np.abs(north)))).astype(int)
+    ns = np.where(north >= 0, 'N', 'S')
+    ew = np.where(east >= 0, 'E', 'W')
+    return [
+        f"{d:03d} km {a} {b}° {c} of {names[z]}"
+        for d, a, b, c, z in zip(distance.tolist(), ns.tolist(), angle.tolist(), ew.tolist(), catalog['zone'].tolist())
+    ]
+
+
+def to_earthquakes(catalog, newest_first=True):
+    """Convert columns to mock_data.json-format dicts (newest first, like the PHIVOLCS page)"""
+    local = (catalog['origin_time'] + PHILIPPINE_OFFSET_SECONDS).astype('datetime64[s]')
+    stamps = np.datetime_as_string(local, unit='s')
+    latitudes = np.char.mod('%.2f', catalog['latitude'])
+    longitudes = np.char.mod('%.2f', catalog['longitude'])
+    depths = np.char.mod('%03d kilometers', np.rint(catalog['depth']).astype(int))
+    magnitudes = np.char.mod('%.1f', catalog['magnitude'])
+    locations = location_strings(catalog)
+
+    earthquakes = [
+        {'date': stamp[:10], 'time': stamp[11:], 'latitude': lat, 'longitude': lon,
+         'depth': depth, 'magnitude': magnitude, 'location': location}
+        for stamp, lat, lon, depth, magnitude, location in zip(
+            stamps.tolist(), latitudes.tolist(), longitudes.tolist(), depths.tolist(),
+            magnitudes.tolist(), locations)
+    ]
+    if newest_first:
+        earthquakes.reverse()
+    return earthquakes
+
+
+def write_mock_json(catalog, path):
+    """Write a mock_data.json-format file"""
+    with open(path, 'w') as f:
+        json.dump({'earthquakes': to_earthquakes(catalog)}, f)
+
+
+def write_npz(catalog, path):
+    """Write the columns as a compressed numpy archive"""
+    np.savez_compressed(path, **catalog)
+
+
+def load_npz(path):
+    """Read columns written by write_npz"""
+    with np.load(path) as data:
+        return {name: data[name] for name in COLUMNS}
+
+
+def write_html_pages(catalog, directory, page_size=500):
+    """Write PHIVOLCS-shaped pages of page_size events, newest first, for phivolcs_standin.py --page"""
+    os.makedirs(directory, exist_ok=True)
+    earthquakes = to_earthquakes(catalog)
+    paths = []
+    for number, first in enumerate(range(0, len(earthquakes), page_size), 1):
+        path = os.path.join(directory, f"page_{number:05d}.html")
+        with open(path, 'wb') as f:
+            f.write(render_phivolcs_page(earthquakes[first:first + page_size]))
+        paths.append(path)
+    return paths
+
+
+def standin_script(catalog, poll_seconds=60.0, initial_events=20):
+    """
+    Split the catalog into phivolcs_standin.py script steps, one per poll
+    The first initial_events make up the starting page (returned separately); each step publishes
+    the events whose origin time falls in its poll window
+    """
+    earthquakes = to_earthquakes(catalog, newest_first=False)
+    times = catalog['origin_time']
+    initial = earthquakes[:initial_events]
+    if len(times) <= initial_events:
+        return initial[::-1], []
+
+    window = np.floor((times[initial_events:] - times[initial_events]) / poll_seconds).astype(int)
+    steps = [{} for _ in range(int(window[-1]) + 2)]
+    for offset, step_index in enumerate(window.tolist(), initial_events):
+        steps[step_index + 1].setdefault('events', []).insert(0, earthquakes[offset])
+    return initial[::-1], steps
+
+
+def parse_mainshock(text):
+    """Parse MAG:LAT:LON[:DAY]"""
+    return tuple(float(value) for value in text.split(':'))
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Generate synthetic Philippine earthquake catalogs")
+    parser.add_argument('--days', type=float, default=30.0, help="Length of the catalog")
+    parser.add_argument('--rate', type=float, default=60.0, help="Background events per day")
+    parser.add_argument('--b-value', type=float, default=1.0, help="Gutenberg-Richter b-value")
+    parser.add_argument('--min-magnitude', type=float, default=1.5)
+    parser.add_argument('--productivity', type=float, default=0.06, help="ETAS K")
+    parser.add_argument('--mainshock', action='append', type=parse_mainshock, default=[],
+                        help="Add a mainshock as MAG:LAT:LON[:DAY] (repeatable)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=['mock', 'npz', 'html', 'script'], default='mock')
+    parser.add_argument('--page-size', type=int, default=500, help="Events per HTML page")
+    parser.add_argument('--poll-seconds', type=float, default=60.0, help="Poll window of each script step")
+    parser.add_argument('--output', required=True, help="Output file (or directory for --format html)")
+    args = parser.parse_args()
+
+    model = ETASModel(background_per_day=args.rate, b_value=args.b_value, min_magnitude=args.min_magnitude,
+                      productivity=args.productivity)
+    catalog = generate_catalog(args.days, args.seed, model, mainshocks=args.mainshock)
+    aftershock_count = int((catalog['parent'] >= 0).sum())
+    print(f"{len(catalog['magnitude'])} events ({aftershock_count} aftershocks) over {args.days:g} days, "
+          f"largest M{catalog['magnitude'].max():.1f}")
+
+    if args.format == 'mock':
+        write_mock_json(catalog, args.output)
+    elif args.format == 'npz':
+        write_npz(catalog, args.output)
+    elif args.format == 'html':
+        print(f"{len(write_html_pages(catalog, args.output, args.page_size))} pages")
+    else:
+        initial, steps = standin_script(catalog, args.poll_seconds)
+        base, _ = os.path.splitext(args.output)
+        with open(base + '_initial.json', 'w') as f:
+            json.dump({'earthquakes': initial}, f)
+        with open(args.output, 'w') as f:
+            json.dump(steps, f)
+        print(f"Serve with: python phivolcs_standin.py --mock {base}_initial.json --script {args.output}")
+    print(f"Written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
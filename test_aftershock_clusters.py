@@ -0,0 +1,174 @@
+"""
+Tests for aftershock sequence clustering
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from aftershock_clusters import SequenceClusterer, describe_sequence, rupture_length_km
+from main import EarthquakeMonitor
+from phivolcs_scraper import PHILIPPINE_TIME
+from phivolcs_standin import make_earthquake
+from scrape_diff import ScrapeDelta
+
+HOUR = 3600.0
+KM = 1 / 111.2  # degrees of latitude
+
+
+def test_dbscan_rules():
+    clusterer = SequenceClusterer(link_km=20, window_hours=48, min_events=3)
+    first = clusterer.add('a', 0, 10.0, 125.0, 3.0)
+    second = clusterer.add('b', HOUR, 10.0 + 5 * KM, 125.0, 3.2)
+    # Two events are not dense enough to link
+    assert first is not second and len(clusterer) == 2
+    # A third makes a core event and the three become one sequence
+    third = clusterer.add('c', 2 * HOUR, 10.0 + 10 * KM, 125.0, 4.1)
+    assert clusterer.sequence_of('a') is clusterer.sequence_of('b') is third
+    assert third.count == 3 and third.mainshock.key == 'c' and len(clusterer) == 1
+    # Too far in space, or too late in time, starts a new sequence
+    assert clusterer.add('far', 3 * HOUR, 10.0 + 60 * KM, 125.0, 3.0) is not third
+    assert clusterer.add('late', 60 * HOUR, 10.0, 125.0, 3.0) is not third
+    assert len(clusterer) == 3
+
+
+def test_border_events_join_when_a_neighbour_becomes_core():
+    clusterer = SequenceClusterer(link_km=10, min_events=3)
+    # a and c are 16 km apart and each 8 km from b; b becomes core when c arrives
+    clusterer.add('a', 0, 10.0, 125.0, 3.0)
+    clusterer.add('b', HOUR, 10.0 + 8 * KM, 125.0, 3.0)
+    clusterer.add('c', 2 * HOUR, 10.0 + 16 * KM, 125.0, 3.0)
+    assert clusterer.sequence_of('a') is clusterer.sequence_of('c')
+    assert clusterer.sequence_of('a').count == 3
+
+
+def test_mainshock_reaches_its_rupture_length():
+    assert rupture_length_km(7.0) == pytest.approx(49, abs=1)
+    clusterer = SequenceClusterer(link_km=20, min_events=3)
+    mainshock = clusterer.add('main', 0, 10.0, 125.0, 7.0)
+    aftershock = clusterer.add('after', HOUR, 10.0 + 40 * KM, 125.0, 3.0)
+    assert aftershock is mainshock and mainshock.count == 2
+    small = SequenceClusterer(link_km=20, min_events=3)
+    small.add('main', 0, 10.0, 125.0, 4.0)
+    assert small.add('after', HOUR, 10.0 + 40 * KM, 125.0, 3.0).count == 1
+
+
+def test_sequence_summary_and_omori_decay():
+    rng = np.random.default_rng(5)
+    clusterer = SequenceClusterer(link_km=20, min_events=3)
+    clusterer.add('main', 0, 9.8, 126.2, 6.2, "020 km N 45° E of Hinatuan (Surigao Del Sur)")
+    # N(t) = k log(1 + t/c): an Omori rate k / (t + c), i.e. p = 1, over about 30 hours
+    times = 0.01 * HOUR * (np.exp(np.arange(1, 400) / 50) - 1)
+    for i, t in enumerate(times):
+        clusterer.add(f"a{i}", t, 9.8 + rng.normal(0, 0.05), 126.2 + rng.normal(0, 0.05), 2.5 + (i % 20) / 10)
+    sequence = clusterer.sequence_of('a398')
+    assert sequence.count == 400 and len(clusterer) == 1
+    assert (sequence.min_magnitude, sequence.max_magnitude) == (2.5, 6.2)
+    assert sequence.mainshock.key == 'main' and sequence.start == 0
+    assert sum(sequence.bins) == 400
+    assert sequence.omori_p() == pytest.approx(1.0, abs=0.15)
+    assert "400 earthquakes, largest M6.2 (020 km N 45° E of Hinatuan (Surigao Del Sur))" in describe_sequence(sequence)
+
+
+def test_merging_sequences_keeps_totals():
+    clusterer = SequenceClusterer(link_km=10, min_events=2)
+    clusterer.add('west', 5 * HOUR, 10.0, 125.0, 3.0)
+    clusterer.add('west2', 6 * HOUR, 10.0, 125.0 - 5 * KM, 3.5)
+    clusterer.add('east', 0, 10.0, 125.0 + 30 * KM, 4.5)
+    clusterer.add('east2', HOUR, 10.0, 125.0 + 35 * KM, 3.1)
+    assert len(clusterer) == 2
+    # A chain of events between them links both
+    for step in (1, 2, 3):
+        clusterer.add(f"bridge{step}", 7 * HOUR, 10.0, 125.0 + 9 * step * KM, 3.0)
+    merged = clusterer.sequence_of('west')
+    assert merged is clusterer.sequence_of('east2') and len(clusterer) == 1
+    assert merged.count == 7 and merged.start == 0 and merged.last == 7 * HOUR
+    assert merged.mainshock.key == 'east' and sum(merged.bins) == 7
+
+
+def test_long_sequence_cost_stays_bounded():
+    rng = np.random.default_rng(2)
+    clusterer = SequenceClusterer(link_km=20, window_hours=48, min_events=3)
+    n = 6000
+    lats, lons = 9.8 + rng.normal(0, 0.05, n), 126.2 + rng.normal(0, 0.05, n)
+
+    def add(indices):
+        started = time.perf_counter()
+        for i in indices:
+            clusterer.add(i, i * 60.0, lats[i], lons[i], 3.0)
+        return time.perf_counter() - started
+
+    first = add(range(1000))
+    add(range(1000, n - 1000))
+    last = add(range(n - 1000, n))
+    assert last < first * 3 + 0.05
+    assert clusterer.sequence_of(n - 1).count == n
+    # Only the window's events are remembered
+    clusterer.expire()
+    assert len(clusterer.events) <= 48 * 60 + 1
+
+
+def test_expiry_and_revisions():
+    clusterer = SequenceClusterer(window_hours=24, min_events=2)
+    clusterer.add('a', 0, 10.0, 125.0, 3.0)
+    sequence = clusterer.add('b', HOUR, 10.0, 125.0, 3.5)
+    revised = make_earthquake(10.0, 125.0, 5.0, "revised")
+    assert clusterer.revise('b', 'b2', revised) is sequence
+    assert sequence.mainshock.key == 'b2' and sequence.max_magnitude == 5.0
+    assert clusterer.sequence_of('b') is None
+
+    clusterer.add('c', 30 * HOUR, 12.0, 122.0, 3.0)
+    clusterer.expire()
+    assert clusterer.sequence_of('a') is None and len(clusterer) == 1
+
+
+def test_update_orders_a_newest_first_scrape():
+    now = datetime(2024, 5, 1, 12, 0, tzinfo=PHILIPPINE_TIME)
+    rows = [make_earthquake(9.8, 126.2, 3.0 + i / 10, f"row {i}", origin=now - timedelta(minutes=10 * i))
+            for i in range(5)]
+    clusterer = SequenceClusterer(min_events=3)
+    grown = clusterer.update(ScrapeDelta(rows, [], []), lambda eq: eq['location'])
+    assert len({id(s) for s in grown.values()}) == 1
+    sequence = grown["row 0"]
+    assert sequence.count == 5 and sequence.mainshock.key == "row 4" and sequence.reported
+    assert clusterer.update(ScrapeDelta([{'date': '', 'time': ''}], [], []), lambda eq: 'x') == {}
+
+
+def create_monitor(tmp_path, **config):
+    monitor = EarthquakeMonitor(config=dict({
+        'latitude': 9.8, 'longitude': 126.0, 'radius_km': 100, 'min_magnitude': 3.0,
+        'check_interval_seconds': 60, 'alert_latency_file': None,
+        'catalog_cache_file': str(tmp_path / 'catalog_cache.json')
+    }, **config))
+    monitor.seen_earthquakes = set()
+    monitor.alerts = []
+    monitor.save_seen_earthquakes = lambda: None
+    monitor.show_notification = lambda eq, distance: monitor.alerts.append(eq['location'])
+    return monitor
+
+
+def swarm():
+    now = datetime.now(PHILIPPINE_TIME)
+    magnitudes = [5.6, 3.4, 4.0, 3.1, 5.9, 3.3]
+    return [make_earthquake(9.8 + i / 100, 126.2, magnitude, f"swarm {i}", origin=now - timedelta(minutes=60 - i))
+            for i, magnitude in enumerate(magnitudes)]
+
+
+def test_monitor_groups_alerts_per_sequence(tmp_path):
+    monitor = create_monitor(tmp_path, group_sequence_alerts=True)
+    rows = swarm()
+    monitor.process_earthquakes({'earthquakes': rows[:3]})
+    monitor.process_earthquakes({'earthquakes': rows})
+    # The first, then only the ones bigger than anything notified before
+    assert monitor.alerts == ["swarm 0", "swarm 4"]
+    sequence = monitor.sequences.sequence_of(monitor.create_earthquake_id(rows[5]))
+    assert sequence.count == 6 and sequence.notified_magnitude == 5.9
+
+
+def test_monitor_alerts_every_event_by_default(tmp_path):
+    monitor = create_monitor(tmp_path)
+    monitor.process_earthquakes({'earthquakes': swarm()})
+    assert len(monitor.alerts) == 6
+    assert len(monitor.sequences.active()) == 1
@@ -0,0 +1,39 @@
+"""
+Tests for end-to-end alert latency tracking
+"""
+
+from alert_latency import AlertLatencyTracker
+
+EARTHQUAKE = {'date': "2025-10-28", 'time': "14:30:45", 'magnitude': "4.5"}
+
+
+def test_record_splits_the_delay(tmp_path):
+    tracker = AlertLatencyTracker(str(tmp_path / 'latency.jsonl'), slo_seconds=900)
+    # Polls at 1000s and 1060s after origin; delivered 2s after the second poll
+    entry = tracker.record(EARTHQUAKE, origin_time=0, previous_poll_at=1000, first_seen_at=1060, delivered_at=1062)
+
+    assert entry['total_seconds'] == 1062
+    assert entry['upstream_delay_seconds'] == 1030
+    assert entry['detection_delay_seconds'] == 30
+    assert entry['delivery_delay_seconds'] == 2
+    assert tracker.summary()['slo_breached']
+
+
+def test_history_survives_restart_and_is_windowed(tmp_path):
+    latency_file = str(tmp_path / 'latency.jsonl')
+    tracker = AlertLatencyTracker(latency_file, slo_seconds=900, window=3)
+    for total in [100, 200, 300, 400]:
+        tracker.record(EARTHQUAKE, 0, total - 60, total - 1, total)
+
+    reloaded = AlertLatencyTracker(latency_file, slo_seconds=900, window=3)
+    summary = reloaded.summary()
+    assert summary['alerts'] == 3
+    assert summary['total_seconds']['max'] == 400
+    assert summary['total_seconds']['p50'] == 300
+    assert not summary['slo_breached']
+
+
+def test_unparseable_origin_is_skipped(tmp_path):
+    tracker = AlertLatencyTracker(str(tmp_path / 'latency.jsonl'))
+    assert tracker.record(EARTHQUAKE, None, None, 10, 12) is None
+    assert tracker.summary()['alerts'] == 0
@@ -0,0 +1,125 @@
+"""
+Tests for the alert rule language
+"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from alert_rules import EventBatch, RuleSet, RuleSyntaxError, compile_rule
+from bench_scraper import generate_earthquakes
+from geofence import GeofenceIndex, load_zones
+from main import EarthquakeMonitor
+from phivolcs_scraper import PHILIPPINE_TIME
+from phivolcs_standin import make_earthquake
+
+MANILA = (14.5995, 120.9842)
+
+with open('mock_data.json', 'r') as f:
+    MOCK_EARTHQUAKES = json.load(f)['earthquakes']
+
+
+def at(hour, minute=0):
+    return datetime(2024, 1, 15, hour, minute, tzinfo=PHILIPPINE_TIME)
+
+
+def evaluate(rule, earthquakes=MOCK_EARTHQUAKES, geofence=None):
+    return list(compile_rule(rule).predicate(EventBatch(earthquakes, *MANILA, geofence)))
+
+
+@pytest.mark.parametrize('rule, expected', [
+    ("magnitude >= 4.5", [True, False, True, False, True]),
+    ("magnitude >= 3 and distance <= 100", [True, True, False, False, False]),
+    ("depth < 10 or magnitude > 6", [False, False, False, True, True]),
+    ("not (magnitude < 5)", [False, False, True, False, True]),
+    ("magnitude between 3 and 5", [True, True, False, False, False]),
+    ('region in ["Batangas", "Metro Manila"]', [True, True, False, True, False]),
+    ("region in ['zambales'] and depth == 75", [False, False, True, False, False]),
+])
+def test_rules_over_mock_catalog(rule, expected):
+    assert evaluate(rule) == expected
+
+
+def test_hour_ranges_wrap_past_midnight():
+    earthquakes = [make_earthquake(14.6, 121.0, 3.0, "x", origin=at(hour)) for hour in (21, 22, 0, 6, 7)]
+    assert evaluate("hour between 22 and 6", earthquakes) == [False, True, True, True, False]
+    assert evaluate("hour between 6 and 21", earthquakes) == [True, False, False, True, True]
+
+
+def test_rate_over_window():
+    # Five events ten minutes apart near Manila, one far away in the middle of them
+    earthquakes = [make_earthquake(14.6, 121.0, 2.5, f"near {i}", origin=at(3, 10 * i)) for i in range(5)]
+    earthquakes.append(make_earthquake(9.0, 126.0, 2.5, "far", origin=at(3, 25)))
+    assert evaluate("rate(30) >= 4", earthquakes) == [False, False, False, True, True, True]
+    # Within 50 km of Manila the far event doesn't count, so no half hour holds four
+    assert evaluate("rate(30, 50) >= 4", earthquakes) == [False] * 6
+    assert evaluate("rate(60, 50) >= 5", earthquakes) == [False, False, False, False, True, False]
+
+
+def test_region_includes_geofence_zones():
+    geofence = GeofenceIndex(load_zones('geofences.example.geojson'))
+    earthquakes = [make_earthquake(14.60, 121.08, 3.0, "010 km E of Quezon City"),
+                   make_earthquake(16.00, 119.40, 3.0, "060 km W of Alaminos (Pangasinan)")]
+    assert evaluate('region in ["West Valley Fault corridor"]', earthquakes, geofence) == [True, False]
+    assert evaluate('region in ["Manila Trench offshore zone"]', earthquakes, geofence) == [False, True]
+
+
+def test_missing_values_never_match():
+    broken = [{'date': '', 'time': '', 'latitude': 'n/a', 'longitude': '', 'magnitude': '', 'depth': '',
+               'location': ''}]
+    for rule in ("magnitude != 3", "distance < 1000", "hour between 0 and 23", "rate(60) >= 0", "depth >= 0"):
+        assert evaluate(rule, broken) == [False], rule
+
+
+@pytest.mark.parametrize('rule', ["magnitude >", "size > 1", "region in []", "magnitude >= 3 and",
+                                  "(magnitude > 3", "rate 60 > 1", "magnitude > 3 extra"])
+def test_syntax_errors(rule):
+    with pytest.raises(RuleSyntaxError):
+        compile_rule(rule)
+
+
+def test_ruleset_matches_many_rules_in_one_pass():
+    rules = RuleSet.from_config({'alert_rules': [
+        {'name': "strong", 'when': "magnitude >= 5"},
+        "magnitude >= 4 and distance <= 200",
+    ] + [f"magnitude >= {m / 10} and depth < {d}" for m in range(30, 60, 2) for d in (10, 30, 70)]})
+    assert len(rules) == 47
+
+    matches = rules.matches(EventBatch(MOCK_EARTHQUAKES, *MANILA))
+    assert "strong" in matches[2] and "magnitude >= 4 and distance <= 200" in matches[0]
+    assert matches[3] == ()
+    assert RuleSet.from_config({}) is None
+
+    batch = EventBatch(generate_earthquakes(20000), *MANILA)
+    matrix = rules.evaluate(batch)
+    assert matrix.shape == (47, 20000)
+    assert np.array_equal(matrix[0], batch.column(('magnitude',)) >= 5)
+
+
+def create_monitor(tmp_path, **config):
+    monitor = EarthquakeMonitor(config=dict({
+        'latitude': MANILA[0], 'longitude': MANILA[1], 'radius_km': 50, 'min_magnitude': 3.0,
+        'check_interval_seconds': 60, 'alert_latency_file': None,
+        'catalog_cache_file': str(tmp_path / 'catalog_cache.json')
+    }, **config))
+    monitor.seen_earthquakes = set()
+    monitor.alerts = []
+    monitor.save_seen_earthquakes = lambda: None
+    monitor.show_notification = lambda eq, distance: monitor.alerts.append(eq['location'])
+    return monitor
+
+
+def test_monitor_uses_rules_instead_of_radius(tmp_path):
+    monitor = create_monitor(tmp_path, alert_rules=[{'name': "big", 'when': "magnitude >= 5.5"}])
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES})
+    assert monitor.alerts == ["012 km W of Iba (Zambales)", "050 km E of Legaspi (Albay)"]
+    assert list(monitor.rule_matches.values()) == [("big",), ("big",)]
+
+
+def test_invalid_rules_fall_back_to_radius(tmp_path):
+    monitor = create_monitor(tmp_path, alert_rules=["magnitude >>= 3"])
+    assert monitor.rules is None
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES})
+    assert "005 km S 52° W of Nasugbu (Batangas)" in monitor.alerts
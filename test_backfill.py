@@ -0,0 +1,87 @@
+"""
+Tests for the historical backfill crawler
+Runs against a local fixture server instead of the PHIVOLCS archive
+"""
+
+from datetime import datetime
+
+from backfill import Backfill, PoliteFetcher, month_end, month_range
+from event_store import EventStore
+from phivolcs_fixtures import FixtureServer, render_phivolcs_page
+from phivolcs_scraper import PHILIPPINE_TIME, parse_origin_time
+
+URL_TEMPLATE = "{base}/EQLatest-Monthly/{{year}}/{{year}}_{{month_name}}.html"
+
+
+def make_month(year, month, count=12):
+    """Create a month of fake earthquakes in mock_data.json format"""
+    return [
+        {
+            'date': f"{year}-{month:02d}-{day + 1:02d}",
+            'time': f"{day % 24:02d}:15:00",
+            'latitude': f"{13 + day * 0.05:.2f}",
+            'longitude': f"{121 + day * 0.05:.2f}",
+            'depth': "010 kilometers",
+            'magnitude': f"{2.0 + day * 0.1:.1f}",
+            'location': f"{day + 1:03d} km N 10° E of Calatagan (Batangas)"
+        }
+        for day in range(count)
+    ]
+
+
+def make_backfill(tmp_path, server, store):
+    return Backfill(
+        store,
+        checkpoint_file=str(tmp_path / 'checkpoint.json'),
+        url_template=URL_TEMPLATE.format(base=server.url),
+        fetcher=PoliteFetcher(concurrency=2, delay_seconds=0.0, retries=1, timeout=5),
+        parse_workers=2
+    )
+
+
+def test_month_range_crosses_year():
+    assert month_range('2024-11', '2025-02') == [(2024, 11), (2024, 12), (2025, 1), (2025, 2)]
+
+
+def test_backfill_stores_and_resumes(tmp_path):
+    pages = {
+        '/EQLatest-Monthly/2024/2024_January.html': render_phivolcs_page(make_month(2024, 1)),
+        '/EQLatest-Monthly/2024/2024_February.html': render_phivolcs_page(make_month(2024, 2, count=20)),
+        # March has no archive page (404)
+    }
+
+    store = EventStore(str(tmp_path / 'events.db'))
+    with FixtureServer(pages) as server:
+        inserted = make_backfill(tmp_path, server, store).run('2024-01', '2024-03')
+        assert inserted == 32
+        assert store.count() == 32
+        first_run_requests = len(server.requests)
+
+        # A second run skips the checkpointed months and only looks for March again
+        assert make_backfill(tmp_path, server, store).run('2024-01', '2024-03') == 0
+        assert server.requests[first_run_requests:] == ['/EQLatest-Monthly/2024/2024_March.html']
+
+    events = list(store.iter_events())
+    assert len(events) == 32
+    times = [parse_origin_time(eq) for eq in events]
+    assert times == sorted(times)
+    store.close()
+
+
+def test_open_month_is_fetched_again(tmp_path):
+    path = '/EQLatest-Monthly/2024/2024_February.html'
+    february = make_month(2024, 2, count=20)
+    pages = {path: render_phivolcs_page(february[:10])}
+    mid_february = datetime(2024, 2, 15, tzinfo=PHILIPPINE_TIME).timestamp()
+    assert month_end(2024, 2) == datetime(2024, 3, 1, tzinfo=PHILIPPINE_TIME).timestamp()
+
+    store = EventStore(str(tmp_path / 'events.db'))
+    with FixtureServer(pages) as server:
+        assert make_backfill(tmp_path, server, store).run('2024-02', '2024-02', now=mid_february) == 10
+        # The month went on; the page grew and the next run picks up the rest
+        server.pages[path] = render_phivolcs_page(february)
+        assert make_backfill(tmp_path, server, store).run('2024-02', '2024-02', now=month_end(2024, 2)) == 10
+        assert make_backfill(tmp_path, server, store).run('2024-02', '2024-02', now=month_end(2024, 2)) == 0
+        assert server.requests.count(path) == 2
+    assert store.count() == 20
+    store.close()
@@ -0,0 +1,33 @@
+"""
+Tests for the monitor throughput benchmark
+"""
+
+import pytest
+
+from bench_monitor import compare, run_benchmark, scaling_exponent
+
+
+def test_scaling_exponent():
+    assert scaling_exponent([(10, 1.0), (100, 10.0), (1000, 100.0)]) == pytest.approx(1.0)
+    assert scaling_exponent([(10, 1.0), (100, 100.0)]) == pytest.approx(2.0)
+    assert scaling_exponent([(10, 1.0)]) is None
+
+
+def test_run_benchmark_covers_scenarios_and_skips_over_budget():
+    document = run_benchmark(sizes=[200, 2000], site_counts=[1, 3], max_work=5000)
+    cases = {(e['scenario'], e['events'], e['sites']): e for e in document['results']}
+
+    assert len(cases) == 9
+    assert document['skipped'] == [{'events': 2000, 'sites': 3}]
+    for (scenario, events, sites), entry in cases.items():
+        assert entry['events_per_second'] > 0
+        if scenario == 'warm':
+            # Every event was already seen, so nothing alerts
+            assert entry['alerts'] == 0
+        if scenario == 'steady':
+            assert entry['alerts'] <= 10 * sites
+    assert cases[('cold', 2000, 1)]['peak_memory_bytes'] > 0
+    assert {(c['scenario'], c['sites']) for c in document['curves']} >= {('cold', 1), ('warm', 3)}
+
+    report = compare(document, dict(document, label='before'))
+    assert "1.00x faster" in report
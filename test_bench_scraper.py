@@ -0,0 +1,47 @@
+"""
+Tests for the scraper benchmark harness
+"""
+
+from bench_scraper import compare_to_baseline, generate_page, run_benchmark, time_to_first_row
+from phivolcs_scraper import parse_earthquake_rows, parse_origin_time
+
+
+def test_generated_page_parses_past_decoy_tables():
+    earthquakes = parse_earthquake_rows(generate_page(25))
+    assert len(earthquakes) == 25
+    assert all(parse_origin_time(eq) is not None for eq in earthquakes)
+    assert earthquakes[0]['depth'].endswith(' kilometers')
+
+
+def test_run_benchmark_reports_each_backend_and_size():
+    document = run_benchmark(sizes=[10, 50], backends=['html.parser'], repeats=1)
+    entries = {(entry['backend'], entry['rows']): entry for entry in document['results']}
+    assert set(entries) == {('html.parser', 10), ('html.parser', 50)}
+    for entry in entries.values():
+        assert entry['rows_per_second'] > 0
+        assert entry['peak_memory_bytes'] > 0
+        assert entry['first_row_seconds'] > 0
+
+
+def test_first_row_is_timed_on_the_scrapers_own_parse():
+    content = generate_page(500)
+    seconds, row = time_to_first_row(content, 'html.parser', repeats=2)
+    # The decoy tables are passed over and the row is the one the full parse finds first
+    assert row == parse_earthquake_rows(content)[0]
+    assert seconds > 0
+
+
+def test_compare_to_baseline_flags_slowdowns_and_memory_growth():
+    baseline = {'results': [{'backend': 'html.parser', 'rows': 100, 'rows_per_second': 1000, 'first_row_seconds': 0.1,
+                             'peak_memory_bytes': 1000}]}
+    same = {'results': [{'backend': 'html.parser', 'rows': 100, 'rows_per_second': 900, 'first_row_seconds': 0.11,
+                         'peak_memory_bytes': 1100}]}
+    worse = {'results': [{'backend': 'html.parser', 'rows': 100, 'rows_per_second': 500, 'first_row_seconds': 0.2,
+                          'peak_memory_bytes': 2000}]}
+    other = {'results': [{'backend': 'lxml', 'rows': 100, 'rows_per_second': 1, 'first_row_seconds': 9,
+                          'peak_memory_bytes': 1}]}
+
+    assert compare_to_baseline(same, baseline, tolerance=0.2) == []
+    regressions = compare_to_baseline(worse, baseline, tolerance=0.2)
+    assert len(regressions) == 3 and any('first row' in regression for regression in regressions)
+    assert compare_to_baseline(other, baseline) == []
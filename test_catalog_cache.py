@@ -0,0 +1,47 @@
+"""
+Tests for the last-good catalog cache
+"""
+
+import json
+import os
+import time
+
+import phivolcs_scraper
+from catalog_cache import CatalogCache
+
+with open('mock_data.json', 'r') as f:
+    MOCK_DATA = json.load(f)
+
+
+def test_save_load_and_staleness(tmp_path):
+    cache = CatalogCache(str(tmp_path / 'cache.json'), stale_after_seconds=60)
+    assert cache.load() is None
+    assert cache.age_seconds() is None
+
+    cache.save(MOCK_DATA)
+    assert CatalogCache(cache.cache_file).load() == MOCK_DATA
+    assert cache.age_seconds() < 5
+    assert not cache.is_stale()
+
+    old = time.time() - 120
+    os.utime(cache.cache_file, (old, old))
+    assert cache.is_stale()
+
+    # Saving an unchanged catalog refreshes its age
+    cache.save(MOCK_DATA)
+    assert not cache.is_stale()
+
+
+def test_monitor_serves_cache_during_outage(tmp_path, monkeypatch):
+    from main import EarthquakeMonitor
+
+    monkeypatch.chdir(tmp_path)
+    monitor = EarthquakeMonitor('config.json')
+
+    monkeypatch.setattr(phivolcs_scraper, 'scrape_phivolcs_earthquakes', lambda **kwargs: MOCK_DATA)
+    assert monitor.fetch_earthquake_data() == MOCK_DATA
+    assert monitor.data_source == 'live'
+
+    monkeypatch.setattr(phivolcs_scraper, 'scrape_phivolcs_earthquakes', lambda **kwargs: None)
+    assert monitor.fetch_earthquake_data() == MOCK_DATA
+    assert monitor.data_source == 'cache'
@@ -0,0 +1,138 @@
+"""
+Tests for config validation and hot reload
+"""
+
+import json
+import logging
+import os
+
+import pytest
+
+from config_manager import ConfigError, ConfigManager, affected, changed_keys, validate
+from main import EarthquakeMonitor
+
+BASE = {
+    'latitude': 14.5995, 'longitude': 120.9842, 'radius_km': 100, 'min_magnitude': 3.0,
+    'check_interval_seconds': 60, 'address': "Manila, Philippines"
+}
+
+with open('mock_data.json', 'r') as f:
+    MOCK_EARTHQUAKES = json.load(f)['earthquakes']
+
+
+def write_config(path, config, bump=0):
+    path.write_text(json.dumps(config))
+    # Make sure the change is visible even on filesystems with coarse timestamps
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump * 1_000_000_000))
+
+
+def test_snapshot_is_typed_and_read_only():
+    snapshot = validate(dict(BASE, subscribed_provinces=["Batangas"], metrics_port=9100.0,
+                             subscriber_sites=[{'name': "Office", 'latitude': 10.3, 'longitude': 123.9}]))
+    assert snapshot['metrics_port'] == 9100 and isinstance(snapshot['metrics_port'], int)
+    assert snapshot['subscribed_provinces'] == ("Batangas",)
+    assert snapshot['address'] == "Manila, Philippines"
+    with pytest.raises(TypeError):
+        snapshot['radius_km'] = 5
+    with pytest.raises(TypeError):
+        snapshot['subscriber_sites'][0]['latitude'] = 0
+    with open('config.json') as f:
+        validate(json.load(f))
+
+
+@pytest.mark.parametrize('change, message', [
+    ({'latitude': None}, "latitude"),
+    ({'radius_km': "100"}, "radius_km must be a number"),
+    ({'min_magnitude': True}, "min_magnitude must be a number"),
+    ({'check_interval_seconds': 0}, "check_interval_seconds must be between"),
+    ({'metrics_port': 80.5}, "whole number"),
+    ({'log_json': "yes"}, "true or false"),
+    ({'subscribed_provinces': "Batangas"}, "must be a list"),
+    ({'subscriber_sites': [{'name': "x"}]}, "subscriber_sites entry 1 latitude"),
+    ({'alert_rules': [{'name': "x"}]}, "alert_rules entry 1"),
+])
+def test_invalid_settings(change, message):
+    with pytest.raises(ConfigError, match=message):
+        validate(dict(BASE, **change))
+    with pytest.raises(ConfigError, match="longitude is missing"):
+        validate({'latitude': 1, 'radius_km': 1, 'min_magnitude': 1, 'check_interval_seconds': 1})
+
+
+def test_changed_keys_and_affected_parts():
+    old = validate(BASE)
+    new = validate(dict(BASE, radius_km=50, subscribed_provinces=["Batangas"], address=None))
+    assert changed_keys(old, new) == {'radius_km', 'subscribed_provinces', 'address'}
+    assert affected({'radius_km'}) == {'stats'}
+    assert affected({'min_magnitude', 'check_interval_seconds'}) == set()
+    assert affected({'latitude'}) == {'locality_index', 'stats'}
+
+
+def test_manager_reloads_only_changes(tmp_path, caplog):
+    path = tmp_path / 'config.json'
+    write_config(path, BASE)
+    manager = ConfigManager(str(path))
+    first = manager.load()
+    assert manager.reload() is None
+
+    write_config(path, dict(BASE, radius_km=25), bump=1)
+    assert manager.reload() == {'radius_km'}
+    assert manager.snapshot['radius_km'] == 25 and first['radius_km'] == 100
+
+    # A bad edit is reported once and the settings stay as they were
+    with caplog.at_level(logging.ERROR):
+        path.write_text('{"latitude": ')
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2_000_000_000))
+        assert manager.reload() is None
+        assert manager.reload() is None
+    assert len([r for r in caplog.records if "keeping the current settings" in r.getMessage()]) == 1
+    assert manager.snapshot['radius_km'] == 25
+
+    # Rewriting the same settings is not a change
+    write_config(path, dict(BASE, radius_km=25), bump=3)
+    assert manager.reload() is None
+
+
+def create_monitor(tmp_path, **settings):
+    path = tmp_path / 'config.json'
+    write_config(path, dict(BASE, alert_latency_file=None, catalog_cache_file=str(tmp_path / 'cache.json'), **settings))
+    monitor = EarthquakeMonitor(str(path))
+    monitor.seen_earthquakes = set()
+    monitor.alerts = []
+    monitor.save_seen_earthquakes = lambda: None
+    monitor.show_notification = lambda eq, distance: monitor.alerts.append(eq['location'])
+    return monitor, path
+
+
+def test_monitor_hot_reload_rebuilds_only_affected_parts(tmp_path):
+    monitor, path = create_monitor(tmp_path, sequence_min_events=2)
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES})
+    stats, sequences, subscription = monitor.stats, monitor.sequences, monitor.subscription
+    seen = monitor.seen_earthquakes
+    assert not subscription
+
+    write_config(path, dict(json.loads(path.read_text()), min_magnitude=2.5), bump=1)
+    assert monitor.reload_config() == {'min_magnitude'}
+    assert monitor.config['min_magnitude'] == 2.5
+    assert monitor.stats is stats and monitor.sequences is sequences and monitor.seen_earthquakes is seen
+
+    write_config(path, dict(json.loads(path.read_text()), subscribed_provinces=["Albay"], radius_km=10), bump=2)
+    assert monitor.reload_config() == {'subscribed_provinces', 'radius_km'}
+    assert monitor.subscription.provinces and monitor.sequences is sequences
+    # Rebuilt statistics are refilled from the current catalog
+    assert monitor.stats is not stats
+    assert monitor.stats.summary('all')['events'] == len(MOCK_EARTHQUAKES)
+
+    # The new settings are used on the next check
+    legaspi = dict(MOCK_EARTHQUAKES[4], time="11:11:11")
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES + [legaspi]})
+    assert monitor.alerts[-1] == "050 km E of Legaspi (Albay)"
+
+
+def test_update_config_validates(tmp_path):
+    monitor, _ = create_monitor(tmp_path)
+    with pytest.raises(ConfigError):
+        monitor.update_config(radius_km="far")
+    assert monitor.config['radius_km'] == 100
+    assert monitor.update_config(sequence_link_km=5) == {'sequence_link_km'}
+    assert monitor.sequences.link_km == 5
@@ -0,0 +1,102 @@
+"""
+Tests for the offline gazetteer
+"""
+
+import json
+import time
+
+import pytest
+
+from gazetteer import (Gazetteer, Place, PrefixTrie, TOP_COMPLETIONS, get_gazetteer, load_places,
+                       normalize_name, place_to_result)
+
+
+@pytest.fixture(scope='module')
+def gazetteer():
+    return get_gazetteer()
+
+
+def test_normalize_name():
+    assert normalize_name("  Parañaque ") == "paranaque"
+    assert normalize_name("Lapu-Lapu") == "lapu lapu"
+    assert normalize_name("M'lang") == "mlang"
+    assert normalize_name("Biñan,   LAGUNA") == "binan laguna"
+
+
+def test_bundled_file_covers_every_province():
+    places = load_places()
+    provinces = {place.name for place in places if place.kind == 'province'}
+    assert len(provinces) >= 80
+    # Every town's province is itself in the file
+    assert {place.province for place in places} <= provinces
+    for place in places:
+        assert 4.5 <= place.latitude <= 21.5 and 116.0 <= place.longitude <= 127.0, place
+
+
+def test_complete_ranks_and_matches_later_words(gazetteer):
+    labels = [place.label for place in gazetteer.complete("na")]
+    assert "Nasugbu (Batangas)" in labels
+    assert len(labels) <= 8
+
+    # Cities come before municipalities with the same name
+    assert gazetteer.complete("san jose")[0].label == "San Jose (Nueva Ecija)"
+    assert "Quezon City (Metro Manila)" in [place.label for place in gazetteer.complete("city", limit=20)]
+    assert [place.name for place in gazetteer.complete("las pin")] == ["Las Piñas"]
+
+
+def test_complete_filters_by_province(gazetteer):
+    assert [place.label for place in gazetteer.complete("san jose, occ")] == ["San Jose (Occidental Mindoro)"]
+    assert [place.label for place in gazetteer.complete("San Jose (dinag")] == ["San Jose (Dinagat Islands)"]
+    assert gazetteer.complete("") == []
+    assert gazetteer.complete("zzz") == []
+
+
+def test_resolve_search_entries(gazetteer):
+    assert gazetteer.resolve("Nasugbu (Batangas)").name == "Nasugbu"
+    assert gazetteer.resolve("nasugbu, batangas").province == "Batangas"
+    assert gazetteer.resolve("Quezon City, Philippines").name == "Quezon City"
+    assert gazetteer.resolve("Batangas (province)").kind == 'province'
+    assert gazetteer.resolve("San Jose (Occidental Mindoro)").province == "Occidental Mindoro"
+    # Street addresses are left to the online geocoder
+    assert gazetteer.resolve("commonwealth, Quezon city") is None
+    assert gazetteer.resolve("12 Rizal Street") is None
+
+
+def test_resolve_phivolcs_location_strings(gazetteer):
+    assert gazetteer.resolve_location_string("005 km S 52° W of Nasugbu (Batangas)").name == "Nasugbu"
+    assert gazetteer.resolve_location_string("027 km N 80° E of City Of Mati (Davao Oriental)").name == "Mati"
+    assert gazetteer.resolve_location_string("014 km N 45° E of Hinatuan (Surigao Del Sur)").name == "Hinatuan"
+    # An unknown town falls back to its province
+    assert gazetteer.resolve_location_string("003 km N of Sitio Wala (Cebu)").kind == 'province'
+    assert gazetteer.resolve_location_string("") is None
+
+
+def test_mock_data_locations_resolve(gazetteer):
+    with open('mock_data.json', 'r') as f:
+        earthquakes = json.load(f)['earthquakes']
+    resolved = [gazetteer.resolve_location_string(eq['location']) for eq in earthquakes]
+    assert [place.name for place in resolved] == ["Nasugbu", "Quezon City", "Iba", "Manila", "Albay"]
+
+
+def test_trie_keeps_best_values_and_walks_subtrees():
+    trie = PrefixTrie()
+    for i in range(TOP_COMPLETIONS * 3):
+        trie.insert(f"town {i:03d}", i, rank=-i)
+    assert trie.complete("town", limit=3) == [47, 46, 45]
+    assert len(trie.values("town")) == TOP_COMPLETIONS * 3
+    assert sorted(trie.values("town 01")) == list(range(10, 20))
+
+
+def test_place_to_result():
+    place = Place("Baler", 'municipality', "Aurora", 15.7583, 121.5625)
+    assert place_to_result(place) == {'latitude': 15.7583, 'longitude': 121.5625,
+                                      'address': "Baler (Aurora), Philippines"}
+
+
+def test_completion_is_fast_with_many_places():
+    places = [Place(f"Barangay {i}", 'municipality', "Cebu", 10.0, 123.0) for i in range(40000)]
+    gazetteer = Gazetteer(places)
+    started = time.perf_counter()
+    for _ in range(1000):
+        gazetteer.complete("b")
+    assert (time.perf_counter() - started) / 1000 < 0.001
@@ -0,0 +1,113 @@
+"""
+Tests for the geocoding cache and worker
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from geocode_cache import GeocodeCache, GeocodeWorker, normalize_query
+
+Location = namedtuple('Location', 'latitude longitude address')
+QUEZON_CITY = Location(14.676, 121.0437, "Quezon City, Metro Manila, Philippines")
+
+
+class FakeGeocoder:
+    """Stands in for Nominatim, counting calls"""
+
+    def __init__(self, delay=0.0, location=QUEZON_CITY):
+        self.calls = []
+        self.delay = delay
+        self.location = location
+
+    def __call__(self, query):
+        self.calls.append(query)
+        time.sleep(self.delay)
+        return self.location
+
+
+def wait_for(results, count=1, timeout=2):
+    deadline = time.time() + timeout
+    while len(results) < count and time.time() < deadline:
+        time.sleep(0.01)
+    return results
+
+
+def test_normalize_query():
+    assert normalize_query("  Commonwealth ,Quezon  City. ") == "commonwealth, quezon city"
+    assert normalize_query("commonwealth, quezon city") == normalize_query("COMMONWEALTH,  Quezon City")
+
+
+def test_cache_is_lru_and_persistent(tmp_path):
+    cache_file = str(tmp_path / 'geocode_cache.json')
+    cache = GeocodeCache(cache_file, max_entries=2)
+    cache.put("a", {'latitude': 1, 'longitude': 1, 'address': "A"})
+    cache.put("b", {'latitude': 2, 'longitude': 2, 'address': "B"})
+    assert cache.get("A ")['address'] == "A"
+    cache.put("c", {'latitude': 3, 'longitude': 3, 'address': "C"})
+
+    reloaded = GeocodeCache(cache_file, max_entries=2)
+    assert reloaded.get("b") is None
+    assert reloaded.get("a")['address'] == "A"
+    assert reloaded.get("c")['address'] == "C"
+
+
+def test_worker_caches_results_for_instant_repeats(tmp_path):
+    geocode = FakeGeocoder()
+    worker = GeocodeWorker(geocode, GeocodeCache(str(tmp_path / 'cache.json')), debounce_seconds=0)
+    results = []
+
+    assert not worker.lookup("Quezon City", lambda result, error: results.append(result))
+    wait_for(results)
+    assert results[0]['latitude'] == QUEZON_CITY.latitude
+
+    # Served from the cache, synchronously and without a network call
+    assert worker.lookup("quezon city", lambda result, error: results.append(result))
+    assert len(results) == 2
+    assert geocode.calls == ["Quezon City"]
+    worker.stop()
+
+
+def test_typing_is_debounced_to_the_last_query():
+    geocode = FakeGeocoder()
+    worker = GeocodeWorker(geocode, debounce_seconds=0.2)
+    results = []
+    for prefix in ["Q", "Qu", "Quez", "Quezon"]:
+        worker.lookup(prefix, lambda result, error, prefix=prefix: results.append(prefix))
+    wait_for(results)
+    time.sleep(0.3)
+
+    assert geocode.calls == ["Quezon"]
+    assert results == ["Quezon"]
+    worker.stop()
+
+
+def test_superseded_and_cancelled_lookups_never_call_back():
+    geocode = FakeGeocoder(delay=0.2)
+    worker = GeocodeWorker(geocode, debounce_seconds=0)
+    results = []
+    done = threading.Event()
+
+    worker.lookup("first", lambda result, error: results.append("first"))
+    time.sleep(0.05)  # first is now in flight
+    worker.lookup("second", lambda result, error: (results.append("second"), done.set()))
+    assert done.wait(2)
+    assert results == ["second"]
+
+    worker.lookup("third", lambda result, error: results.append("third"))
+    worker.cancel()
+    time.sleep(0.4)
+    assert results == ["second"]
+    worker.stop()
+
+
+def test_errors_are_reported():
+    def failing(query):
+        raise TimeoutError("Nominatim timed out")
+
+    worker = GeocodeWorker(failing, debounce_seconds=0)
+    errors = []
+    worker.lookup("Manila", lambda result, error: errors.append(error))
+    wait_for(errors)
+    assert isinstance(errors[0], TimeoutError)
+    worker.stop()
@@ -0,0 +1,97 @@
+"""
+Tests for polygon geofences
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from geofence import GeofenceIndex, load_zones, ray_cast, ring_edges, zones_from_geojson
+from main import EarthquakeMonitor
+from phivolcs_standin import make_earthquake
+
+EXAMPLE_FILE = 'geofences.example.geojson'
+
+with open('mock_data.json', 'r') as f:
+    MOCK_EARTHQUAKES = json.load(f)['earthquakes']
+
+
+def square(name, x, y, size):
+    return {'type': 'Feature', 'properties': {'name': name}, 'geometry': {
+        'type': 'Polygon', 'coordinates': [[[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]]}}
+
+
+def test_ray_cast_with_hole():
+    outer = ring_edges([[0, 0], [4, 0], [4, 4], [0, 4]])
+    hole = ring_edges([[1, 1], [3, 1], [3, 3], [1, 3], [1, 1]])
+    edges = np.vstack((outer, hole))
+    assert list(ray_cast([0.5, 2.0, 3.5, 5.0], [0.5, 2.0, 3.5, 2.0], edges)) == [True, False, True, False]
+
+
+def test_geojson_shapes():
+    document = {'type': 'FeatureCollection', 'features': [
+        square("A", 0, 0, 1),
+        {'type': 'Feature', 'id': 'multi', 'properties': {}, 'geometry': {'type': 'MultiPolygon', 'coordinates': [
+            [[[2, 0], [3, 0], [3, 1], [2, 0]]], [[[5, 5], [6, 5], [6, 6], [5, 5]]]]}},
+        {'type': 'Feature', 'properties': {'name': "Line"}, 'geometry': {'type': 'LineString', 'coordinates': []}}
+    ]}
+    zones = zones_from_geojson(document)
+    assert [zone.name for zone in zones] == ["A", "multi"]
+    assert zones[1].bounds == (2.0, 0.0, 6.0, 6.0)
+    assert zones_from_geojson(square("B", 0, 0, 1)['geometry'])[0].name == "Zone 1"
+
+
+def test_example_zones():
+    index = GeofenceIndex(load_zones(EXAMPLE_FILE))
+    assert index.zones_at(14.5995, 120.9842) == ["Metro Manila"]
+    assert sorted(index.zones_at(14.60, 121.08)) == ["Metro Manila", "West Valley Fault corridor"]
+    assert index.zones_at(15.5, 119.5) == ["Manila Trench offshore zone"]
+    assert index.zones_at(10.3, 123.9) == []
+
+
+@pytest.mark.parametrize('cell_degrees', [0.05, 0.1, 0.5])
+def test_grid_matches_plain_ray_cast(cell_degrees):
+    zones = load_zones(EXAMPLE_FILE)
+    index = GeofenceIndex(zones, cell_degrees)
+    rng = np.random.default_rng(1)
+    lats, lons = rng.uniform(13, 18, 5000), rng.uniform(118.5, 121.5, 5000)
+    results = index.zones_at_batch(lats, lons)
+    for zone in zones:
+        expected = ray_cast(lons, lats, zone.edges)
+        assert list(expected) == [zone.name in names for names in results]
+
+
+def test_cost_per_point_does_not_grow_with_zone_count():
+    # 40 x 40 small zones tiled over the country: each cell still only refers to a zone or two
+    features = [square(f"Z{i}-{j}", 117 + i * 0.25, 5 + j * 0.35, 0.2) for i in range(40) for j in range(40)]
+    index = GeofenceIndex(zones_from_geojson({'type': 'FeatureCollection', 'features': features}), 0.1)
+    assert len(index) == 1600
+    assert max(len(entries) for entries in index.cells.values()) <= 4
+    assert index.zones_at(5.1, 117.1) == ["Z0-0"]
+    assert index.zones_at(5.1, 117.22) == []
+
+
+def test_empty_and_missing_config(tmp_path):
+    assert GeofenceIndex.from_config({}) is None
+    assert GeofenceIndex.from_config({'geofence_file': str(tmp_path / 'missing.geojson')}) is None
+    empty = GeofenceIndex([])
+    assert not empty and empty.zones_at(14.6, 121.0) == []
+
+
+def test_monitor_alerts_inside_zone_instead_of_radius(tmp_path):
+    monitor = EarthquakeMonitor(config={
+        'latitude': 14.5995, 'longitude': 120.9842, 'radius_km': None, 'min_magnitude': 3.0,
+        'check_interval_seconds': 60, 'alert_latency_file': None,
+        'catalog_cache_file': str(tmp_path / 'catalog_cache.json'),
+        'geofence_file': EXAMPLE_FILE, 'geofence_zones': ["Manila Trench offshore zone"]
+    })
+    monitor.seen_earthquakes = set()
+    monitor.alerts = []
+    monitor.save_seen_earthquakes = lambda: None
+    monitor.show_notification = lambda eq, distance: monitor.alerts.append(eq['location'])
+
+    offshore = make_earthquake(16.0, 119.4, 4.1, "060 km W of Alaminos (Pangasinan)")
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES + [offshore]})
+    assert [zone.name for zone in monitor.geofence.zones] == ["Manila Trench offshore zone"]
+    assert monitor.alerts == ["060 km W of Alaminos (Pangasinan)"]
@@ -0,0 +1,40 @@
+"""
+Tests for the pipeline instrumentation
+"""
+
+from instrumentation import Histogram, Instrumentation, NULL_TIMER
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = Histogram()
+    for value in [0.5, 3, 3, 40, 700]:
+        histogram.observe(value)
+
+    assert histogram.count == 5
+    assert histogram.max == 700
+    assert histogram.percentile(0.5) == 5
+    assert histogram.percentile(0.95) == 700
+    assert histogram.summary()['last'] == 700
+
+
+def test_stages_and_counters():
+    metrics = Instrumentation()
+    with metrics.stage('parse'):
+        pass
+    metrics.count('rows_parsed', 20)
+    metrics.count('rows_parsed', 5)
+
+    summary = metrics.summary()
+    assert summary['stages']['parse']['count'] == 1
+    assert summary['counters'] == {'rows_parsed': 25}
+    assert 'parse' in metrics.format_summary()
+
+
+def test_disabled_records_nothing():
+    metrics = Instrumentation(enabled=False)
+    assert metrics.stage('fetch') is NULL_TIMER
+    with metrics.stage('fetch'):
+        pass
+    metrics.count('polls')
+    metrics.observe('fetch_ttfb', 12.0)
+    assert metrics.summary() == {'stages': {}, 'counters': {}}
@@ -0,0 +1,99 @@
+"""
+Tests for nearest-locality enrichment
+"""
+
+import json
+import time
+
+import numpy as np
+import pytest
+
+from gazetteer import Place, load_places
+from locality_index import (KDTree, LocalityIndex, chord_to_km, compass_bearing, describe, to_unit_vectors)
+from main import EarthquakeMonitor
+
+with open('mock_data.json', 'r') as f:
+    MOCK_EARTHQUAKES = json.load(f)['earthquakes']
+
+
+@pytest.mark.parametrize('size, k', [(1, 1), (10, 3), (5000, 1), (5000, 5)])
+def test_kdtree_matches_brute_force(size, k):
+    rng = np.random.default_rng(size)
+    points = to_unit_vectors(rng.uniform(4, 21, size), rng.uniform(116, 127, size))
+    queries = to_unit_vectors(rng.uniform(4, 21, 200), rng.uniform(116, 127, 200))
+    distances, indices = KDTree(points, leaf_size=8).query_batch(queries, k)
+
+    brute = np.sqrt(((queries[:, None, :] - points[None, :, :]) ** 2).sum(axis=2))
+    assert np.allclose(distances, np.sort(brute, axis=1)[:, :k])
+    assert np.allclose(np.take_along_axis(brute, indices, axis=1), distances)
+
+
+def test_kdtree_edge_cases():
+    empty = KDTree(np.empty((0, 3)))
+    assert empty.query_batch(np.zeros((4, 3)), 3)[0].shape == (4, 0)
+    # k larger than the tree returns every point
+    distances, indices = KDTree(np.eye(3)).query(np.array([1.0, 0, 0]), k=10)
+    assert indices[0] == 0 and sorted(indices[1:]) == [1, 2]
+    assert distances[0] == 0.0
+
+
+def test_chord_and_bearing():
+    manila, nasugbu = (14.5995, 120.9842), (14.0667, 120.6333)
+    chord = np.linalg.norm(np.diff(to_unit_vectors(*zip(manila, nasugbu)), axis=0))
+    assert chord_to_km(chord) == pytest.approx(70.3, abs=1.0)
+    assert compass_bearing(*manila, *nasugbu) == 'SW'
+    assert compass_bearing(0, 120, 1, 120) == 'N'
+
+
+def test_enrich_names_nearest_towns_and_sites():
+    index = LocalityIndex(load_places(), sites=[("Home", 14.5995, 120.9842), ("Cebu office", 10.3157, 123.8854)])
+    # Just off the coast west of Nasugbu
+    enrichment, = index.enrich([14.07], [120.58])
+    assert enrichment.places[0].place.name == "Nasugbu"
+    assert enrichment.places[0].bearing == 'W'
+    assert all(a.distance_km <= b.distance_km for a, b in zip(enrichment.places, enrichment.places[1:]))
+    assert [site.name for site in enrichment.sites] == ["Home", "Cebu office"]
+    assert describe(enrichment).endswith("km W of Nasugbu (Batangas)")
+    # Provinces are not populated places of their own
+    assert all(nearby.place.kind != 'province' for nearby in enrichment.places)
+    assert index.enrich([], []) == []
+
+
+def test_batch_is_sub_millisecond_with_many_places():
+    rng = np.random.default_rng(7)
+    places = [Place(f"Place {i}", 'municipality', "Cebu", lat, lon)
+              for i, (lat, lon) in enumerate(zip(rng.uniform(5, 19, 30000), rng.uniform(117, 127, 30000)))]
+    index = LocalityIndex(places, sites=[("Home", 14.6, 121.0)])
+    latitudes, longitudes = rng.uniform(5, 19, 500), rng.uniform(117, 127, 500)
+    index.enrich(latitudes[:10], longitudes[:10])
+    started = time.perf_counter()
+    index.enrich(latitudes, longitudes)
+    assert (time.perf_counter() - started) / 500 < 0.001
+
+
+def test_monitor_enriches_and_caches_by_event_id(tmp_path):
+    monitor = EarthquakeMonitor(config={
+        'latitude': 14.5995, 'longitude': 120.9842, 'radius_km': 50, 'min_magnitude': 3.0,
+        'check_interval_seconds': 60, 'alert_latency_file': None,
+        'catalog_cache_file': str(tmp_path / 'catalog_cache.json'),
+        'subscriber_sites': [{'name': "Iba office", 'latitude': 15.33, 'longitude': 119.98}]
+    })
+    monitor.seen_earthquakes = set()
+    monitor.save_seen_earthquakes = lambda: None
+    monitor.show_notification = lambda eq, distance: None
+
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES})
+    strong = [eq for eq in MOCK_EARTHQUAKES if float(eq['magnitude']) >= 3.0]
+    assert set(monitor.enrichments) == {monitor.create_earthquake_id(eq) for eq in strong}
+
+    # The mock "012 km W of Iba" event sits off Masinloc, further up the Zambales coast
+    zambales = monitor.enrichments[monitor.create_earthquake_id(MOCK_EARTHQUAKES[2])]
+    assert zambales.places[0].place.name == "Masinloc"
+    assert zambales.sites[0].name == "Iba office"
+
+    # Unchanged rows keep their cached enrichment; rows that leave the catalog are dropped
+    cached = dict(monitor.enrichments)
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES[1:]})
+    assert monitor.create_earthquake_id(MOCK_EARTHQUAKES[0]) not in monitor.enrichments
+    assert monitor.enrichments[monitor.create_earthquake_id(MOCK_EARTHQUAKES[2])] is cached[
+        monitor.create_earthquake_id(MOCK_EARTHQUAKES[2])]
@@ -0,0 +1,124 @@
+"""
+Tests for PHIVOLCS location parsing, the province/town index and place subscriptions
+"""
+
+import json
+
+import pytest
+
+from location_parser import LocationIndex, LocationSubscription, parse_location, place_key
+from main import EarthquakeMonitor
+from phivolcs_standin import make_earthquake
+
+with open('mock_data.json', 'r') as f:
+    MOCK_EARTHQUAKES = json.load(f)['earthquakes']
+
+
+def test_parse_usual_shape():
+    parsed = parse_location("005 km S 52° W of Nasugbu (Batangas)")
+    assert parsed.distance_km == 5.0
+    assert parsed.bearing == "S 52° W"
+    assert parsed.azimuth == 232.0
+    assert parsed.town == "Nasugbu"
+    assert parsed.province == "Batangas"
+    assert (parsed.town_key, parsed.province_key) == ("nasugbu", "batangas")
+
+
+@pytest.mark.parametrize('location, bearing, azimuth', [
+    ("012 km W of Iba (Zambales)", "W", 270.0),
+    ("003 km N 45°W of Lian (Batangas)", "N 45° W", 315.0),
+    ("001 km S 10 E of Lian (Batangas)", "S 10° E", 170.0),
+    ("008 km N 20° E of Quezon City", "N 20° E", 20.0),
+])
+def test_parse_bearings(location, bearing, azimuth):
+    parsed = parse_location(location)
+    assert (parsed.bearing, parsed.azimuth) == (bearing, azimuth)
+
+
+def test_missing_province_comes_from_gazetteer():
+    assert parse_location("002 km S of Manila City").province == "Metro Manila"
+    assert parse_location("008 km N 20° E of Quezon City").province_key == "metro manila"
+    # City spellings share a key
+    assert parse_location("027 km N 80° E of City Of Mati (Davao Oriental)").town_key == place_key("Mati")
+
+
+def test_unusual_text_is_kept_whole():
+    parsed = parse_location("Offshore, location being verified")
+    assert parsed.town == "Offshore, location being verified"
+    assert parsed.distance_km is None and parsed.province is None
+    assert parse_location("") is None
+    assert parse_location(None) is None
+
+
+def test_parsed_strings_are_interned_and_cached():
+    a = parse_location("005 km S 52° W of Nasugbu (Batangas)")
+    b = parse_location("010 km N of Nasugbu (Batangas)")
+    assert a.province is b.province and a.town_key is b.town_key
+    assert parse_location("005 km S 52° W of Nasugbu (Batangas)") is a
+
+
+def test_index_add_move_remove():
+    index = LocationIndex()
+    index.add('a', "005 km S 52° W of Nasugbu (Batangas)")
+    index.add('b', "012 km W of Iba (Zambales)")
+    index.add('c', "020 km W of Calatagan (Batangas)")
+    assert index.in_province("BATANGAS") == {'a', 'c'}
+    assert index.in_town("nasugbu") == {'a'}
+
+    index.add('a', "012 km W of Iba (Zambales)")
+    assert index.in_province("Batangas") == {'c'}
+    assert index.in_town("Iba") == {'a', 'b'}
+
+    index.remove('c')
+    index.remove('missing')
+    assert index.in_province("Batangas") == set()
+    assert "batangas" not in index.by_province
+    assert len(index) == 2
+
+
+def test_subscription_matching():
+    subscription = LocationSubscription(provinces=["Batangas"], towns=["City of Mati"])
+    assert subscription.matches("005 km S 52° W of Nasugbu (Batangas)")
+    assert subscription.matches("027 km N 80° E of Mati City (Davao Oriental)")
+    assert not subscription.matches("012 km W of Iba (Zambales)")
+    assert not subscription.matches("")
+    assert not LocationSubscription()
+
+
+def create_monitor(tmp_path, **config):
+    monitor = EarthquakeMonitor(config=dict({
+        'latitude': 14.5995, 'longitude': 120.9842, 'radius_km': 50, 'min_magnitude': 3.0,
+        'check_interval_seconds': 60, 'alert_latency_file': None,
+        'catalog_cache_file': str(tmp_path / 'catalog_cache.json')
+    }, **config))
+    monitor.seen_earthquakes = set()
+    monitor.alerts = []
+    monitor.save_seen_earthquakes = lambda: None
+    monitor.show_notification = lambda eq, distance: monitor.alerts.append(eq['location'])
+    return monitor
+
+
+def test_province_subscription_alongside_radius(tmp_path):
+    monitor = create_monitor(tmp_path, subscribed_provinces=["Zambales"])
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES})
+    # Iba is ~190 km from Manila, outside the radius, but Zambales is subscribed
+    assert "012 km W of Iba (Zambales)" in monitor.alerts
+    assert "008 km N 20° E of Quezon City" in monitor.alerts
+    assert monitor.location_index.in_province("Zambales")
+
+
+def test_subscription_instead_of_radius(tmp_path):
+    monitor = create_monitor(tmp_path, radius_km=None, subscribed_municipalities=["Nasugbu"])
+    far_weak = make_earthquake(14.07, 120.60, 2.0, "003 km W of Nasugbu (Batangas)")
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES + [far_weak]})
+    # Only the subscribed town, and still only at or above min_magnitude
+    assert monitor.alerts == ["005 km S 52° W of Nasugbu (Batangas)"]
+
+
+def test_index_follows_catalog_changes(tmp_path):
+    monitor = create_monitor(tmp_path)
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES})
+    assert len(monitor.location_index) == len(MOCK_EARTHQUAKES)
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES[1:]})
+    assert monitor.location_index.in_town("Nasugbu") == set()
+    assert len(monitor.location_index) == len(MOCK_EARTHQUAKES) - 1
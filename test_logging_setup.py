@@ -0,0 +1,108 @@
+"""
+Tests for the queue-based rotating log setup
+"""
+
+import gzip
+import json
+import logging
+import os
+import time
+
+from logging_setup import RepeatFilter, RotatingLogHandler, flush_logging, setup_logging, stop_logging
+
+
+def make_record(message, level=logging.ERROR):
+    return logging.LogRecord('tremr', level, __file__, 1, message, None, None)
+
+
+def test_repeat_filter_limits_identical_errors():
+    repeat_filter = RepeatFilter(window_seconds=300, limit=2)
+    results = [repeat_filter.filter(make_record("Error fetching data: timeout")) for _ in range(5)]
+    assert results == [True, True, False, False, False]
+
+    # Different messages and info lines are not limited
+    assert repeat_filter.filter(make_record("Error fetching data: 503"))
+    assert all(repeat_filter.filter(make_record("Checking...", logging.INFO)) for _ in range(5))
+
+
+def test_repeat_filter_reports_suppressed_count_in_next_window():
+    repeat_filter = RepeatFilter(window_seconds=300, limit=1)
+    repeat_filter.filter(make_record("down"))
+    repeat_filter.filter(make_record("down"))
+    repeat_filter.filter(make_record("down"))
+
+    # Expire the window
+    repeat_filter.window_seconds = 0
+    record = make_record("down")
+    assert repeat_filter.filter(record)
+    assert record.getMessage() == "down (repeated 2 more times)"
+
+
+def test_size_rotation_compresses_and_prunes(tmp_path):
+    log_file = str(tmp_path / 'monitor.log')
+    handler = RotatingLogHandler(log_file, max_bytes=200, backup_count=2)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(40):
+        handler.emit(make_record(f"line {i} " + "x" * 40, logging.INFO))
+    handler.close()
+
+    rotated = sorted(name for name in os.listdir(tmp_path) if name.endswith('.gz'))
+    assert len(rotated) == 2
+    with gzip.open(tmp_path / rotated[0], 'rt') as f:
+        assert f.read().startswith('line ')
+    assert os.path.getsize(log_file) < 300
+
+
+def test_size_rollovers_on_one_day_get_their_own_archives(tmp_path):
+    log_file = str(tmp_path / 'monitor.log')
+    handler = RotatingLogHandler(log_file, max_bytes=100, backup_count=2)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    today = time.strftime('%Y-%m-%d')
+
+    def emit(line):
+        handler.emit(make_record(line + " " + "x" * 100, logging.INFO))
+
+    emit("first")
+    emit("second")
+    emit("third")
+    assert sorted(os.listdir(tmp_path)) == ["monitor.log", f"monitor.log.{today}.1.gz", f"monitor.log.{today}.2.gz"]
+    for number, line in [(1, "first"), (2, "second")]:
+        with gzip.open(tmp_path / f"monitor.log.{today}.{number}.gz", 'rt') as f:
+            assert f.read().startswith(line + " ")
+
+    # Pruning the oldest archive doesn't free its number for the next rollover
+    emit("fourth")
+    handler.close()
+    assert sorted(os.listdir(tmp_path)) == ["monitor.log", f"monitor.log.{today}.2.gz", f"monitor.log.{today}.3.gz"]
+    with gzip.open(tmp_path / f"monitor.log.{today}.3.gz", 'rt') as f:
+        assert f.read().startswith("third ")
+
+
+def test_queued_json_lines(tmp_path):
+    log_file = str(tmp_path / 'monitor.log')
+    try:
+        setup_logging(log_file, json_lines=True, console=False)
+        logging.info("Checking PHIVOLCS")
+        logging.warning("Connection failed")
+    finally:
+        stop_logging()
+
+    with open(log_file) as f:
+        entries = [json.loads(line) for line in f]
+    assert [(e['level'], e['message']) for e in entries] == [('INFO', "Checking PHIVOLCS"), ('WARNING', "Connection failed")]
+
+
+def test_flush_writes_queued_records_and_keeps_logging(tmp_path):
+    log_file = str(tmp_path / 'monitor.log')
+    try:
+        setup_logging(log_file, console=False)
+        logging.info("Saved seen earthquakes")
+        flush_logging()
+        with open(log_file) as f:
+            assert f.read().endswith("Saved seen earthquakes\n")
+        logging.info("Still logging")
+    finally:
+        stop_logging()
+
+    with open(log_file) as f:
+        assert f.read().endswith("Still logging\n")
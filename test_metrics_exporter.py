@@ -0,0 +1,44 @@
+"""
+Tests for the Prometheus-style metrics endpoint
+"""
+
+import requests
+
+from instrumentation import Instrumentation
+from metrics_exporter import MetricsExporter
+
+
+def test_render_counters_histograms_and_gauges():
+    metrics = Instrumentation()
+    metrics.count('polls', 3)
+    metrics.count_error('Timeout')
+    metrics.count_error('Timeout')
+    metrics.count_error('HTTPError')
+    metrics.observe('parse', 42.0)
+
+    exporter = MetricsExporter(metrics)
+    exporter.add_gauge('seen_earthquakes', "Earthquakes in the seen-set", lambda: 17)
+    text = exporter.render()
+
+    assert "# TYPE tremr_polls_total counter" in text
+    assert "tremr_polls_total 3" in text
+    assert 'tremr_upstream_errors_total{class="Timeout"} 2' in text
+    assert 'tremr_upstream_errors_total{class="HTTPError"} 1' in text
+    assert 'tremr_stage_duration_seconds_bucket{stage="parse",le="0.05"} 1' in text
+    assert 'tremr_stage_duration_seconds_bucket{stage="parse",le="0.02"} 0' in text
+    assert 'tremr_stage_duration_seconds_count{stage="parse"} 1' in text
+    assert "tremr_seen_earthquakes 17" in text
+
+
+def test_serves_metrics_over_http():
+    metrics = Instrumentation()
+    metrics.count('alerts')
+    exporter = MetricsExporter(metrics, port=0)
+    exporter.start()
+    try:
+        response = requests.get(f"http://127.0.0.1:{exporter.port}/metrics", timeout=5)
+        assert response.status_code == 200
+        assert "tremr_alerts_total 1" in response.text
+        assert requests.get(f"http://127.0.0.1:{exporter.port}/other", timeout=5).status_code == 404
+    finally:
+        exporter.stop()
@@ -17,7 +17,7 @@ class TestEarthquakeMonitor(EarthquakeMonitor):
         self.mock_file = mock_file
         logging.info(f"Test mode: Using mock data from {mock_file}")
 
-    def fetch_earthquake_data(self):
+    def fetch_earthquake_data(self, cancel=None):
         """Override to use mock data instead of live API"""
         try:
             if not os.path.exists(self.mock_file):
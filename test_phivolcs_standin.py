@@ -0,0 +1,116 @@
+"""
+Tests for the PHIVOLCS stand-in server, driving the real fetch-to-alert path
+"""
+
+import json
+import time
+
+import pytest
+
+from main import EarthquakeMonitor
+from instrumentation import metrics
+from phivolcs_scraper import check_connection, scrape_phivolcs_earthquakes
+from phivolcs_standin import Fault, StandinServer, make_earthquake
+
+with open('mock_data.json', 'r') as f:
+    MOCK_EARTHQUAKES = json.load(f)['earthquakes']
+
+# Ten filler events far from Manila so the page always has a full-size table
+FILLER = [make_earthquake(6.0 + i * 0.1, 126.0, 2.0, f"Filler {i}") for i in range(10)]
+CATALOG = MOCK_EARTHQUAKES + FILLER
+
+
+@pytest.fixture
+def monitor(tmp_path, monkeypatch):
+    def create(url):
+        monitor = EarthquakeMonitor(config={
+            'latitude': 14.5995, 'longitude': 120.9842, 'radius_km': 50, 'min_magnitude': 3.0,
+            'check_interval_seconds': 1, 'phivolcs_page_url': url, 'fetch_timeout_seconds': 0.5,
+            'catalog_cache_file': str(tmp_path / 'catalog_cache.json'), 'alert_latency_file': None
+        })
+        monitor.alerts = []
+        monkeypatch.setattr(monitor, 'save_seen_earthquakes', lambda: None)
+        monkeypatch.setattr(monitor, 'show_notification', lambda eq, distance: monitor.alerts.append(eq['location']))
+        monitor.seen_earthquakes = set()
+        return monitor
+    return create
+
+
+def test_scripted_new_event_reaches_alert(monitor):
+    nearby = make_earthquake(14.60, 121.00, 4.8, "002 km E of Manila")
+    script = [{}, {'events': [nearby]}, {}]
+    with StandinServer(CATALOG, script=script) as server:
+        m = monitor(server.url)
+        m.poll_once()
+        first_alerts = list(m.alerts)
+        m.poll_once()
+        m.poll_once()
+
+    assert len(server.requests) == 3
+    assert "002 km E of Manila" not in first_alerts
+    assert m.alerts.count("002 km E of Manila") == 1
+    assert m.data_source == 'live'
+
+
+def test_server_errors_fall_back_to_cache(monitor):
+    script = [{}, {'fault': {'status': 503}}, {'fault': {'status': 500}}]
+    with StandinServer(CATALOG, script=script) as server:
+        m = monitor(server.url)
+        assert m.fetch_earthquake_data()
+        data = m.fetch_earthquake_data()
+        assert m.data_source == 'cache'
+        assert len(data['earthquakes']) == len(CATALOG)
+        m.fetch_earthquake_data()
+        assert m.data_source == 'cache'
+
+
+def test_hang_times_out_quickly():
+    with StandinServer(CATALOG, fault=Fault(hang=5)) as server:
+        started = time.time()
+        assert scrape_phivolcs_earthquakes(url=server.url, timeout=0.3) is None
+        assert time.time() - started < 2
+
+
+def test_truncated_body_is_an_error():
+    with StandinServer(CATALOG, fault=Fault(truncate=0.5)) as server:
+        assert scrape_phivolcs_earthquakes(url=server.url, timeout=2) is None
+
+
+def test_latency_and_slow_drip_still_deliver_everything():
+    with StandinServer(CATALOG, fault=Fault(latency=0.2, slow_drip=0.01)) as server:
+        started = time.time()
+        data = scrape_phivolcs_earthquakes(url=server.url, timeout=2)
+        assert time.time() - started >= 0.2
+    assert len(data['earthquakes']) == len(CATALOG)
+
+
+@pytest.mark.parametrize('schema', ['renamed_headers', 'no_table'])
+def test_schema_changes_are_detected(schema):
+    with StandinServer(CATALOG, fault=Fault(schema=schema)) as server:
+        assert scrape_phivolcs_earthquakes(url=server.url, timeout=2) is None
+
+
+def test_extra_column_shifts_fields():
+    # An extra column is parsed without error but the fields shift: one row shows the damage
+    with StandinServer(CATALOG, fault=Fault(schema='extra_column')) as server:
+        data = scrape_phivolcs_earthquakes(url=server.url, timeout=2)
+    assert data['earthquakes'][0]['latitude'] == "Region IV-A"
+
+
+def test_error_rate_is_seeded():
+    with StandinServer(CATALOG, error_rate=0.5, seed=3) as server:
+        results = [scrape_phivolcs_earthquakes(url=server.url, timeout=2) is not None for _ in range(10)]
+    assert 0 < sum(results) < 10
+
+
+def test_connection_check_records_nothing():
+    before = metrics.summary()
+    with StandinServer(CATALOG) as server:
+        assert check_connection(url=server.url, timeout=2) == (True, "Connected")
+    with StandinServer(CATALOG, fault=Fault(status=503)) as server:
+        assert check_connection(url=server.url, timeout=2) == (False, "HTTP Error: 503")
+    with StandinServer(CATALOG, fault=Fault(schema='no_table')) as server:
+        assert check_connection(url=server.url, timeout=2) == (False, "No earthquake data available")
+    with StandinServer(CATALOG, fault=Fault(hang=5)) as server:
+        assert check_connection(url=server.url, timeout=0.3) == (False, "Connection timeout")
+    assert metrics.summary() == before
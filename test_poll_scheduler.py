@@ -0,0 +1,186 @@
+"""
+Tests for the cancellable poll scheduler
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from main import EarthquakeMonitor
+from phivolcs_scraper import fetch_phivolcs_page
+from phivolcs_standin import Fault, StandinServer, make_earthquake
+from poll_scheduler import Cancelled, CancelToken, PollScheduler, run_cancellable
+
+with open('mock_data.json', 'r') as f:
+    MOCK_EARTHQUAKES = json.load(f)['earthquakes']
+
+FILLER = [make_earthquake(6.0 + i * 0.1, 126.0, 2.0, f"Filler {i}") for i in range(10)]
+CATALOG = MOCK_EARTHQUAKES + FILLER
+
+
+def cancel_later(token, seconds=0.05):
+    timer = threading.Timer(seconds, token.cancel)
+    timer.start()
+    return timer
+
+
+def test_sleep_wakes_on_cancel():
+    token = CancelToken()
+    cancel_later(token)
+    started = time.perf_counter()
+    with pytest.raises(Cancelled):
+        token.sleep(60)
+    assert time.perf_counter() - started < 1
+    with pytest.raises(Cancelled):
+        token.check()
+    # Cancelled is not an Exception, so broad handlers don't swallow it
+    assert not issubclass(Cancelled, Exception)
+
+
+def test_run_cancellable():
+    token = CancelToken()
+    assert run_cancellable(sum, token, [1, 2, 3]) == 6
+    assert run_cancellable(sum, None, [1, 2]) == 3
+    with pytest.raises(ZeroDivisionError):
+        run_cancellable(lambda: 1 / 0, token)
+
+    blocked = threading.Event()
+    cancel_later(token)
+    started = time.perf_counter()
+    with pytest.raises(Cancelled):
+        run_cancellable(blocked.wait, token, 30)
+    assert time.perf_counter() - started < 1
+    blocked.set()
+    assert token.callbacks == []
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    def create(url, interval=60):
+        monitor = EarthquakeMonitor(config={
+            'latitude': 14.5995, 'longitude': 120.9842, 'radius_km': 50, 'min_magnitude': 3.0,
+            'check_interval_seconds': interval, 'phivolcs_page_url': url, 'fetch_timeout_seconds': 30,
+            'catalog_cache_file': str(tmp_path / 'catalog_cache.json'), 'alert_latency_file': None
+        })
+        monitor.alerts = []
+        monitor.saves = 0
+        monitor.seen_earthquakes = set()
+        monitor.show_notification = lambda eq, distance: monitor.alerts.append(eq['location'])
+
+        def save():
+            monitor.saves += 1
+        monitor.save_seen_earthquakes = save
+        return monitor
+    return create
+
+
+def test_stop_abandons_a_hanging_fetch(monitor):
+    with StandinServer(CATALOG, fault=Fault(hang=3)) as server:
+        m = monitor(server.url)
+        scheduler = PollScheduler(m)
+        scheduler.start()
+        while not server.requests:
+            time.sleep(0.01)
+        started = time.perf_counter()
+        scheduler.stop()
+        assert time.perf_counter() - started < 0.05
+        assert scheduler.join(1)
+        assert time.perf_counter() - started < 1
+        # The cancelled fetch neither fell back to the cache nor processed anything, and the seen-set was saved
+        assert m.data_source is None and m.saves == 1
+
+
+def test_abandoned_fetch_never_reaches_the_archive(monitor, tmp_path):
+    with StandinServer(CATALOG, fault=Fault(latency=0.3)) as server:
+        m = monitor(server.url)
+        m.update_config(snapshot_archive_dir=str(tmp_path / 'snapshots'))
+        scheduler = PollScheduler(m)
+        scheduler.start()
+        while not server.requests:
+            time.sleep(0.01)
+        scheduler.stop()
+        assert scheduler.join(1)
+        # Let the abandoned download finish; its page is dropped, not archived or parsed
+        time.sleep(0.6)
+    assert m.snapshot_archive.entries == [] and m.data_source is None
+
+
+def test_cancel_stops_a_download_in_progress():
+    long_page = [make_earthquake(6.0 + i * 0.01, 126.0, 2.0, f"Filler {i}") for i in range(300)]
+    with StandinServer(long_page, fault=Fault(slow_drip=0.05)) as server:
+        token = CancelToken()
+        cancel_later(token, 0.5)
+        with pytest.raises(Cancelled):
+            fetch_phivolcs_page(server.url, timeout=10, cancel=token)
+        cancelled_at = time.perf_counter()
+        # The body takes about 3 seconds to drip in; closing the fetch's session ends the download early
+        while any(thread.name == 'tremr-download_page' for thread in threading.enumerate()):
+            assert time.perf_counter() - cancelled_at < 1.5
+            time.sleep(0.02)
+
+def test_idle_between_checks_and_quick_restart(monitor):
+    with StandinServer(CATALOG) as server:
+        m = monitor(server.url)
+        cycles = []
+        scheduler = PollScheduler(m, on_cycle=lambda: cycles.append(time.perf_counter()))
+        scheduler.start()
+        time.sleep(0.5)
+        # One check, then asleep until the next one a minute later
+        assert len(cycles) == 1 and len(server.requests) == 1
+        assert m.alerts
+
+        started = time.perf_counter()
+        scheduler.stop()
+        assert scheduler.join(1)
+        scheduler.start()
+        while len(cycles) < 2:
+            time.sleep(0.01)
+        assert cycles[1] - started < 0.5
+        scheduler.stop()
+        assert scheduler.join(1)
+
+
+def test_errors_are_reported_and_polling_continues(monitor):
+    with StandinServer(CATALOG) as server:
+        m = monitor(server.url, interval=0.05)
+        errors = []
+        original = m.process_earthquakes
+
+        def process(data):
+            if not errors:
+                raise ValueError("bad page")
+            return original(data)
+        m.process_earthquakes = process
+        scheduler = PollScheduler(m, on_error=errors.append)
+        scheduler.start()
+        while len(server.requests) < 3:
+            time.sleep(0.01)
+        scheduler.stop()
+        assert scheduler.join(1)
+    assert [str(e) for e in errors] == ["bad page"]
+    assert m.alerts
+
+
+def test_run_returns_when_stopped(monitor):
+    with StandinServer(CATALOG) as server:
+        m = monitor(server.url)
+        thread = threading.Thread(target=m.run)
+        thread.start()
+        while not server.requests:
+            time.sleep(0.01)
+        m.stop()
+        thread.join(2)
+        assert not thread.is_alive()
+    assert m.saves >= 1
+
+
+def test_interrupted_run_drains_once(monitor):
+    m = monitor('http://127.0.0.1:9/')
+
+    def interrupt(cancel=None):
+        raise KeyboardInterrupt()
+    m.poll_once = interrupt
+    m.run()
+    assert m.saves == 1
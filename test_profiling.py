@@ -0,0 +1,102 @@
+"""
+Tests for the --profile mode
+"""
+
+import os
+import pstats
+
+import pytest
+
+from main import EarthquakeMonitor
+from phivolcs_standin import StandinServer, make_earthquake
+from poll_scheduler import Cancelled, CancelToken
+from profiling import CycleProfiler
+
+GROWING = []
+
+
+def busy_cycle():
+    """Burn some CPU and keep what it allocates, like an unbounded seen-set"""
+    total = 0
+    for i in range(5000):
+        total += i * i
+    GROWING.extend(str(i) for i in range(5000))
+    return total
+
+
+def run_cycles(profiler, count):
+    for _ in range(count):
+        profiler.start_cycle()
+        busy_cycle()
+        profiler.end_cycle(growing=len(GROWING))
+
+
+def test_sampling_profiler_writes_reports_and_stops(tmp_path):
+    profiler = CycleProfiler(str(tmp_path), cycles=3, sample_interval=0.001)
+    run_cycles(profiler, 5)
+
+    assert profiler.finished
+    assert profiler.completed == 3
+    files = set(os.listdir(profiler.report_dir))
+    assert {'cpu.collapsed', 'summary.txt', 'memory_cycle_001.txt', 'memory_cycle_003.txt'} <= files
+
+    with open(os.path.join(profiler.report_dir, 'cpu.collapsed')) as f:
+        assert 'test_profiling:busy_cycle' in f.read()
+    with open(os.path.join(profiler.report_dir, 'memory_cycle_003.txt')) as f:
+        assert 'test_profiling.py' in f.read()
+    with open(os.path.join(profiler.report_dir, 'memory_growth.txt')) as f:
+        assert 'busy_cycle' in f.read()
+    with open(os.path.join(profiler.report_dir, 'summary.txt')) as f:
+        summary = f.read()
+    assert 'Profiled 3 poll cycles' in summary
+    assert 'Traced memory grew' in summary
+
+
+def test_cprofile_mode(tmp_path):
+    profiler = CycleProfiler(str(tmp_path), cycles=2, profiler='cprofile', trace_memory=False)
+    run_cycles(profiler, 2)
+
+    assert profiler.finished
+    assert os.path.exists(os.path.join(profiler.report_dir, 'cpu.prof'))
+    with open(os.path.join(profiler.report_dir, 'cpu_top.txt')) as f:
+        assert 'busy_cycle' in f.read()
+
+
+@pytest.mark.parametrize('kind', ['sample', 'cprofile'])
+def test_profile_covers_the_parse_of_a_cancellable_poll(tmp_path, kind):
+    catalog = [make_earthquake(5.0 + i % 140 / 10, 118.0 + i % 90 / 10, 2.0, f"Synthetic event {i}") for i in range(1500)]
+    with StandinServer(catalog) as server:
+        monitor = EarthquakeMonitor(config={
+            'latitude': 14.5995, 'longitude': 120.9842, 'radius_km': 1, 'min_magnitude': 6.0,
+            'check_interval_seconds': 60, 'phivolcs_page_url': server.url, 'alert_latency_file': None,
+            'catalog_cache_file': str(tmp_path / 'catalog_cache.json')
+        })
+        monitor.seen_earthquakes = set()
+        monitor.save_seen_earthquakes = lambda: None
+        monitor.profiler = CycleProfiler(str(tmp_path), cycles=1, profiler=kind, sample_interval=0.001,
+                                         trace_memory=False)
+        # Only the download may leave the polling thread; parsing has to show up in its profile
+        monitor.poll_once(CancelToken())
+    assert monitor.profiler.finished and monitor.data_source == 'live'
+
+    if kind == 'cprofile':
+        functions = {name for _, _, name in pstats.Stats(os.path.join(monitor.profiler.report_dir, 'cpu.prof')).stats}
+        assert {'parse_earthquake_rows', 'iter_earthquake_rows', 'find_all'} <= functions
+    else:
+        with open(os.path.join(monitor.profiler.report_dir, 'cpu.collapsed')) as f:
+            assert 'phivolcs_scraper:iter_earthquake_rows' in f.read()
+
+
+def test_cancelled_poll_still_ends_its_profile_cycle(tmp_path):
+    monitor = EarthquakeMonitor(config={
+        'latitude': 14.5995, 'longitude': 120.9842, 'radius_km': 50, 'min_magnitude': 3.0,
+        'check_interval_seconds': 60, 'alert_latency_file': None,
+        'catalog_cache_file': str(tmp_path / 'catalog_cache.json')
+    })
+    monitor.profiler = CycleProfiler(str(tmp_path), cycles=2, profiler='cprofile', trace_memory=False)
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(Cancelled):
+        monitor.poll_once(token)
+    # The profiler isn't left running into whatever the thread does next
+    assert monitor.profiler.cycle_started is None and monitor.profiler.completed == 1
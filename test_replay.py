@@ -0,0 +1,106 @@
+"""
+Tests for the alert replay engine
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+
+from replay import ReplayEngine
+from synthetic_catalog import generate_catalog, to_earthquakes
+
+with open('mock_data.json', 'r') as f:
+    MOCK_EARTHQUAKES = json.load(f)['earthquakes']
+
+CONFIG = {
+    "latitude": 14.65,
+    "longitude": 121.05,
+    "radius_km": 100,
+    "min_magnitude": 3.0,
+    "check_interval_seconds": 60
+}
+
+
+def test_replay_reports_alerts_and_latency():
+    engine = ReplayEngine(CONFIG, publish_delay=120)
+    engine.replay_events(MOCK_EARTHQUAKES)
+    report = engine.report()
+
+    assert report['events'] == 5
+    # Nasugbu M4.5 and Quezon City M3.2 are in range; Manila M2.8 is too weak
+    assert sorted(alert['magnitude'] for alert in report['alerts']) == ["3.2", "4.5"]
+    for alert in report['alerts']:
+        # Posted 2 minutes after origin, picked up by the next 60 second poll
+        assert 120 <= alert['latency_seconds'] < 180
+        assert alert['fired_at'] % 60 == 0
+
+
+def test_replay_is_deterministic_and_never_alerts_twice():
+    reports = []
+    for _ in range(2):
+        engine = ReplayEngine(CONFIG)
+        engine.replay_events(MOCK_EARTHQUAKES + MOCK_EARTHQUAKES)
+        reports.append(engine.report()['alerts'])
+
+    assert reports[0] == reports[1]
+    assert len(reports[0]) == 2
+
+
+def test_replay_flags_rate_anomalies_on_the_virtual_clock(caplog):
+    start = datetime(2020, 3, 1)
+    quiet = [start + timedelta(hours=7 * i) for i in range(24)]
+    swarm = [quiet[-1] + timedelta(hours=2, minutes=5 * i) for i in range(8)]
+    catalog = [{
+        'date': f"{origin:%Y-%m-%d}", 'time': f"{origin:%H:%M:%S}", 'latitude': "14.70", 'longitude': "121.10",
+        'depth': "010 kilometers", 'magnitude': "2.0", 'location': "005 km N 10° E of Quezon City"
+    } for origin in quiet + swarm]
+
+    engine = ReplayEngine(CONFIG, full_pipeline=True)
+    with caplog.at_level(logging.WARNING):
+        engine.replay_events(catalog)
+    stats = engine.monitor.stats
+    # Every event is inside the window that ends at the replay's last poll, not at today's date
+    assert stats.region('site').total == len(catalog)
+    assert stats.is_anomalous('site') and 'site' in stats.flagged
+    assert any("Unusual earthquake activity (site)" in r.getMessage() for r in caplog.records)
+
+
+def test_full_pipeline_replay_keeps_a_page_of_state():
+    catalog = to_earthquakes(generate_catalog(days=60, seed=3), newest_first=False)
+    engine = ReplayEngine(dict(CONFIG, latitude=9.0, longitude=126.0, min_magnitude=4.0), page_rows=200,
+                          full_pipeline=True)
+    engine.replay_events(catalog)
+    report = engine.report()
+    monitor = engine.monitor
+
+    assert report['events'] == len(catalog) > 3000
+    # Rows scrolled off the page, and the monitor let go of them
+    assert len(monitor.scrape_diff.rows()) == 200
+    assert len(monitor.location_index) <= 200 and len(monitor.enrichments) <= 200
+    assert len(monitor.sequences.events) < len(catalog) / 10
+
+
+def test_column_replay_fires_the_full_pipelines_alerts():
+    catalog = to_earthquakes(generate_catalog(days=60, seed=3), newest_first=False)
+    for config in [dict(CONFIG, latitude=9.0, longitude=126.0, radius_km=200, min_magnitude=3.5),
+                   dict(CONFIG, latitude=9.0, longitude=126.0, radius_km=None, min_magnitude=3.0,
+                        subscribed_provinces=["Surigao del Sur"])]:
+        reports = []
+        for full_pipeline in (False, True):
+            engine = ReplayEngine(config, publish_delay=90, full_pipeline=full_pipeline)
+            engine.replay_events(catalog + catalog[:50])
+            reports.append(engine.report())
+        assert reports[0]['alerts'] and reports[0]['alerts'] == reports[1]['alerts']
+        assert reports[0]['events'] == reports[1]['events']
+        assert reports[0]['polls'] == reports[1]['polls']
+
+
+def test_column_replay_speed():
+    catalog = to_earthquakes(generate_catalog(days=120, seed=3), newest_first=False)
+    engine = ReplayEngine(dict(CONFIG, latitude=9.0, longitude=126.0, min_magnitude=4.0))
+    engine.replay_events(catalog)
+    report = engine.report()
+
+    assert report['events'] == len(catalog)
+    # Regression floor, well under what a developer machine does (about 300,000 events/s)
+    assert report['events_per_second'] > 100000
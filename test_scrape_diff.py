@@ -0,0 +1,75 @@
+"""
+Tests for the scrape diff engine and how the monitor uses it
+"""
+
+import json
+
+from scrape_diff import ScrapeDiff
+
+with open('mock_data.json', 'r') as f:
+    MOCK_EARTHQUAKES = json.load(f)['earthquakes']
+
+
+def test_first_scrape_is_all_inserted():
+    delta = ScrapeDiff().diff(MOCK_EARTHQUAKES)
+    assert len(delta.inserted) == len(MOCK_EARTHQUAKES)
+    assert delta.removed == [] and delta.modified == []
+
+
+def test_unchanged_scrape_is_empty():
+    diff = ScrapeDiff()
+    diff.diff(MOCK_EARTHQUAKES)
+    delta = diff.diff([dict(eq) for eq in MOCK_EARTHQUAKES])
+    assert delta == ([], [], [])
+
+
+def test_new_removed_and_revised_rows():
+    diff = ScrapeDiff()
+    diff.diff(MOCK_EARTHQUAKES)
+
+    newest = dict(MOCK_EARTHQUAKES[0], time="15:00:00", magnitude="3.9")
+    revised = dict(MOCK_EARTHQUAKES[1], magnitude="3.6")
+    # Newest event pushes the oldest one off the page; the second row gets a magnitude revision
+    delta = diff.diff([newest, MOCK_EARTHQUAKES[0], revised] + MOCK_EARTHQUAKES[2:-1])
+
+    assert delta.inserted == [newest]
+    assert delta.removed == [MOCK_EARTHQUAKES[-1]]
+    assert delta.modified == [(MOCK_EARTHQUAKES[1], revised)]
+
+
+def test_scroll_matches_diff_of_the_page():
+    diff = ScrapeDiff()
+    # The page lists newest first; MOCK_EARTHQUAKES[0] is the newest row
+    diff.diff(MOCK_EARTHQUAKES[2:])
+    newer = list(reversed(MOCK_EARTHQUAKES[:2]))
+    delta = diff.scroll(newer + [MOCK_EARTHQUAKES[3]], page_rows=4)
+    assert delta.inserted == newer and delta.modified == []
+    assert delta.removed == [MOCK_EARTHQUAKES[4]]
+    assert sorted(map(str, diff.rows())) == sorted(map(str, MOCK_EARTHQUAKES[:4]))
+
+
+def test_monitor_alerts_on_revision_over_threshold(tmp_path, monkeypatch):
+    from main import EarthquakeMonitor
+
+    monkeypatch.chdir(tmp_path)
+    with open('config.json', 'w') as f:
+        json.dump({"latitude": 14.65, "longitude": 121.05, "radius_km": 20, "min_magnitude": 4.0,
+                   "check_interval_seconds": 60}, f)
+
+    monitor = EarthquakeMonitor('config.json')
+    alerts = []
+    monkeypatch.setattr(monitor, 'show_notification', lambda eq, distance: alerts.append(eq['magnitude']))
+
+    # The Quezon City event (M3.2) is below the threshold at first
+    monitor.process_earthquakes({'earthquakes': MOCK_EARTHQUAKES})
+    assert alerts == []
+
+    revised = [dict(eq, magnitude="4.1") if eq['time'] == "12:15:30" else eq for eq in MOCK_EARTHQUAKES]
+    delta = monitor.process_earthquakes({'earthquakes': revised})
+    assert len(delta.modified) == 1
+    assert alerts == ["4.1"]
+
+    # Polling the same page again does nothing
+    delta = monitor.process_earthquakes({'earthquakes': revised})
+    assert delta == ([], [], [])
+    assert alerts == ["4.1"]
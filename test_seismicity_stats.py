@@ -0,0 +1,163 @@
+"""
+Tests for the incremental seismicity statistics
+"""
+
+import math
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from main import EarthquakeMonitor
+from phivolcs_scraper import PHILIPPINE_TIME
+from phivolcs_standin import make_earthquake
+from scrape_diff import ScrapeDelta
+from seismicity_stats import ALL_REGION, SITE_REGION, RegionStats, SeismicityStats
+
+MANILA = (14.5995, 120.9842)
+NOW = datetime(2024, 3, 10, 12, 30, tzinfo=PHILIPPINE_TIME)
+
+
+def near(hours_ago, magnitude=2.0, location="005 km N of Quezon City"):
+    return make_earthquake(14.65, 121.03, magnitude, location, origin=NOW - timedelta(hours=hours_ago))
+
+
+def create_stats(**options):
+    stats = SeismicityStats(*MANILA, 50, **options)
+    stats.advance(NOW.timestamp())
+    return stats
+
+
+def test_ring_counts_expire_and_match_a_rescan():
+    region = RegionStats(buckets=5)
+    rng = np.random.default_rng(3)
+    buckets = np.sort(rng.integers(0, 40, 300))
+    for seen, bucket in enumerate(buckets, 1):
+        region.advance(int(bucket))
+        region.add(int(bucket), 3.0)
+        window = buckets[:seen][buckets[:seen] > region.head - 5]
+        counts = np.bincount(window - window.min())
+        assert region.total == len(window)
+        assert region.total_squares == int((counts ** 2).sum())
+    region.advance(region.head + 100)
+    assert region.total == region.total_squares == region.current_count() == 0
+
+
+def test_old_events_outside_window_are_not_counted():
+    region = RegionStats(buckets=24)
+    region.advance(100)
+    region.add(50, 3.0)
+    region.add(90, 3.0)
+    assert region.total == 1
+    # They still count towards magnitudes
+    assert region.events == 2 and region.complete_events == 2
+
+
+def test_future_events_do_not_move_the_window():
+    stats = create_stats()
+    site = stats.region(SITE_REGION)
+    now_bucket = site.head
+    stats.add(near(6 * 24))
+    stats.add(near(-5))
+    # The window still ends now: the event 6 days ago is in it, the one 5 hours ahead isn't yet
+    assert site.head == now_bucket == stats.now_bucket
+    assert site.total == 1 and site.events == 2
+    stats.add(near(0.5))
+    assert site.current_count() == 1 and site.total == 2
+
+def test_b_value_recovers_synthetic_catalog():
+    rng = np.random.default_rng(11)
+    region = RegionStats(buckets=2, completeness_magnitude=2.5)
+    # Gutenberg-Richter with b=1 above 2.45, binned to 0.1 like PHIVOLCS
+    magnitudes = np.round(2.45 + rng.exponential(1 / math.log(10), 20000), 1)
+    for magnitude in magnitudes[magnitudes >= 2.5]:
+        region.add(None, float(magnitude))
+    b, error = region.b_value()
+    assert b == pytest.approx(1.0, abs=0.05)
+    assert 0 < error < 0.02
+    assert sum(region.histogram) == region.events
+
+
+def test_revisions_replace_old_figures():
+    stats = create_stats()
+    original = near(1, 3.0)
+    revised = dict(original, magnitude="4.0")
+    stats.update(ScrapeDelta([original], [], []))
+    stats.update(ScrapeDelta([], [], [(original, revised)]))
+    site = stats.region(SITE_REGION)
+    assert site.events == 1 and site.total == 1
+    assert site.complete_magnitude_sum == pytest.approx(4.0)
+    # Rows that scroll off the page stay counted
+    stats.update(ScrapeDelta([], [revised], []))
+    assert site.events == 1
+
+
+def test_regions():
+    stats = create_stats()
+    names = stats.add(near(1, location="005 km S 52° W of Nasugbu (Batangas)"))
+    assert names == [ALL_REGION, SITE_REGION, "province:batangas"]
+    far = make_earthquake(6.9, 126.2, 3.0, "010 km E of City Of Mati (Davao Oriental)", origin=NOW)
+    assert stats.add(far) == [ALL_REGION, "province:davao oriental"]
+
+
+def test_burst_is_flagged_once_and_quiet_history_is_not():
+    stats = create_stats(min_events=3)
+    # A quiet week: one event every 12 hours
+    history = [near(hours) for hours in range(12, 7 * 24, 12)]
+    assert stats.update(ScrapeDelta(history, [], [])) == []
+
+    # Two events this hour: below min_events
+    assert stats.update(ScrapeDelta([near(0.1), near(0.2)], [], [])) == []
+    # A third makes it a burst near the site (and in Metro Manila); flagged once
+    assert stats.update(ScrapeDelta([near(0.3)], [], [])) == [ALL_REGION, "province:metro manila", SITE_REGION]
+    assert stats.update(ScrapeDelta([near(0.4)], [], [])) == []
+    summary = stats.summary()
+    assert summary['anomalous'] and summary['current_bucket_events'] == 4
+    assert summary['rate_zscore'] > 3
+
+    # Next day the bucket is empty again
+    stats.advance((NOW + timedelta(days=1)).timestamp())
+    assert not stats.is_anomalous(SITE_REGION)
+
+
+def test_old_burst_in_first_scrape_is_not_flagged():
+    stats = create_stats(min_events=3)
+    burst_three_days_ago = [near(72 + i / 10) for i in range(6)]
+    assert stats.update(ScrapeDelta(burst_three_days_ago, [], [])) == []
+    assert stats.summary()['window_events'] == 6
+
+
+def test_per_event_cost_is_constant():
+    stats = create_stats(window_hours=24 * 30)
+    events = [near(i / 100) for i in range(20000)]
+    started = time.perf_counter()
+    stats.update(ScrapeDelta(events[:1000], [], []))
+    first = time.perf_counter() - started
+    started = time.perf_counter()
+    stats.update(ScrapeDelta(events[-1000:], [], []))
+    last = time.perf_counter() - started
+    assert last < first * 3 + 0.05
+    started = time.perf_counter()
+    for _ in range(1000):
+        stats.summary()
+    assert (time.perf_counter() - started) / 1000 < 0.001
+
+
+def test_monitor_keeps_stats(tmp_path):
+    monitor = EarthquakeMonitor(config={
+        'latitude': MANILA[0], 'longitude': MANILA[1], 'radius_km': 50, 'min_magnitude': 3.0,
+        'check_interval_seconds': 60, 'alert_latency_file': None,
+        'catalog_cache_file': str(tmp_path / 'catalog_cache.json')
+    })
+    monitor.seen_earthquakes = set()
+    monitor.save_seen_earthquakes = lambda: None
+    monitor.show_notification = lambda eq, distance: None
+
+    now = datetime.now(PHILIPPINE_TIME)
+    earthquakes = [make_earthquake(14.65, 121.03, 2.0 + i / 10, f"00{i} km N of Quezon City",
+                                   origin=now - timedelta(minutes=i)) for i in range(5)]
+    monitor.process_earthquakes({'earthquakes': earthquakes})
+    summary = monitor.stats.summary(SITE_REGION)
+    assert summary['events'] == 5 and summary['current_bucket_events'] >= 1
+    assert monitor.stats.summary('province:metro manila')['events'] == 5
@@ -0,0 +1,59 @@
+"""
+Tests for the raw snapshot archive and parser replay
+"""
+
+import json
+import time
+
+from phivolcs_fixtures import render_phivolcs_page
+from snapshot_archive import SnapshotArchive
+
+with open('mock_data.json', 'r') as f:
+    MOCK_EARTHQUAKES = json.load(f)['earthquakes']
+
+# The scraper only recognises tables with at least 9 data rows
+PAGE_A = render_phivolcs_page(MOCK_EARTHQUAKES * 2)
+PAGE_B = render_phivolcs_page(MOCK_EARTHQUAKES * 3)
+
+NOW = time.time()
+
+
+def test_identical_pages_stored_once(tmp_path):
+    archive = SnapshotArchive(str(tmp_path))
+    assert archive.store(PAGE_A, fetched_at=NOW + 100) is not None
+    assert archive.store(PAGE_A, fetched_at=NOW + 160) is None
+    archive.store(PAGE_B, fetched_at=NOW + 220)
+    archive.store(PAGE_A, fetched_at=NOW + 280)
+
+    assert [entry['fetched_at'] for entry in archive.entries] == [NOW + 100, NOW + 220, NOW + 280]
+    assert len(archive.blob_sizes) == 2
+    assert archive.load(archive.entries[0]['sha256']) == PAGE_A
+
+    # The index survives a restart
+    assert SnapshotArchive(str(tmp_path)).entries == archive.entries
+
+
+def test_retention_keeps_storage_bounded(tmp_path):
+    archive = SnapshotArchive(str(tmp_path), max_entries=3)
+    for i in range(10):
+        archive.store(PAGE_A + str(i).encode(), fetched_at=NOW + i)
+
+    assert len(archive.entries) == 3
+    assert len(list((tmp_path / 'blobs').glob('*/*.gz'))) == 3
+
+    archive.max_age_seconds = 5
+    archive.apply_retention(now=NOW + 13)
+    assert [entry['fetched_at'] for entry in archive.entries] == [NOW + 8, NOW + 9]
+
+
+def test_replay_through_scraper(tmp_path):
+    archive = SnapshotArchive(str(tmp_path))
+    archive.store(PAGE_A, fetched_at=NOW + 100)
+    archive.store(PAGE_B, fetched_at=NOW + 200)
+
+    replayed = list(archive.replay(start=NOW + 150))
+    assert len(replayed) == 1
+    entry, data = replayed[0]
+    assert entry['fetched_at'] == NOW + 200
+    assert len(data['earthquakes']) == 15
+    assert data['earthquakes'][0]['location'] == MOCK_EARTHQUAKES[0]['location']
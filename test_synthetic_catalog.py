@@ -0,0 +1,84 @@
+"""
+Tests for the synthetic catalog generator
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from phivolcs_scraper import parse_earthquake_rows, parse_origin_time
+from phivolcs_standin import StandinServer
+from phivolcs_scraper import scrape_phivolcs_earthquakes
+from synthetic_catalog import (ETASModel, PHILIPPINE_BOUNDS, generate_catalog, load_npz, standin_script,
+                               to_earthquakes, write_html_pages, write_mock_json, write_npz)
+
+
+def test_same_seed_same_catalog():
+    first = generate_catalog(days=5, seed=7)
+    second = generate_catalog(days=5, seed=7)
+    assert all(np.array_equal(first[name], second[name]) for name in first)
+    assert not np.array_equal(first['magnitude'], generate_catalog(days=5, seed=8)['magnitude'])
+
+
+def test_magnitudes_follow_gutenberg_richter_and_locations_stay_in_bounds():
+    model = ETASModel(background_per_day=500, b_value=1.0)
+    catalog = generate_catalog(days=30, seed=1, model=model)
+    magnitudes = catalog['magnitude']
+
+    # Aki's maximum-likelihood b-value
+    b_value = np.log10(np.e) / (magnitudes.mean() - model.min_magnitude)
+    assert b_value == pytest.approx(1.0, abs=0.05)
+    assert magnitudes.max() <= model.max_magnitude
+    assert np.all(np.diff(catalog['origin_time']) >= 0)
+
+    south, north, west, east = PHILIPPINE_BOUNDS
+    assert catalog['latitude'].min() >= south and catalog['latitude'].max() <= north
+    assert catalog['longitude'].min() >= west and catalog['longitude'].max() <= east
+
+
+def test_mainshock_triggers_clustered_aftershocks():
+    catalog = generate_catalog(days=2, seed=3, mainshocks=[(7.0, 9.3, 126.3, 0.5)])
+    mainshock = int(np.flatnonzero(catalog['magnitude'] == 7.0)[0])
+    origin = catalog['origin_time'][mainshock]
+
+    children = catalog['parent'] == mainshock
+    assert children.sum() > 50
+    assert np.all(catalog['origin_time'][children] >= origin)
+    # Omori decay: more aftershocks in the first hour than in the following ones
+    delays = catalog['origin_time'][children] - origin
+    assert (delays < 3600).sum() > (delays >= 3600).sum() / 10
+    assert np.abs(catalog['latitude'][children] - 9.3).mean() < 1.0
+
+    with pytest.raises(ValueError):
+        generate_catalog(days=1, model=ETASModel(productivity=0.5))
+
+
+def test_outputs(tmp_path):
+    catalog = generate_catalog(days=1, seed=4)
+    earthquakes = to_earthquakes(catalog)
+    assert parse_origin_time(earthquakes[0]) >= parse_origin_time(earthquakes[-1])
+    assert abs(parse_origin_time(earthquakes[0]) - catalog['origin_time'][-1]) < 1
+
+    write_mock_json(catalog, str(tmp_path / 'mock.json'))
+    with open(tmp_path / 'mock.json') as f:
+        assert len(json.load(f)['earthquakes']) == len(catalog['magnitude'])
+
+    write_npz(catalog, str(tmp_path / 'batch.npz'))
+    assert np.array_equal(load_npz(str(tmp_path / 'batch.npz'))['origin_time'], catalog['origin_time'])
+
+    pages = write_html_pages(catalog, str(tmp_path / 'pages'), page_size=20)
+    with open(pages[0], 'rb') as f:
+        rows = parse_earthquake_rows(f.read())
+    assert [(row['latitude'], row['magnitude']) for row in rows] == [(eq['latitude'], eq['magnitude']) for eq in earthquakes[:20]]
+
+
+def test_standin_script_publishes_each_poll_window():
+    catalog = generate_catalog(days=1, seed=5)
+    initial, steps = standin_script(catalog, poll_seconds=600, initial_events=20)
+    assert sum(len(step.get('events', [])) for step in steps) + len(initial) == len(catalog['magnitude'])
+
+    with StandinServer(initial, script=steps[:3]) as server:
+        rows = [len(scrape_phivolcs_earthquakes(url=server.url, timeout=2)['earthquakes']) for _ in range(3)]
+    assert rows[0] == 20
+    assert rows[2] == 20 + sum(len(step.get('events', [])) for step in steps[:3])
@@ -0,0 +1,48 @@
+"""
+Tests for the vectorized threshold sweep
+"""
+
+import numpy as np
+
+from geo_utils import haversine_km
+from threshold_sweep import columns_from_rows, recommend, sweep, sweep_site
+
+RADII = [10, 50, 100, 200]
+MAGNITUDES = [2.0, 3.0, 4.0, 5.0]
+SITE = (14.65, 121.05)
+
+
+def random_columns(count=2000, seed=7):
+    rng = np.random.default_rng(seed)
+    rows = zip(
+        np.sort(rng.uniform(0, 365 * 86400, count)),
+        rng.uniform(12.5, 16.5, count),
+        rng.uniform(119.5, 122.5, count),
+        np.round(rng.uniform(1.0, 6.5, count), 1)
+    )
+    return columns_from_rows(rows)
+
+
+def test_sweep_matches_brute_force():
+    columns = random_columns()
+    counts, largest_missed = sweep_site(columns, *SITE, RADII, MAGNITUDES)
+
+    distances = np.array([haversine_km(*SITE, lat, lon)
+                          for lat, lon in zip(columns['latitude'], columns['longitude'])])
+    magnitudes = columns['magnitude']
+    for i, radius in enumerate(RADII):
+        for j, minimum in enumerate(MAGNITUDES):
+            alerts = (distances <= radius) & (magnitudes >= minimum)
+            assert counts[i, j] == alerts.sum()
+
+            missed = magnitudes[(distances <= max(RADII)) & ~alerts]
+            expected = missed.max() if len(missed) else np.nan
+            np.testing.assert_equal(largest_missed[i, j], expected)
+
+
+def test_recommend_respects_target_rate():
+    result = sweep(random_columns(), [("Home", *SITE)], RADII, MAGNITUDES)[0]
+    radius, magnitude = recommend(result, target_rate=5)
+    i, j = RADII.index(radius), MAGNITUDES.index(magnitude)
+    assert result['alerts_per_month'][i, j] <= 5
+    assert recommend(result, target_rate=-1) is None
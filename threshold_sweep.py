@@ -0,0 +1,237 @@
+"""
+Tremr - Alert Threshold Sweep
+Evaluates a whole grid of radius_km x min_magnitude settings against the event history
+in one vectorized pass, instead of replaying the monitor once per combination
+
+Usage:
+    python threshold_sweep.py --store earthquake_events.db
+    python threshold_sweep.py --store earthquake_events.db --site "Office:14.55:121.02" --target-rate 2
+    python threshold_sweep.py --mock mock_data.json --target-rate 1 --write-config config.json
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+from geo_utils import haversine_km_array
+from phivolcs_scraper import parse_origin_time
+
+DEFAULT_RADII = [25, 50, 75, 100, 150, 200, 300]
+DEFAULT_MAGNITUDES = [2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0, 5.5, 6.0]
+SECONDS_PER_MONTH = 30.44 * 86400
+
+
+def columns_from_rows(rows):
+    """Build columnar arrays from (origin_time, latitude, longitude, magnitude) rows, dropping invalid ones"""
+    table = np.array(list(rows), dtype=float).reshape(-1, 4)
+    table = table[np.isfinite(table).all(axis=1)]
+    return {
+        'origin_time': table[:, 0],
+        'latitude': table[:, 1],
+        'longitude': table[:, 2],
+        'magnitude': table[:, 3]
+    }
+
+
+def load_store_columns(db_file):
+    """Load the event store as columnar arrays"""
+    from event_store import EventStore
+
+    store = EventStore(db_file)
+    try:
+        return columns_from_rows(store.numeric_rows())
+    finally:
+        store.close()
+
+
+def load_mock_columns(mock_file):
+    """Load a mock_data.json-style file as columnar arrays"""
+    with open(mock_file, 'r') as f:
+        earthquakes = json.load(f)['earthquakes']
+
+    rows = []
+    for eq in earthquakes:
+        try:
+            rows.append((parse_origin_time(eq), float(eq['latitude']), float(eq['longitude']), float(eq['magnitude'])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return columns_from_rows((row for row in rows if row[0] is not None))
+
+
+def history_months(columns):
+    """Length of the history in months (at least one, so short histories don't inflate rates)"""
+    times = columns['origin_time']
+    if len(times) == 0:
+        return 1.0
+    return max(1.0, (times.max() - times.min()) / SECONDS_PER_MONTH)
+
+
+def sweep_site(columns, latitude, longitude, radii, magnitudes):
+    """
+    Evaluate every (radius, min magnitude) pair for one site
+    Returns (alert_counts, largest_missed) arrays shaped [len(radii), len(magnitudes)].
+    largest_missed is the biggest magnitude within the largest radius that would not have alerted (NaN if none)
+    """
+    radii = np.asarray(radii, dtype=float)
+    magnitudes = np.asarray(magnitudes, dtype=float)
+    n_radii = len(radii)
+    n_magnitudes = len(magnitudes)
+
+    distance = haversine_km_array(latitude, longitude, columns['latitude'], columns['longitude'])
+    magnitude = columns['magnitude']
+
+    # ring: index of the smallest radius containing the event (n_radii if outside all of them)
+    # level: how many magnitude thresholds the event meets
+    ring = np.searchsorted(radii, distance, side='left')
+    level = np.searchsorted(magnitudes, magnitude, side='right')
+    inside = ring < n_radii
+    ring = ring[inside]
+    level = level[inside]
+    magnitude = magnitude[inside]
+
+    cells = ring * (n_magnitudes + 1) + level
+    shape = (n_radii, n_magnitudes + 1)
+
+    # Alerts at (i, j): events in rings 0..i that meet threshold j, i.e. level > j
+    histogram = np.bincount(cells, minlength=n_radii * (n_magnitudes + 1)).reshape(shape)
+    within_radius = np.cumsum(histogram, axis=0)
+    meets_level = np.cumsum(within_radius[:, ::-1], axis=1)[:, ::-1]
+    alert_counts = meets_level[:, 1:]
+
+    # Largest miss at (i, j): biggest event either in a ring beyond i, or in rings 0..i with level <= j
+    largest = np.full(n_radii * (n_magnitudes + 1), -np.inf)
+    np.maximum.at(largest, cells, magnitude)
+    largest = largest.reshape(shape)
+
+    inner = np.maximum.accumulate(np.maximum.accumulate(largest, axis=0), axis=1)[:, :n_magnitudes]
+    ring_max = largest.max(axis=1)
+    beyond = np.append(np.maximum.accumulate(ring_max[::-1])[::-1][1:], -np.inf)
+    largest_missed = np.maximum(inner, beyond[:, None])
+    largest_missed[np.isinf(largest_missed)] = np.nan
+
+    return alert_counts, largest_missed
+
+
+def sweep(columns, sites, radii=DEFAULT_RADII, magnitudes=DEFAULT_MAGNITUDES):
+    """Sweep the grid for each (name, latitude, longitude) site. Returns one result dict per site"""
+    months = history_months(columns)
+    results = []
+    for name, latitude, longitude in sites:
+        counts, largest_missed = sweep_site(columns, latitude, longitude, radii, magnitudes)
+        results.append({
+            'site': name,
+            'latitude': latitude,
+            'longitude': longitude,
+            'radii_km': list(radii),
+            'magnitudes': list(magnitudes),
+            'alert_counts': counts,
+            'alerts_per_month': counts / months,
+            'largest_missed': largest_missed
+        })
+    return results
+
+
+def recommend(result, target_rate):
+    """
+    Pick the setting that misses the least while alerting at most target_rate times a month
+    Ties go to the wider radius. Returns (radius_km, min_magnitude) or None if nothing fits
+    """
+    rates = result['alerts_per_month']
+    missed = np.nan_to_num(result['largest_missed'], nan=-np.inf)
+    best = None
+    for i, radius in enumerate(result['radii_km']):
+        for j, magnitude in enumerate(result['magnitudes']):
+            if rates[i, j] > target_rate:
+                continue
+            key = (missed[i, j], -radius, magnitude)
+            if best is None or key < best[0]:
+                best = (key, radius, magnitude)
+    return (best[1], best[2]) if best else None
+
+
+def print_result(result):
+    """Print a site's alerts-per-month table"""
+    print(f"\n{result['site']} ({result['latitude']:.4f}, {result['longitude']:.4f}) - alerts per month")
+    print("radius km | " + " ".join(f"M>={m:<4}" for m in result['magnitudes']))
+    print("-" * (12 + 7 * len(result['magnitudes'])))
+    for i, radius in enumerate(result['radii_km']):
+        print(f"{radius:>9} | " + " ".join(f"{rate:6.2f}" for rate in result['alerts_per_month'][i]))
+
+
+def to_json_list(array):
+    """Convert an array to nested lists with NaN as null"""
+    return np.where(np.isnan(array), None, array).tolist() if array.dtype.kind == 'f' else array.tolist()
+
+
+def parse_list(text):
+    """Parse a comma separated list of numbers"""
+    return [float(value) for value in text.split(',') if value.strip()]
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Compare radius_km x min_magnitude settings against past earthquakes")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--store', help="Event store database (see backfill.py)")
+    source.add_argument('--mock', help="JSON file in mock_data.json format")
+    parser.add_argument('--config', default='config.json', help="Configuration whose location is used as the default site")
+    parser.add_argument('--site', action='append', default=[], help="Extra site as NAME:LAT:LON (repeatable)")
+    parser.add_argument('--radii', type=parse_list, default=DEFAULT_RADII, help="Comma separated radii in km")
+    parser.add_argument('--magnitudes', type=parse_list, default=DEFAULT_MAGNITUDES, help="Comma separated minimum magnitudes")
+    parser.add_argument('--target-rate', type=float, help="Recommend settings alerting at most this many times a month")
+    parser.add_argument('--write-config', help="Write the first site's recommendation into this config file")
+    parser.add_argument('--json', help="Write the full results to this file")
+    args = parser.parse_args()
+
+    columns = load_store_columns(args.store) if args.store else load_mock_columns(args.mock)
+
+    sites = []
+    try:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+        sites.append((config.get('address', 'Configured location'), config['latitude'], config['longitude']))
+    except (OSError, ValueError, KeyError):
+        pass
+    for site in args.site:
+        name, lat, lon = site.rsplit(':', 2)
+        sites.append((name, float(lat), float(lon)))
+    if not sites:
+        parser.error("No site: give --site or a config file with latitude/longitude")
+
+    results = sweep(columns, sites, sorted(args.radii), sorted(args.magnitudes))
+    print(f"{len(columns['magnitude'])} earthquakes over {history_months(columns):.1f} months")
+
+    for result in results:
+        print_result(result)
+        if args.target_rate is not None:
+            choice = recommend(result, args.target_rate)
+            if choice:
+                result['recommended'] = {'radius_km': choice[0], 'min_magnitude': choice[1]}
+                print(f"Recommended for <= {args.target_rate} alerts/month: "
+                      f"{json.dumps(result['recommended'])}")
+            else:
+                print(f"No setting in the grid stays under {args.target_rate} alerts/month")
+
+    if args.write_config:
+        recommended = results[0].get('recommended')
+        if not recommended:
+            parser.error("--write-config needs --target-rate with a setting that fits")
+        with open(args.write_config, 'r') as f:
+            config = json.load(f)
+        config.update(recommended)
+        with open(args.write_config, 'w') as f:
+            json.dump(config, f, indent=4)
+        print(f"Updated {args.write_config}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([
+                {key: (to_json_list(value) if isinstance(value, np.ndarray) else value) for key, value in result.items()}
+                for result in results
+            ], f, indent=4)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()